@@ -0,0 +1,107 @@
+"""
+Latency of the stock writes of the requests while a store with many stock rows is deleted.
+
+"sync" deletes the store with `delete_store` in another thread, one transaction holding the write
+lock while the ON DELETE CASCADE deletes its stock. "async" starts its deletion with mode=async and
+runs it with `purge_pending`, as the worker of services/deletion.py does, in chunks of
+`DELETION_CHUNK_SIZE` rows. Meanwhile the main thread keeps calling `update_stock_service` on the
+stock of another store, each call a transaction of its own like a request. The database uses the
+production profile, whose busy_timeout makes a write wait up to 5 seconds for the lock.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_background_delete --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_cascade_delete import seed
+from database.profile import configure_engine
+from schemas.stock import StockUpdate
+from services.deletion import purge_pending
+from services.stock import update_stock_service
+from services.store import delete_store
+
+# Rows of the kept store, which the writes update
+KEPT_STOCK = 1000
+
+
+def run(path: str, rows: int, mode: str) -> dict:
+    engine = configure_engine(create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}), "production")
+    Session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+    def delete():
+        with Session() as db:
+            if mode == "sync":
+                delete_store(1, db)
+            else:
+                purge_pending(db)
+
+    if mode == "async":
+        # Answered before any stock is deleted
+        with Session() as db:
+            delete_store(1, db, "async")
+
+    start = time.perf_counter()
+    deleting = threading.Thread(target=delete)
+    deleting.start()
+
+    latencies, errors, i = [], 0, 0
+    while deleting.is_alive():
+        # The stock of the kept store was inserted after the deleted store's
+        stock_id = rows + i % KEPT_STOCK + 1
+        write_start = time.perf_counter()
+        try:
+            with Session() as db:
+                update_stock_service(db, stock_id, StockUpdate(price=i + 0.5))
+            latencies.append(time.perf_counter() - write_start)
+        except OperationalError:
+            errors += 1
+        i += 1
+    deleting.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "deletion s": elapsed,
+        "writes": len(latencies),
+        "failed": errors,
+        "p50 ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99 ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan"),
+        "max ms": latencies[-1] * 1000 if latencies else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    seeded = os.path.join(folder, "seeded.db")
+    seed(seeded, args.rows)
+
+    print(f"Writes while deleting a store with {args.rows} stock rows")
+    columns = ("deletion s", "writes", "failed", "p50 ms", "p99 ms", "max ms")
+    print(f"{'mode':<8}" + "".join(f"{column:>12}" for column in columns))
+    for mode in ("sync", "async"):
+        path = os.path.join(folder, f"{mode}.db")
+        shutil.copy(seeded, path)
+        result = run(path, args.rows, mode)
+        print(f"{mode:<8}" + "".join(
+            f"{result[column]:>12.2f}" if isinstance(result[column], float) else f"{result[column]:>12}"
+            for column in columns
+        ))
+
+
+if __name__ == "__main__":
+    main()
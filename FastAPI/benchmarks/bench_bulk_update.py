@@ -0,0 +1,86 @@
+"""
+Time updating the price of many stock rows one `update_stock_service` call each, with
+`update_stock_bulk_service` and with `update_stock_where_service`.
+
+"put" sends one UPDATE ... RETURNING and one commit per row, as a client calling PUT /stock/{id}
+for each would. "bulk" sends every row of the batch as one executemany in one transaction and
+reads the rows back. "where" multiplies the price of the store's stock with a single UPDATE. Each
+runs on its own copy of the same database, and the statements each runs are counted.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_bulk_update --rows 100000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_cascade_delete import seed
+from database.profile import configure_engine
+from schemas.stock import StockBulkUpdate, StockUpdate, StockWhereUpdate
+from services.stock import update_stock_bulk_service, update_stock_service, update_stock_where_service
+from utils import bulk
+
+
+def update_put(db, rows: int):
+    for stock_id in range(1, rows + 1):
+        update_stock_service(db, stock_id, StockUpdate(price=stock_id * 2.0))
+
+
+def update_bulk(db, rows: int):
+    for start in range(1, rows + 1, bulk.BULK_MAX_ITEMS):
+        end = min(start + bulk.BULK_MAX_ITEMS, rows + 1)
+        update_stock_bulk_service([StockBulkUpdate(id=stock_id, price=stock_id * 2.0) for stock_id in range(start, end)], db)
+
+
+def update_where(db, rows: int):
+    # Every stock of store 1 is one of the seeded rows
+    update_stock_where_service(db, StockWhereUpdate(price_factor=2.0), store_id=1)
+
+
+def run(path: str, rows: int, update) -> tuple:
+    engine = configure_engine(create_engine(f"sqlite:///{path}"))
+    # Executions, each parameter set of an executemany counted as one
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda connection, cursor, statement, parameters, context, executemany: statements.append(
+            len(parameters) if executemany else 1
+        ),
+    )
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    with Session() as db:
+        start = time.perf_counter()
+        update(db, rows)
+        elapsed = time.perf_counter() - start
+
+    engine.dispose()
+    return elapsed, sum(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    seeded = os.path.join(folder, "seeded.db")
+    seed(seeded, args.rows)
+
+    print(f"Updating the price of {args.rows} stock rows")
+    print(f"{'service':<8}{'seconds':>10}{'statements':>12}{'rows/s':>12}")
+    for name, update in (("put", update_put), ("bulk", update_bulk), ("where", update_where)):
+        path = os.path.join(folder, f"{name}.db")
+        shutil.copy(seeded, path)
+        elapsed, statements = run(path, args.rows, update)
+        print(f"{name:<8}{elapsed:>10.2f}{statements:>12}{args.rows / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Time deleting a store with many stock rows, the way the delete services did before the ON DELETE
+CASCADE of stock.store_id and the way they do now.
+
+"orm" reproduces the previous service: the store is loaded, then its whole stock, and each stock
+row is deleted with a DELETE of its own before the store. "cascade" calls `delete_store`: one
+DELETE of the store, whose stock SQLite deletes through the index on stock.store_id. Each runs on
+its own copy of the same database, and the statements each runs are counted.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_cascade_delete --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from database.migrations import upgrade
+from database.profile import configure_engine
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from services.cache import record_change
+from services.store import delete_store
+
+
+def seed(path: str, rows: int):
+    engine = configure_engine(create_engine(f"sqlite:///{path}"))
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": "Deleted"}, {"name": "Kept"}])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(1, 1001)])
+        for start in range(0, rows, 100_000):
+            connection.execute(insert(Stock), [
+                {
+                    "store_id": 1,
+                    "product_id": i % 1000 + 1,
+                    "price": float(i),
+                    "is_available": True,
+                    "category": "Tênis",
+                    "product_name": f"Product {i % 1000 + 1}",
+                    "store_name": "Deleted",
+                }
+                for i in range(start, min(start + 100_000, rows))
+            ])
+        # Rows of another store, left in place
+        connection.execute(insert(Stock), [
+            {"store_id": 2, "product_id": i + 1, "price": 1.0, "is_available": True, "category": "Boné"}
+            for i in range(1000)
+        ])
+    engine.dispose()
+
+
+def delete_store_orm(store_id, db):
+    store = db.query(Store).filter(Store.id == store_id).first()
+    deleted_stock = [stock._asdict() for stock in store.stock]
+    for stock in store.stock:
+        db.delete(stock)
+    deleted = store._asdict_no_stock()
+    db.delete(store)
+    for stock in deleted_stock:
+        record_change(db, "stock", stock, None)
+    record_change(db, "stores", deleted, None)
+    db.commit()
+    return {"store_id": store_id}
+
+
+def run(path: str, delete) -> tuple:
+    engine = configure_engine(create_engine(f"sqlite:///{path}"))
+    # Executions, each parameter set of an executemany counted as one
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda connection, cursor, statement, parameters, context, executemany: statements.append(
+            len(parameters) if executemany else 1
+        ),
+    )
+    Session = sessionmaker(bind=engine)
+
+    with Session() as db:
+        start = time.perf_counter()
+        delete(1, db)
+        elapsed = time.perf_counter() - start
+        left = db.execute(select(func.count()).select_from(Stock)).scalar_one()
+
+    engine.dispose()
+    # The count above is not part of the delete
+    return elapsed, sum(statements) - 1, left
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    seeded = os.path.join(folder, "seeded.db")
+    seed(seeded, args.rows)
+
+    print(f"Deleting a store with {args.rows} stock rows")
+    print(f"{'service':<10}{'seconds':>10}{'statements':>12}{'stock left':>12}")
+    for name, delete in (("orm", delete_store_orm), ("cascade", delete_store)):
+        path = os.path.join(folder, f"{name}.db")
+        shutil.copy(seeded, path)
+        elapsed, statements, left = run(path, delete)
+        print(f"{name:<10}{elapsed:>10.2f}{statements:>12}{left:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare GET /stock throughput between the sync (threadpool) and async (event loop) database modes.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_db_mode --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from fastapi_app import app, get_db
+from database.session import Base
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+
+
+def seed(engine, stores: int, products: int):
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([Store(name=f"Store {i}") for i in range(stores)])
+        db.add_all([Product(name=f"Product {i}") for i in range(products)])
+        db.flush()
+        db.add_all([
+            Stock(store_id=s + 1, product_id=p + 1, price=float(p), is_available=True, category="Tênis")
+            for s in range(stores) for p in range(products)
+        ])
+        db.commit()
+
+
+async def run_load(total: int, concurrency: int, async_engine) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get("/stock", params={"max_price": 5})
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    # aiosqlite connections own a worker thread each, close them on the loop that opened them
+    await async_engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool, pool_size=args.concurrency
+    )
+    seed(sync_engine, stores=10, products=100)
+
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(bind=async_engine)
+
+    def sync_db():
+        with SyncSession() as db:
+            yield db
+
+    async def async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    for mode, dependency in (("sync", sync_db), ("async", async_db)):
+        app.dependency_overrides[get_db] = dependency
+        elapsed = asyncio.run(run_load(args.requests, args.concurrency, async_engine))
+        print(f"{mode:>5}: {args.requests / elapsed:8.1f} req/s ({elapsed:.2f}s for {args.requests} requests)")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare read/write concurrency of the SQLite engine profiles in database/profile.py.
+
+Reader threads run the GET /stock join while one writer thread keeps updating prices,
+each commit being its own transaction like `update_stock_service`.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_engine_profile --rows 100000 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.exc import OperationalError
+
+from database.profile import ENGINE_PROFILES, configure_engine
+from database.session import Base
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+
+READ_QUERY = text(
+    "SELECT stock.id, stock.price, products.name, stores.name FROM stock "
+    "JOIN products ON products.id = stock.product_id JOIN stores ON stores.id = stock.store_id "
+    "WHERE stock.is_available = 1 AND stock.price <= :max_price LIMIT 200"
+)
+WRITE_QUERY = text("UPDATE stock SET price = price + 1 WHERE id = :id")
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(100)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(1000)])
+        connection.execute(insert(Stock), [
+            {
+                "store_id": i % 100 + 1,
+                "product_id": i % 1000 + 1,
+                "price": float(i % 500),
+                "is_available": i % 2 == 0,
+                "category": "Tênis",
+            }
+            for i in range(rows)
+        ])
+
+
+def run_profile(profile: str, rows: int, readers: int, seconds: float) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), f"{profile}.db")
+    engine = configure_engine(create_engine(f"sqlite:///{path}", pool_size=readers + 1), profile)
+    seed(engine, rows)
+
+    stop = threading.Event()
+    read_latencies, write_latencies = [], []
+    errors = {"read": 0, "write": 0}
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(READ_QUERY, {"max_price": 250}).fetchall()
+                read_latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors["read"] += 1
+
+    def writer():
+        stock_id = 0
+        while not stop.is_set():
+            stock_id = stock_id % rows + 1
+            start = time.perf_counter()
+            try:
+                with engine.begin() as connection:
+                    connection.execute(WRITE_QUERY, {"id": stock_id})
+                write_latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors["write"] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    def p99(latencies):
+        return statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else float("nan")
+
+    return {
+        "reads/s": len(read_latencies) / seconds,
+        "writes/s": len(write_latencies) / seconds,
+        "read p99 ms": p99(read_latencies),
+        "write p99 ms": p99(write_latencies),
+        "locked errors": errors["read"] + errors["write"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'read p99 ms':>14}{'write p99 ms':>14}{'locked errors':>15}")
+    for profile in ENGINE_PROFILES:
+        result = run_profile(profile, args.rows, args.readers, args.seconds)
+        print(
+            f"{profile:<12}{result['reads/s']:>10.1f}{result['writes/s']:>10.1f}"
+            f"{result['read p99 ms']:>14.2f}{result['write p99 ms']:>14.2f}{result['locked errors']:>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare the joined, selectin and subquery loader strategies for the stock of stores at 10, 1k and 100k stock rows per store.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_loader_strategy --stores 5 --children 10,1000,100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from database.loaders import LOADER_STRATEGIES, eager_load
+from database.migrations import upgrade
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+
+
+def seed(engine, stores: int, children: int):
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(stores)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(children)])
+        connection.execute(insert(Stock), [
+            {"store_id": s + 1, "product_id": p + 1, "price": float(p), "is_available": True, "category": "Tênis"}
+            for s in range(stores) for p in range(children)
+        ])
+
+
+def load(Session, strategy: str) -> int:
+    with Session() as db:
+        stores = db.query(Store).options(eager_load(Store.stock, strategy).options(eager_load(Stock.product))).all()
+        return sum(len(store.stock) for store in stores)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stores", type=int, default=5)
+    parser.add_argument("--children", type=str, default="10,1000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'children':>10}{'strategy':>10}{'ms':>10}{'queries':>10}")
+    for children in map(int, args.children.split(",")):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        seed(engine, args.stores, children)
+        Session = sessionmaker(bind=engine)
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *cursor_args: statements.append(cursor_args[2]))
+
+        for strategy in LOADER_STRATEGIES:
+            best = float("inf")
+            for _ in range(args.repeat):
+                statements.clear()
+                start = time.perf_counter()
+                loaded = load(Session, strategy)
+                best = min(best, time.perf_counter() - start)
+            assert loaded == args.stores * children
+            print(f"{children:>10}{strategy:>10}{best * 1000:>10.1f}{len(statements):>10}")
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
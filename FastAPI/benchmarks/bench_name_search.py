@@ -0,0 +1,62 @@
+"""
+Compare the product name contains-match through ilike('%term%') against the trigram FTS5 index.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_name_search --rows 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select
+
+from database.fts import name_search
+from database.session import Base
+from models.product import Product
+from models.store import Store  # noqa: F401
+from models.stock import Stock  # noqa: F401
+
+WORDS = ["Air", "Max", "Force", "Forum", "Low", "Mid", "High", "Runner", "Classic", "Street", "Court", "Trail"]
+TERMS = ["Unicorn", "rail Run", "42424"]
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(bind=engine)
+    randomizer = random.Random(0)
+    names = [f"{' '.join(randomizer.sample(WORDS, 3))} {i}" for i in range(rows)]
+    names[rows // 2] = "Limited Unicorn Edition"
+    with engine.begin() as connection:
+        connection.execute(insert(Product), [{"name": name} for name in names])
+
+
+def timed(connection, statement, repeat: int = 5):
+    best, rows = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(connection.execute(statement).fetchall())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    seed(engine, args.rows)
+
+    print(f"{'term':<18}{'ilike ms':>10}{'fts ms':>10}{'rows':>8}")
+    with engine.connect() as connection:
+        for term in TERMS:
+            ilike_ms, ilike_rows = timed(connection, select(Product.id).where(Product.name.ilike(f"%{term}%")))
+            fts_ms, fts_rows = timed(connection, name_search("products", term))
+            assert ilike_rows == fts_rows
+            print(f"{term:<18}{ilike_ms:>10.2f}{fts_ms:>10.2f}{fts_rows:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare GET /store time and response size with the full nested stock, a per-store stock limit and the summary.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_nested_stock --stores 20 --products 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from fastapi_app import app, get_db
+from database.migrations import upgrade
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+
+CASES = {
+    "include=stock": {},
+    "stock_limit=10": {"stock_limit": 10},
+    "include=summary": {"include": "summary"},
+}
+
+
+def seed(engine, stores: int, products: int):
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(stores)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(products)])
+        connection.execute(insert(Stock), [
+            {"store_id": s + 1, "product_id": p + 1, "price": float(p), "is_available": True, "category": "Tênis"}
+            for s in range(stores) for p in range(products)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    seed(engine, args.stores, args.products)
+    Session = sessionmaker(bind=engine)
+
+    def bench_db():
+        with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = bench_db
+    client = TestClient(app)
+
+    print(f"{'case':<18}{'ms':>10}{'KiB':>12}")
+    for case, params in CASES.items():
+        best, size = float("inf"), 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = client.get("/store", params=params)
+            best = min(best, time.perf_counter() - start)
+            size = len(response.content)
+        print(f"{case:<18}{best * 1000:>10.1f}{size / 1024:>12.1f}")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare the cost of a GET /stock page at increasing depths with LIMIT/OFFSET against the keyset cursor.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_pagination --rows 1000000 --limit 50
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker, joinedload
+
+from database.migrations import upgrade
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from services.stock import get_stocks_service
+from utils.pagination import encode_cursor
+
+
+def seed(engine, rows: int):
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(100)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(rows // 100)])
+        connection.execute(insert(Stock), [
+            {"store_id": i % 100 + 1, "product_id": i // 100 + 1, "price": float(i % 1000), "is_available": True, "category": "Tênis"}
+            for i in range(rows)
+        ])
+
+
+def timed(fetch, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fetch()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    seed(engine, args.rows)
+
+    print(f"{'depth':>10}{'offset ms':>12}{'cursor ms':>12}")
+    with sessionmaker(bind=engine)() as db:
+        for depth in (0, args.rows // 10, args.rows // 2, args.rows - args.limit):
+            offset_ms = timed(lambda: db.query(Stock)
+                .options(joinedload(Stock.product), joinedload(Stock.store))
+                .order_by(Stock.id).offset(depth).limit(args.limit).all())
+            # Stock ids start at 1, the cursor of the page ending at `depth` is its last id
+            cursor = encode_cursor([depth]) if depth else None
+            cursor_ms = timed(lambda: get_stocks_service(
+                db, None, None, None, None, None, limit=args.limit, cursor=cursor
+            ))
+            print(f"{depth:>10}{offset_ms:>12.2f}{cursor_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare the orm and projection read paths of GET /stock and GET /store: rows per second and peak memory.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_read_path --stores 20 --products 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import services.product
+import services.stock
+import services.store
+from database.loaders import READ_PATHS
+from database.migrations import upgrade
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+
+CASES = {
+    "GET /stock": lambda db: services.stock.get_stocks_service(db, None, None, None, None, None)[0],
+    "GET /store": lambda db: [
+        # Dicts on the projection path, StoreResponse models on the orm path
+        stock for store in services.store.get_stores_service(None, None, db)[0] for stock in dict(store)["stock"]
+    ],
+}
+
+
+def seed(engine, stores: int, products: int):
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(stores)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(products)])
+        connection.execute(insert(Stock), [
+            {"store_id": s + 1, "product_id": p + 1, "price": float(p), "is_available": True, "category": "Tênis"}
+            for s in range(stores) for p in range(products)
+        ])
+
+
+def use_read_path(read_path: str):
+    for service in (services.stock, services.product, services.store):
+        service.READ_PATH = read_path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    seed(engine, args.stores, args.products)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{'case':<12}{'read path':>12}{'rows/s':>12}{'peak MiB':>12}")
+    for case, fetch in CASES.items():
+        for read_path in READ_PATHS:
+            use_read_path(read_path)
+            best = float("inf")
+            for _ in range(args.repeat):
+                # A new session each time, so no run reuses the entities of the previous one
+                with Session() as db:
+                    start = time.perf_counter()
+                    rows = len(fetch(db))
+                    best = min(best, time.perf_counter() - start)
+
+            with Session() as db:
+                tracemalloc.start()
+                fetch(db)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            assert rows == args.stores * args.products
+            print(f"{case:<12}{read_path:>12}{rows / best:>12.0f}{peak / 2 ** 20:>12.1f}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
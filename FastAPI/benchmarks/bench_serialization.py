@@ -0,0 +1,70 @@
+"""
+Compare the encoding of a GET /stock body of 50k rows: `model_dump()` then the stdlib json of JSONResponse,
+against the single pydantic-core pass of create_response, and against the rows encoded once by the response cache.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_serialization --rows 50000
+"""
+import argparse
+import time
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+from schemas.stock import StockResponse
+from services.cache import encode_rows
+from services.stock import STOCK_FIELDS
+from utils.response import PydanticJSONResponse, RawJSON
+
+
+def stock_rows(rows: int) -> list:
+    return [
+        (i + 1, i % 100 + 1, i // 100 + 1, float(i % 1000), True, "Tênis", f"Product {i // 100}", f"Store {i % 100}")
+        for i in range(rows)
+    ]
+
+
+def timed(encode, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = stock_rows(args.rows)
+    models = [StockResponse(**dict(zip(STOCK_FIELDS, row))) for row in rows]
+    dicts = [dict(zip(STOCK_FIELDS, row)) for row in rows]
+    encoded = RawJSON(to_json(dicts))
+
+    cases = {
+        # orm read path before: model_dump() copies, then JSONResponse walks the copies with json.dumps
+        "models, model_dump + json": lambda: JSONResponse({"data": [model.model_dump() for model in models]}).body,
+        # orm read path now: the validated models go straight to bytes
+        "models, pydantic-core": lambda: PydanticJSONResponse({"data": models}).body,
+        # projection read path, before and now
+        "dicts, json": lambda: JSONResponse({"data": dicts}).body,
+        "dicts, pydantic-core": lambda: PydanticJSONResponse({"data": dicts}).body,
+        # what the response cache stores of a projection read: the dicts checked against StockRow as encoded
+        "dicts, checked rows": lambda: PydanticJSONResponse({"data": RawJSON(encode_rows("stock", {}, dicts))}).body,
+        # a response cache hit: the rows were encoded when the read was cached
+        "cached read, RawJSON": lambda: PydanticJSONResponse({"data": encoded}).body,
+    }
+
+    bodies = {case: encode() for case, encode in cases.items()}
+    assert len(set(bodies.values())) == 1, "Every case must send the same bytes"
+
+    print(f"{'case':<30}{'ms':>10}")
+    for case, encode in cases.items():
+        print(f"{case:<30}{timed(encode, args.repeat):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare `get_stocks_service` on the projection and index read paths, and time the vectorized masks alone.
+
+"service" is the whole call, rows converted to response dicts included. "mask" is only the filter
+evaluated over every row of the arrays, without reading a row out.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_stock_index --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import services.stock
+from database.migrations import upgrade
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from services.stock_index import StockIndex
+
+CASES = {
+    "max_price": {"max_price": 1.5},
+    "is_available + max_price": {"is_available": False, "max_price": 10.5},
+    "category + max_price": {"category": "bon", "max_price": 100.5},
+    "store_name + max_price": {"store_name": "Store 7", "max_price": 1000.5},
+    "first page, is_available": {"is_available": True, "limit": 100},
+}
+
+
+def seed(engine, rows: int):
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(1000)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(10000)])
+        for start in range(0, rows, 100_000):
+            connection.execute(insert(Stock), [
+                {
+                    "store_id": i % 1000 + 1,
+                    "product_id": i % 10000 + 1,
+                    "price": float(i % 100000),
+                    "is_available": i % 10 != 0,
+                    "category": ("Tênis", "Camisa", "Boné")[i % 3],
+                }
+                for i in range(start, min(start + 100_000, rows))
+            ])
+
+
+def best_ms(call, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    seed(engine, args.rows)
+    Session = sessionmaker(bind=engine)
+
+    index = StockIndex()
+    services.stock.stock_index = index
+    with Session() as db:
+        start = time.perf_counter()
+        index.build(db)
+        print(f"Index of {len(index)} rows built in {time.perf_counter() - start:.1f} s\n")
+
+    arguments = {"product_name": None, "store_name": None, "max_price": None, "is_available": None, "category": None}
+    print(f"{'case':<28}{'rows':>10}{'projection ms':>16}{'index ms':>12}{'mask ms':>12}")
+    with Session() as db:
+        for case, filters in CASES.items():
+            timings = []
+            for read_path in ("projection", "index"):
+                services.stock.READ_PATH = read_path
+                fetch = lambda: services.stock.get_stocks_service(db=db, **{**arguments, **filters})
+                rows = len(fetch()[0])
+                timings.append(best_ms(fetch, args.repeat))
+
+            # The masks of the filters that need no query, over the whole arrays
+            tests = []
+            if "max_price" in filters:
+                tests.append(lambda columns, part: columns["price"][part] <= filters["max_price"])
+            if "is_available" in filters:
+                tests.append(lambda columns, part: columns["is_available"][part] == filters["is_available"])
+            mask = best_ms(lambda: index._matches(0, index._size, tests), args.repeat)
+
+            print(f"{case:<28}{rows:>10}{timings[0]:>16.2f}{timings[1]:>12.2f}{mask:>12.2f}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
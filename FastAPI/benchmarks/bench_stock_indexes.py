@@ -0,0 +1,103 @@
+"""
+Show the scan-to-seek change of the `get_stocks_service` filters once the stock indexes exist.
+
+Builds a database without the stock indexes (like an old sample.db), captures the SQL the
+service runs for each filter, prints its EXPLAIN QUERY PLAN and timing, then runs
+`database.migrations.upgrade` and repeats.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_stock_indexes --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from database.migrations import upgrade
+from database.session import Base
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from services.stock import get_stocks_service
+
+FILTERS = {
+    "max_price": {"max_price": 1.5},
+    "is_available + max_price": {"is_available": False, "max_price": 1.5},
+    "store_id": {"store_id": 7},
+    "product_id": {"product_id": 42},
+}
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(1000)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(10000)])
+        connection.execute(insert(Stock), [
+            {
+                "store_id": i % 1000 + 1,
+                "product_id": i % 10000 + 1,
+                "price": float(i % 100000),
+                "is_available": i % 10 != 0,
+                "category": ("Tênis", "Camisa", "Boné")[i % 3],
+            }
+            for i in range(rows)
+        ])
+        # Drop the declared indexes to start from a pre-migration database
+        for index in Stock.__table__.indexes:
+            connection.execute(text(f"DROP INDEX {index.name}"))
+
+
+def run_filters(engine, Session):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    for label, filters in FILTERS.items():
+        arguments = {"product_name": None, "store_name": None, "max_price": None, "is_available": None, "category": None}
+        arguments.update(filters)
+
+        statements.clear()
+        with Session() as db:
+            start = time.perf_counter()
+            rows = len(get_stocks_service(db=db, **arguments))
+            elapsed = (time.perf_counter() - start) * 1000
+
+        statement, parameters = statements[0]
+        with engine.connect() as connection:
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+
+        print(f"  {label}: {rows} rows in {elapsed:.1f} ms")
+        for step in plan:
+            print(f"      {step[-1]}")
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Session = sessionmaker(bind=engine)
+    seed(engine, args.rows)
+
+    print("Before migration")
+    run_filters(engine, Session)
+
+    print(f"Migration created: {', '.join(upgrade(engine))}")
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    print("After migration")
+    run_filters(engine, Session)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compare the name filters of `GET /stock` joining products and stores with the same filters on the
+name copies of the stock rows (see database/stock_names.py), and time a rename propagated by the triggers.
+
+"join" selects the names from products and stores and filters on them, like the projection read
+path did before the copies. "denormalized" reads and filters the stock table alone, as it does now.
+The plan SQLite picks for each is printed under the timings.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_stock_names --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from database.migrations import upgrade
+from database.name_match import equals_ignore_case, starts_with_ignore_case
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from services.stock import STOCK_COLUMNS
+
+STOCK_ONLY = (Stock.id, Stock.store_id, Stock.product_id, Stock.price, Stock.is_available, Stock.category)
+
+# Case -> filter over the joined names, filter over the copies
+CASES = {
+    "product_name_exact": (
+        equals_ignore_case(Product.name, "product 7"),
+        equals_ignore_case(Stock.product_name, "product 7"),
+    ),
+    "product_name_prefix": (
+        starts_with_ignore_case(Product.name, "product 12"),
+        starts_with_ignore_case(Stock.product_name, "product 12"),
+    ),
+    "store_name_exact + max_price": (
+        equals_ignore_case(Store.name, "store 7") & (Stock.price <= 50000.5),
+        equals_ignore_case(Stock.store_name, "store 7") & (Stock.price <= 50000.5),
+    ),
+    "product_name short contains": (
+        Product.name.ilike("%7%") & (Stock.price <= 1000.5),
+        Stock.product_name.ilike("%7%") & (Stock.price <= 1000.5),
+    ),
+    "max_price (names shown)": (
+        Stock.price <= 100.5,
+        Stock.price <= 100.5,
+    ),
+}
+
+
+def seed(engine, rows: int):
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(1, 1001)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(1, 10001)])
+        for start in range(0, rows, 100_000):
+            connection.execute(insert(Stock), [
+                {
+                    "store_id": i % 1000 + 1,
+                    "product_id": i % 10000 + 1,
+                    "price": float(i % 100000),
+                    "is_available": i % 10 != 0,
+                    "category": ("Tênis", "Camisa", "Boné")[i % 3],
+                    "product_name": f"Product {i % 10000 + 1}",
+                    "store_name": f"Store {i % 1000 + 1}",
+                }
+                for i in range(start, min(start + 100_000, rows))
+            ])
+
+
+def best_ms(call, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    seed(engine, args.rows)
+    Session = sessionmaker(bind=engine)
+
+    plans = {}
+    print(f"{'case':<32}{'rows':>8}{'join ms':>12}{'denormalized ms':>18}")
+    with Session() as db:
+        for case, (joined_filter, copied_filter) in CASES.items():
+            joined = (
+                select(*STOCK_ONLY, Product.name, Store.name)
+                .join(Product, Product.id == Stock.product_id)
+                .join(Store, Store.id == Stock.store_id)
+                .where(joined_filter)
+            )
+            copied = select(*STOCK_COLUMNS).where(copied_filter)
+
+            rows = len(db.execute(copied).all())
+            assert rows == len(db.execute(joined).all())
+            timings = [best_ms(lambda: db.execute(query).all(), args.repeat) for query in (joined, copied)]
+            print(f"{case:<32}{rows:>8}{timings[0]:>12.2f}{timings[1]:>18.2f}")
+
+            for name, query in (("join", joined), ("denormalized", copied)):
+                sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+                plans[(case, name)] = [row[3] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+        # A rename is copied to every stock row of the product by the trigger, in the same statement
+        rename = lambda: db.execute(update(Product).where(Product.id == 7).values(name=f"Product 7 {time.perf_counter()}"))
+        stock_per_product = args.rows // 10000
+        print(f"\nRename copied to {stock_per_product} stock rows: {best_ms(rename, args.repeat):.2f} ms")
+        db.rollback()
+
+    print()
+    for (case, name), plan in plans.items():
+        print(f"{case} ({name}):")
+        for step in plan:
+            print(f"    {step}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
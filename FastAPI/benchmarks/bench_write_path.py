@@ -0,0 +1,214 @@
+"""
+Compare the writes per second of the write services, and the statements each sends, before and after
+they were rewritten around `INSERT/UPDATE/DELETE ... RETURNING`.
+
+"before" reproduces the previous services: the row is loaded, changed through the ORM, flushed and
+committed, then read again by `refresh` (or, for create_stock, the store and product are loaded and
+the stock appended to both collections). "after" calls the services as they are: one statement
+returning the row, the `table_versions` counter bump and the commit. Each write is its own
+transaction on a file database, like a request. The statements are counted without the COMMIT.
+
+Run from the FastAPI folder:
+    python -m benchmarks.bench_write_path --writes 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from database.migrations import upgrade
+from database.profile import configure_engine
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from schemas.product import ProductCreate, ProductUpdate
+from schemas.store import StoreCreate, StoreUpdate
+from schemas.stock import StockCreate, StockUpdate
+from services.cache import record_change
+from services.product import create_product_service, update_product_service
+from services.store import create_store_service, update_store_service
+from services.stock import create_stock_service, delete_stock_service, update_stock_service
+
+STORES = 100
+PRODUCTS = 1000
+STOCK_PER_STORE = 1000
+
+
+def seed(engine):
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"name": f"Store {i}"} for i in range(1, STORES + 1)])
+        connection.execute(insert(Product), [{"name": f"Product {i}"} for i in range(1, PRODUCTS + 1)])
+        connection.execute(insert(Stock), [
+            {
+                "store_id": i % STORES + 1,
+                "product_id": i % PRODUCTS + 1,
+                "price": float(i),
+                "is_available": True,
+                "category": "Tênis",
+            }
+            for i in range(STORES * STOCK_PER_STORE)
+        ])
+
+
+# ------------ Previous services ------------
+
+def create_store_before(store, db):
+    new_store = Store(name=store.name)
+    db.add(new_store)
+    db.flush()
+    record_change(db, "stores", None, new_store._asdict_no_stock())
+    db.commit()
+    db.refresh(new_store)
+    return new_store._asdict_no_stock()
+
+
+def update_store_before(store_id, store_update, db):
+    store = db.query(Store).filter(Store.id == store_id).first()
+    old = store._asdict_no_stock()
+    store.name = store_update.name
+    record_change(db, "stores", old, store._asdict_no_stock())
+    db.commit()
+    db.refresh(store)
+    return store._asdict_no_stock()
+
+
+def create_product_before(product, db):
+    new_product = Product(name=product.name)
+    db.add(new_product)
+    db.flush()
+    record_change(db, "products", None, new_product._asdict_no_stock())
+    db.commit()
+    db.refresh(new_product)
+    return new_product._asdict_no_stock()
+
+
+def update_product_before(product_id, product_update, db):
+    product = db.query(Product).filter(Product.id == product_id).first()
+    old = product._asdict_no_stock()
+    product.name = product_update.name
+    record_change(db, "products", old, product._asdict_no_stock())
+    db.commit()
+    db.refresh(product)
+    return product._asdict_no_stock()
+
+
+def create_stock_before(stock, db):
+    store = db.query(Store).filter(Store.id == stock.store_id).first()
+    product = db.query(Product).filter(Product.id == stock.product_id).first()
+    new_stock = Stock(**stock.model_dump(), product_name=product.name, store_name=store.name)
+    store.stock.append(new_stock)
+    product.stock.append(new_stock)
+    db.add(new_stock)
+    db.flush()
+    record_change(db, "stock", None, new_stock._asdict())
+    db.commit()
+    db.refresh(new_stock)
+    return new_stock._asdict()
+
+
+def update_stock_before(db, stock_id, stock_update):
+    stock = db.query(Stock).filter(Stock.id == stock_id).first()
+    old = stock._asdict()
+    stock.price = stock_update.price
+    record_change(db, "stock", old, stock._asdict())
+    db.commit()
+    db.refresh(stock)
+    return stock._asdict()
+
+
+def delete_stock_before(stock_id, db):
+    stock = db.query(Stock).filter(Stock.id == stock_id).first()
+    deleted = stock._asdict()
+    db.delete(stock)
+    record_change(db, "stock", deleted, None)
+    db.commit()
+    return {"stock_id": stock_id}
+
+
+# Endpoint -> previous service and current service, both called with the index of the write and a session
+CASES = {
+    "POST /store": (
+        lambda i, db: create_store_before(StoreCreate(name=f"New store {i}"), db),
+        lambda i, db: create_store_service(StoreCreate(name=f"New store {i}"), db),
+    ),
+    "PUT /store/{id}": (
+        lambda i, db: update_store_before(i % STORES + 1, StoreUpdate(name=f"Store {i}"), db),
+        lambda i, db: update_store_service(i % STORES + 1, StoreUpdate(name=f"Store {i}"), db),
+    ),
+    "POST /product": (
+        lambda i, db: create_product_before(ProductCreate(name=f"New product {i}"), db),
+        lambda i, db: create_product_service(ProductCreate(name=f"New product {i}"), db),
+    ),
+    "PUT /product/{id}": (
+        lambda i, db: update_product_before(i % PRODUCTS + 1, ProductUpdate(name=f"Product {i}"), db),
+        lambda i, db: update_product_service(i % PRODUCTS + 1, ProductUpdate(name=f"Product {i}"), db),
+    ),
+    "POST /stock": (
+        lambda i, db: create_stock_before(StockCreate(store_id=1, product_id=1, price=i, is_available=True, category="Boné"), db),
+        lambda i, db: create_stock_service(StockCreate(store_id=1, product_id=1, price=i, is_available=True, category="Boné"), db),
+    ),
+    "PUT /stock/{id}": (
+        lambda i, db: update_stock_before(db, i + 1, StockUpdate(price=i + 0.5)),
+        lambda i, db: update_stock_service(db, i + 1, StockUpdate(price=i + 0.5)),
+    ),
+    # Each run deletes its own range of ids
+    "DELETE /stock/{id}": (
+        lambda i, db: delete_stock_before(i + 1, db),
+        lambda i, db: delete_stock_service(STORES * STOCK_PER_STORE // 2 + i + 1, db),
+    ),
+}
+
+
+def run(Session, write, writes: int) -> float:
+    start = time.perf_counter()
+    for i in range(writes):
+        with Session() as db:
+            write(i, db)
+    return writes / (time.perf_counter() - start)
+
+
+def count_statements(engine, Session, write, i: int) -> int:
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        with Session() as db:
+            write(i, db)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writes", type=int, default=1000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    configure_engine(engine)
+    seed(engine)
+    sessions = {
+        # As the sessions were configured before
+        "before": sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        "after": sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine),
+    }
+
+    print(f"{'endpoint':<22}{'before writes/s':>18}{'after writes/s':>18}{'before stmts':>15}{'after stmts':>14}")
+    for endpoint, writes in CASES.items():
+        rates, statements = [], []
+        for write, Session in zip(writes, sessions.values()):
+            # One write outside the timing counts the statements, its ids are past the timed ones
+            statements.append(count_statements(engine, Session, write, args.writes))
+            rates.append(run(Session, write, args.writes))
+        print(f"{endpoint:<22}{rates[0]:>18.0f}{rates[1]:>18.0f}{statements[0]:>15}{statements[1]:>14}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
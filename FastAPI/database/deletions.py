@@ -0,0 +1,61 @@
+"""
+Stores and products deleted in the background, and the criterion hiding them until they are gone.
+
+`DELETE /store/{id}?mode=async` and `DELETE /product/{id}?mode=async` only add a `deletions` row,
+whose id is the job id the request answers with. From that commit on, every read and write filters
+the row and its stock out with `visible`, while `services/deletion.py` deletes the stock in chunks
+of short transactions, then the row itself, and marks the deletion done.
+"""
+from sqlalchemy import ColumnElement, Index, Select, and_, select
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Any
+
+from database.session import Base
+
+# Column of the stock pointing at each table whose rows can be deleted in the background
+PARENT_COLUMNS = {"stores": "store_id", "products": "product_id"}
+
+
+class Deletion(Base):
+    __tablename__ = "deletions"
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    table_name: Mapped[str] = mapped_column(nullable=False)  # "stores" or "products"
+    row_id: Mapped[int] = mapped_column(nullable=False)
+    purged: Mapped[int] = mapped_column(nullable=False, default=0)  # Stock rows deleted so far
+    done: Mapped[bool] = mapped_column(nullable=False, default=False)
+
+    def _asdict(self):
+        return {
+            "id": self.id,
+            "table": self.table_name,
+            "row_id": self.row_id,
+            "purged": self.purged,
+            "done": self.done,
+        }
+
+
+# The pending deletions alone, which every read looks up, stay in a small index
+Index("ix_deletions_pending", Deletion.table_name, Deletion.row_id, sqlite_where=Deletion.done.is_(False))
+
+
+def pending_ids(table: str) -> Select:
+    """
+    Ids of the rows of `table`, "stores" or "products", whose deletion is not done.
+    """
+    return select(Deletion.row_id).where(Deletion.table_name == table, Deletion.done.is_(False))
+
+
+def visible(model: Any) -> ColumnElement[bool]:
+    """
+    Criterion leaving out the rows of `model` being deleted in the background.
+
+    Args:
+        model (Any): `Store`, `Product` or `Stock`. A stock is left out when its store or its product is.
+
+    Returns:
+        ColumnElement[bool]: For `Query.filter` or `Select.where`. SQLite runs each subquery once per
+            statement, over the pending deletions alone.
+    """
+    if model.__tablename__ in PARENT_COLUMNS:
+        return model.id.not_in(pending_ids(model.__tablename__))
+    return and_(*(getattr(model, column).not_in(pending_ids(table)) for table, column in PARENT_COLUMNS.items()))
@@ -0,0 +1,129 @@
+"""
+Bring an existing database file up to the schema declared by the models, in place.
+
+`Base.metadata.create_all` only creates missing tables (and their indexes), so columns and objects
+added to tables that already exist in `sample.db` are created here instead. A table whose foreign
+keys have another ON DELETE action than its model, which ALTER TABLE can not change, is rebuilt.
+
+Run from the app folder:
+    python -m database.migrations
+"""
+from sqlalchemy import Table
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+from typing import Dict, List
+
+from database.session import Base, engine
+from database.fts import NAME_SEARCH_TABLES, create_name_search
+from database.stock_names import create_stock_names, repair_stock_names
+
+# Register every model with Base.metadata
+import models.store  # noqa: F401
+import models.product  # noqa: F401
+import models.stock  # noqa: F401
+import database.table_versions  # noqa: F401
+import database.deletions  # noqa: F401
+
+
+def _on_delete_actions(connection: Connection, table: Table) -> Dict[str, str]:
+    """
+    ON DELETE action of the foreign key of each column, as the database has it.
+    """
+    return {row[3]: row[6] for row in connection.exec_driver_sql(f"PRAGMA foreign_key_list({table.name})")}
+
+
+def _rebuild_table(bind: Engine, table: Table) -> None:
+    """
+    Recreate `table` as its model declares it, keeping its rows, following the steps SQLite documents
+    for the changes ALTER TABLE can not make (https://www.sqlite.org/lang_altertable.html#otheralter).
+
+    Rows whose parent no longer exists are left out, the enforced foreign keys would reject them.
+    The indexes and triggers of the table are dropped with it, `upgrade` creates them again.
+    """
+    new_name = f"{table.name}_new"
+    with bind.connect() as connection:
+        # Only takes effect outside a transaction. Off, dropping the table deletes no rows first
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        # The triggers of other tables refer to the table by name, the rename checks them while it is missing
+        connection.exec_driver_sql("PRAGMA legacy_alter_table=ON")
+        connection.commit()
+        try:
+            with connection.begin():
+                existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+                columns = ", ".join(column.name for column in table.columns if column.name in existing)
+                parents_exist = " AND ".join(
+                    f"{key.parent.name} IN (SELECT {key.column.name} FROM {key.column.table.name})"
+                    for key in table.foreign_keys
+                )
+
+                # Left over by an interrupted run
+                connection.exec_driver_sql(f"DROP TABLE IF EXISTS {new_name}")
+                create = str(CreateTable(table).compile(dialect=connection.dialect)).strip()
+                connection.exec_driver_sql(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {new_name} ", 1))
+                connection.exec_driver_sql(
+                    f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name} WHERE {parents_exist}"
+                )
+                connection.exec_driver_sql(f"DROP TABLE {table.name}")
+                connection.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {table.name}")
+        finally:
+            connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+            connection.exec_driver_sql("PRAGMA legacy_alter_table=OFF")
+            connection.commit()
+
+
+def upgrade(bind: Engine) -> List[str]:
+    """
+    Create the missing tables, columns, indexes, full-text indexes and triggers, rebuilding only the
+    tables whose foreign keys changed.
+
+    Args:
+        bind (Engine): Engine of the database to upgrade.
+
+    Returns:
+        List[str]: Names of the rebuilt tables, the columns, as `table.column`, indexes and triggers
+            that were created.
+    """
+    Base.metadata.create_all(bind=bind)
+
+    created = []
+    for table in Base.metadata.sorted_tables:
+        with bind.connect() as connection:
+            actions = _on_delete_actions(connection, table)
+        declared = {key.parent.name: (key.ondelete or "NO ACTION").upper() for key in table.foreign_keys}
+        if any(actions.get(column) != action for column, action in declared.items()):
+            _rebuild_table(bind, table)
+            created.append(f"{table.name} foreign keys")
+
+    with bind.begin() as connection:
+        # New nullable columns are added as they are, rows already there get NULL
+        for table in Base.metadata.sorted_tables:
+            columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+            for column in table.columns:
+                if column.name not in columns:
+                    column_type = column.type.compile(dialect=connection.dialect)
+                    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                    created.append(f"{table.name}.{column.name}")
+
+        # Read the names from sqlite_master, the inspector skips expression indexes
+        existing = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+                    created.append(index.name)
+
+        for source in NAME_SEARCH_TABLES:
+            if create_name_search(connection, source):
+                created.append(f"{source}_fts")
+
+        if create_stock_names(connection):
+            created.append("stock_names triggers")
+            # Copy the names to the rows written before the triggers, which keep them from then on
+            repair_stock_names(connection)
+
+    return created
+
+
+if __name__ == "__main__":
+    created = upgrade(engine)
+    print(f"Created: {', '.join(created)}" if created else "Database is up to date")
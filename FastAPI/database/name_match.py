@@ -0,0 +1,30 @@
+"""
+Exact and prefix name matches that can seek the `COLLATE NOCASE` name indexes of products, stores
+and the name copies on stock.
+
+Both are case-insensitive for ASCII like SQLite's NOCASE collation. Unlike `ilike`, which
+compiles to `lower(name) LIKE lower(?)`, the compared column is left bare so SQLite can use the
+index.
+"""
+from sqlalchemy import ColumnElement, and_
+from sqlalchemy.orm import InstrumentedAttribute
+
+# Sorts after any character a name can continue with, `prefix + MAX_CHAR` bounds the prefix range
+MAX_CHAR = chr(0x10FFFF)
+
+
+def equals_ignore_case(column: InstrumentedAttribute, value: str) -> ColumnElement[bool]:
+    """
+    Criterion matching names equal to `value`, ignoring case.
+    """
+    return column.collate("NOCASE") == value
+
+
+def starts_with_ignore_case(column: InstrumentedAttribute, prefix: str) -> ColumnElement[bool]:
+    """
+    Criterion matching names starting with `prefix`, ignoring case.
+    """
+    # A plain range instead of LIKE: no wildcards to escape, and a keyset bound placed before it
+    # can start the index range (SQLite always seeks from the bounds LIKE generates)
+    name = column.collate("NOCASE")
+    return and_(name >= prefix, name < prefix + MAX_CHAR)
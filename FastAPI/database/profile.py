@@ -0,0 +1,55 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Dict, Optional, Union
+
+# PRAGMAs applied to every new pooled connection, selected with the SQLITE_PROFILE env var, on top of
+# foreign_keys=ON
+ENGINE_PROFILES: Dict[str, Dict[str, Union[int, str]]] = {
+    # SQLite defaults: rollback journal, a writer blocks every reader
+    "default": {},
+    # WAL lets readers run alongside the single writer, the rest trades durability on power loss for speed
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # ms to wait on a locked database before raising "database is locked"
+        "cache_size": -64000,  # negative means KiB, so 64 MiB of page cache per connection
+        "mmap_size": 268435456,  # 256 MiB memory mapped reads
+        "temp_store": "MEMORY",
+    },
+}
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+
+
+def configure_engine(engine: Engine, profile: Optional[str] = None) -> Engine:
+    """
+    Apply the PRAGMAs of an engine profile on every connection the engine opens.
+
+    Args:
+        engine (Engine): The engine to configure. For an AsyncEngine pass `async_engine.sync_engine`.
+        profile (Optional[str]): Name of the profile in ENGINE_PROFILES. Defaults to SQLITE_PROFILE.
+
+    Returns:
+        Engine: The same engine, for chaining.
+
+    Raises:
+        ValueError: If the profile does not exist.
+    """
+    profile = profile or SQLITE_PROFILE
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile '{profile}', expected one of {', '.join(ENGINE_PROFILES)}")
+
+    # Every profile enforces the foreign keys, whose ON DELETE CASCADE deletes the stock of a deleted
+    # store or product
+    pragmas = {"foreign_keys": "ON", **ENGINE_PROFILES[profile]}
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
@@ -1,18 +1,96 @@
+import os
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Callable, Union
+
+from database.profile import configure_engine
 
 DATABASE_URL = "sqlite:///sample.db?charset=utf8"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///sample.db?charset=utf8"
+
+# "sync" runs the services on Starlette's threadpool, "async" runs them on the event loop
+DB_MODE = os.getenv("DB_MODE", "sync")
 
 engine = create_engine(DATABASE_URL)
+# aiosqlite defaults to NullPool, keep connections (and their worker threads) around between requests
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+configure_engine(engine)
+configure_engine(async_engine.sync_engine)
+
+# The write services return the rows their statements return, nothing is read again after a commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine)
 
 Base = declarative_base()
 
 # For FastAPI
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+get_db = get_async_db if DB_MODE == "async" else get_sync_db
+
+
+async def run_service(db: Union[Session, AsyncSession], service: Callable[[Session], Any]) -> Any:
+    """
+    Run a service function against the session given by `get_db`.
+
+    Args:
+        db (Union[Session, AsyncSession]): Session yielded by the `get_db` dependency.
+        service (Callable[[Session], Any]): Function receiving a sync Session.
+
+    Returns:
+        Any: Whatever the service returns.
+    """
+    if isinstance(db, AsyncSession):
+        # The sync service runs inside a greenlet, every database call awaits the aiosqlite driver
+        return await db.run_sync(service)
+
+    return await run_in_threadpool(service, db)
+
+
+async def run_detached_service(db: Union[Session, AsyncSession], service: Callable[[Session], Any]) -> Any:
+    """
+    Run a service function against a session of its own, bound like the session given by `get_db`.
+
+    For the reads other requests await as well: the session of the request starting one is
+    closed when that request is cancelled, while the read goes on for the others.
+
+    Args:
+        db (Union[Session, AsyncSession]): Session yielded by the `get_db` dependency, only its bind is used.
+        service (Callable[[Session], Any]): Function receiving a sync Session.
+
+    Returns:
+        Any: Whatever the service returns.
+    """
+    if isinstance(db, AsyncSession):
+        async with AsyncSession(bind=db.bind, autoflush=False, expire_on_commit=False) as session:
+            return await session.run_sync(service)
+
+    def run() -> Any:
+        with Session(bind=db.get_bind(), autoflush=False, expire_on_commit=False) as session:
+            return service(session)
+
+    return await run_in_threadpool(run)
+
+
+async def rollback(db: Union[Session, AsyncSession]) -> None:
+    """
+    Rollback the session given by `get_db`, whichever mode it is in.
+    """
+    if isinstance(db, AsyncSession):
+        await db.rollback()
+    else:
+        db.rollback()
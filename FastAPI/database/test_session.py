@@ -1,15 +1,28 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
+from database.profile import configure_engine
+
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+
+configure_engine(engine)
+configure_engine(async_engine.sync_engine)
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+AsyncTestingSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine)
 
 def override_get_db():
     try:
         db = TestingSessionLocal()
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
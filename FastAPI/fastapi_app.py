@@ -1,25 +1,36 @@
 import uvicorn
 
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response, status, Request
 from fastapi.responses import JSONResponse
+from pydantic_core import PydanticSerializationError, ValidationError
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 
 from schemas.product import ProductCreate, ProductResponse, ProductUpdate
 from schemas.store import StoreCreate, StoreResponse, StoreUpdate
-from schemas.stock import StockCreate, StockResponse, StockUpdate
+from schemas.stock import StockBulkUpdate, StockCreate, StockResponse, StockUpdate, StockWhereUpdate
 
 from services.product import *
 from services.store import *
 from services.stock import *
+from services.cache import cache_stats, cached_read, coalesce, read_validators_async
+from services.deletion import get_deletion_service, purger
+from services.name_cache import name_cache
+from services.stock_index import stock_index
 
-from database.session import Base, engine, get_db
+from database.loaders import READ_PATH
+from database.session import SessionLocal, engine, get_db, run_detached_service, run_service, rollback
+from database.migrations import upgrade
 
+from utils.bulk import BulkError
 from utils.response import create_response
+from utils.conditional import not_modified, validator_headers
+from utils.pagination import MAX_PAGE_SIZE
 
 app = FastAPI()
 limiter = Limiter(key_func=get_remote_address)
@@ -40,9 +51,9 @@ def limited_endpoint(request: Request):
 # ------------ API POST ------------
 
 @app.post("/store", response_model=StoreResponse)
-def create_store_endpoint(store: StoreCreate, db: Session = Depends(get_db)):
+async def create_store_endpoint(store: StoreCreate, db: Union[Session, AsyncSession] = Depends(get_db)):
     try:
-        new_store = create_store_service(store, db)
+        new_store = await run_service(db, lambda session: create_store_service(store, session))
         
         return create_response(
             status_code=status.HTTP_201_CREATED,
@@ -51,18 +62,42 @@ def create_store_endpoint(store: StoreCreate, db: Session = Depends(get_db)):
         )
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.post("/store/bulk", response_model=List[StoreResponse])
+async def create_stores_bulk_endpoint(stores: List[StoreCreate], db: Union[Session, AsyncSession] = Depends(get_db)):
+    try:
+        new_stores = await run_service(db, lambda session: create_stores_bulk_service(stores, session))
+
+        return create_response(
+            status_code=status.HTTP_201_CREATED,
+            message="Stores created successfully",
+            data=new_stores
+        )
+    
+    except BulkError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors)
+    
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
+    except Exception as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 
 @app.post("/product", response_model=ProductResponse)
-def create_product_endpoint(product: ProductCreate, db: Session = Depends(get_db)):
+async def create_product_endpoint(product: ProductCreate, db: Union[Session, AsyncSession] = Depends(get_db)):
     try:
-        new_product = create_product_service(product, db)
+        new_product = await run_service(db, lambda session: create_product_service(product, session))
 
         return create_response(
             status_code=status.HTTP_201_CREATED,
@@ -71,18 +106,42 @@ def create_product_endpoint(product: ProductCreate, db: Session = Depends(get_db
         )
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.post("/product/bulk", response_model=List[ProductResponse])
+async def create_products_bulk_endpoint(products: List[ProductCreate], db: Union[Session, AsyncSession] = Depends(get_db)):
+    try:
+        new_products = await run_service(db, lambda session: create_products_bulk_service(products, session))
+
+        return create_response(
+            status_code=status.HTTP_201_CREATED,
+            message="Products created successfully",
+            data=new_products
+        )
+    
+    except BulkError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors)
+    
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    
+    except Exception as e:
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.post("/stock", response_model=StockResponse)
-def create_stock_endpoint(stock: StockCreate, db: Session = Depends(get_db)):
+async def create_stock_endpoint(stock: StockCreate, db: Union[Session, AsyncSession] = Depends(get_db)):
     try:
-        new_stock = create_stock_service(stock, db)
+        new_stock = await run_service(db, lambda session: create_stock_service(stock, session))
 
         return create_response(
             status_code=status.HTTP_201_CREATED,
@@ -94,104 +153,372 @@ def create_stock_endpoint(stock: StockCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.post("/stock/bulk", response_model=List[StockResponse])
+async def create_stock_bulk_endpoint(stocks: List[StockCreate], db: Union[Session, AsyncSession] = Depends(get_db)):
+    try:
+        new_stock = await run_service(db, lambda session: create_stock_bulk_service(stocks, session))
+
+        return create_response(
+            status_code=status.HTTP_201_CREATED,
+            message="Stocks created successfully",
+            data=new_stock
+        )
+    
+    except BulkError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors)
+    
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
+    except Exception as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 
 # ------------ API GET ------------
 
 @app.get("/store", response_model=List[StoreResponse])
-def get_stores_endpoint(
-    id: Optional[int] = None, name: Optional[str] = None, db: Session = Depends(get_db)
+async def get_stores_endpoint(
+    id: Optional[int] = None,
+    name: Optional[str] = None,
+    name_exact: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include: Literal["stock", "summary", "none"] = "stock",
+    stock_limit: Optional[int] = Query(None, ge=1),
+    if_none_match: Optional[str] = Header(None),
+    db: Union[Session, AsyncSession] = Depends(get_db)
 ):
     try:
-        stores = get_stores_service(id=id, name=name, db=db)
+        params = dict(
+            id=id, name=name, name_exact=name_exact, name_prefix=name_prefix,
+            limit=limit, cursor=cursor, include=include, stock_limit=stock_limit
+        )
+        validators = await read_validators_async(db, "stores", params)
+        if not_modified(if_none_match, validators):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(validators))
+
+        stores, next_cursor, validators = await coalesce("stores", params, validators, lambda: run_detached_service(
+            db, lambda session: cached_read("stores", params, validators, lambda: get_stores_service(db=session, **params))
+        ))
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Stores fetched successfully",
-            data=stores
+            data=stores,
+            next_cursor=next_cursor,
+            headers=validator_headers(validators)
         )
     
+    except (ValidationError, PydanticSerializationError) as e:
+        # A row not matching its response model, not a missing one
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.get("/product", response_model=List[ProductResponse])
-def get_products_endpoint(id: Optional[int] = None, name: Optional[str] = None, db: Session = Depends(get_db)):
+async def get_products_endpoint(
+    id: Optional[int] = None,
+    name: Optional[str] = None,
+    name_exact: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include: Literal["stock", "summary", "none"] = "stock",
+    stock_limit: Optional[int] = Query(None, ge=1),
+    if_none_match: Optional[str] = Header(None),
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
     try:
-        products = get_products_service(id=id, name=name, db=db)
+        params = dict(
+            id=id, name=name, name_exact=name_exact, name_prefix=name_prefix,
+            limit=limit, cursor=cursor, include=include, stock_limit=stock_limit
+        )
+        validators = await read_validators_async(db, "products", params)
+        if not_modified(if_none_match, validators):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(validators))
+
+        products, next_cursor, validators = await coalesce("products", params, validators, lambda: run_detached_service(
+            db, lambda session: cached_read("products", params, validators, lambda: get_products_service(db=session, **params))
+        ))
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Products fetched successfully",
-            data=products
+            data=products,
+            next_cursor=next_cursor,
+            headers=validator_headers(validators)
         )
     
+    except (ValidationError, PydanticSerializationError) as e:
+        # A row not matching its response model, not a missing one
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.get("/stock", response_model=List[StockResponse])
-def get_stocks_endpoint(
+async def get_stocks_endpoint(
     product_name: Optional[str] = None,
     store_name: Optional[str] = None,
     max_price: Optional[float] = None,
     is_available: Optional[bool] = None,
     category: Optional[str] = None,
-    db: Session = Depends(get_db)
+    store_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    product_name_exact: Optional[str] = None,
+    product_name_prefix: Optional[str] = None,
+    store_name_exact: Optional[str] = None,
+    store_name_prefix: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
+    try:
+        params = dict(
+            product_name=product_name,
+            store_name=store_name,
+            max_price=max_price,
+            is_available=is_available,
+            category=category,
+            store_id=store_id,
+            product_id=product_id,
+            product_name_exact=product_name_exact,
+            product_name_prefix=product_name_prefix,
+            store_name_exact=store_name_exact,
+            store_name_prefix=store_name_prefix,
+            limit=limit,
+            cursor=cursor
+        )
+        validators = await read_validators_async(db, "stock", params)
+        if not_modified(if_none_match, validators):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(validators))
+
+        stocks, next_cursor, validators = await coalesce("stock", params, validators, lambda: run_detached_service(
+            db, lambda session: cached_read("stock", params, validators, lambda: get_stocks_service(db=session, **params))
+        ))
+        return create_response(
+            status_code=status.HTTP_200_OK,
+            message="Stocks fetched successfully",
+            data=stocks,
+            next_cursor=next_cursor,
+            headers=validator_headers(validators)
+        )
+    
+    except (ValidationError, PydanticSerializationError) as e:
+        # A row not matching its response model, not a missing one
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    
+    except Exception as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/deletion/{deletion_id}")
+async def get_deletion_endpoint(deletion_id: int, db: Union[Session, AsyncSession] = Depends(get_db)):
+    try:
+        deletion = await run_service(db, lambda session: get_deletion_service(deletion_id, session))
+        return create_response(
+            status_code=status.HTTP_200_OK,
+            message="Deletion fetched successfully",
+            data=deletion
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    
+    except Exception as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/stats")
+async def get_stats_endpoint():
+    # Counters of this process alone, each worker keeps its own
+    return create_response(
+        status_code=status.HTTP_200_OK,
+        message="Stats fetched successfully",
+        data=cache_stats()
+    )
+
+
+@app.get("/store/{store_id}/stock", response_model=List[StockResponse])
+async def get_store_stock_endpoint(
+    store_id: int,
+    product_name: Optional[str] = None,
+    product_name_exact: Optional[str] = None,
+    product_name_prefix: Optional[str] = None,
+    max_price: Optional[float] = None,
+    is_available: Optional[bool] = None,
+    category: Optional[str] = None,
+    product_id: Optional[int] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Union[Session, AsyncSession] = Depends(get_db)
 ):
     try:
-        stocks = get_stocks_service(
-            db=db,
+        params = dict(
             product_name=product_name,
+            store_name=None,
+            max_price=max_price,
+            is_available=is_available,
+            category=category,
+            store_id=store_id,
+            product_id=product_id,
+            product_name_exact=product_name_exact,
+            product_name_prefix=product_name_prefix,
+            limit=limit,
+            cursor=cursor
+        )
+        validators = await read_validators_async(db, "stock", params)
+        if not_modified(if_none_match, validators):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(validators))
+
+        stocks, next_cursor, validators = await coalesce("stock", params, validators, lambda: run_detached_service(
+            db, lambda session: cached_read("stock", params, validators, lambda: get_stocks_service(db=session, **params))
+        ))
+        return create_response(
+            status_code=status.HTTP_200_OK,
+            message="Stocks fetched successfully",
+            data=stocks,
+            next_cursor=next_cursor,
+            headers=validator_headers(validators)
+        )
+    
+    except (ValidationError, PydanticSerializationError) as e:
+        # A row not matching its response model, not a missing one
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    
+    except Exception as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/product/{product_id}/stock", response_model=List[StockResponse])
+async def get_product_stock_endpoint(
+    product_id: int,
+    store_name: Optional[str] = None,
+    store_name_exact: Optional[str] = None,
+    store_name_prefix: Optional[str] = None,
+    max_price: Optional[float] = None,
+    is_available: Optional[bool] = None,
+    category: Optional[str] = None,
+    store_id: Optional[int] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
+    try:
+        params = dict(
+            product_name=None,
             store_name=store_name,
             max_price=max_price,
             is_available=is_available,
-            category=category
+            category=category,
+            store_id=store_id,
+            product_id=product_id,
+            store_name_exact=store_name_exact,
+            store_name_prefix=store_name_prefix,
+            limit=limit,
+            cursor=cursor
         )
+        validators = await read_validators_async(db, "stock", params)
+        if not_modified(if_none_match, validators):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(validators))
+
+        stocks, next_cursor, validators = await coalesce("stock", params, validators, lambda: run_detached_service(
+            db, lambda session: cached_read("stock", params, validators, lambda: get_stocks_service(db=session, **params))
+        ))
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Stocks fetched successfully",
-            data=stocks
+            data=stocks,
+            next_cursor=next_cursor,
+            headers=validator_headers(validators)
         )
     
+    except (ValidationError, PydanticSerializationError) as e:
+        # A row not matching its response model, not a missing one
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 # ------------ API DELETE ------------
 
 @app.delete("/store/{store_id}", status_code=status.HTTP_200_OK)
-def delete_store_endpoint(store_id: int, db: Session = Depends(get_db)):
+async def delete_store_endpoint(
+    store_id: int,
+    mode: Literal["sync", "async"] = "sync",
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
     try:
-        result = delete_store(store_id, db)
+        result = await run_service(db, lambda session: delete_store(store_id, session, mode))
+        if mode == "async":
+            # Hidden already, its stock is deleted by the worker of services/deletion.py
+            return create_response(
+                status_code=status.HTTP_202_ACCEPTED,
+                message="Store deletion started",
+                data=result
+            )
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Store deleted successfully",
@@ -202,18 +529,29 @@ def delete_store_endpoint(store_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.delete("/product/{product_id}", status_code=status.HTTP_200_OK)
-def delete_product_endpoint(product_id: int, db: Session = Depends(get_db)):
+async def delete_product_endpoint(
+    product_id: int,
+    mode: Literal["sync", "async"] = "sync",
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
     try:
-        result = delete_product_service(product_id, db)
+        result = await run_service(db, lambda session: delete_product_service(product_id, session, mode))
+        if mode == "async":
+            # Hidden already, its stock is deleted by the worker of services/deletion.py
+            return create_response(
+                status_code=status.HTTP_202_ACCEPTED,
+                message="Product deletion started",
+                data=result
+            )
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Product deleted successfully",
@@ -224,18 +562,18 @@ def delete_product_endpoint(product_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.delete("/stock/{stock_id}", status_code=status.HTTP_200_OK)
-def delete_stock_endpoint(stock_id: int, db: Session = Depends(get_db)):
+async def delete_stock_endpoint(stock_id: int, db: Union[Session, AsyncSession] = Depends(get_db)):
     try:
-        result = delete_stock_service(stock_id, db)
+        result = await run_service(db, lambda session: delete_stock_service(stock_id, session))
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Stock deleted successfully",
@@ -246,20 +584,20 @@ def delete_stock_endpoint(stock_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 # ------------ API UPDATE ------------
 
 @app.put("/store/{store_id}", response_model=StoreResponse)
-def update_store_endpoint(store_id: int, store_update: StoreUpdate, db: Session = Depends(get_db)):
+async def update_store_endpoint(store_id: int, store_update: StoreUpdate, db: Union[Session, AsyncSession] = Depends(get_db)):
     try:
-        store_data = update_store_service(store_id, store_update, db)
+        store_data = await run_service(db, lambda session: update_store_service(store_id, store_update, session))
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Store updated successfully",
@@ -270,18 +608,18 @@ def update_store_endpoint(store_id: int, store_update: StoreUpdate, db: Session
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.put("/product/{product_id}", response_model=ProductResponse)
-def update_product_endpoint(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
+async def update_product_endpoint(product_id: int, product_update: ProductUpdate, db: Union[Session, AsyncSession] = Depends(get_db)):
     try:
-        product_data = update_product_service(product_id, product_update, db)
+        product_data = await run_service(db, lambda session: update_product_service(product_id, product_update, session))
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Product updated successfully",
@@ -292,18 +630,18 @@ def update_product_endpoint(product_id: int, product_update: ProductUpdate, db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.put("/stock/{stock_id}", response_model=StockResponse)
-def update_stock_endpoint(stock_id: int, stock_update: StockUpdate, db: Session = Depends(get_db)):
+async def update_stock_endpoint(stock_id: int, stock_update: StockUpdate, db: Union[Session, AsyncSession] = Depends(get_db)):
     try:
-        updated_stock = update_stock_service(db, stock_id, stock_update)
+        updated_stock = await run_service(db, lambda session: update_stock_service(session, stock_id, stock_update))
         return create_response(
             status_code=status.HTTP_200_OK,
             message="Stock updated successfully",
@@ -314,16 +652,98 @@ def update_stock_endpoint(stock_id: int, stock_update: StockUpdate, db: Session
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.patch("/stock/bulk", response_model=List[StockResponse])
+async def update_stock_bulk_endpoint(stocks: List[StockBulkUpdate], db: Union[Session, AsyncSession] = Depends(get_db)):
+    try:
+        updated_stock = await run_service(db, lambda session: update_stock_bulk_service(stocks, session))
+        return create_response(
+            status_code=status.HTTP_200_OK,
+            message="Stocks updated successfully",
+            data=updated_stock
+        )
+
+    except BulkError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors)
+
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    except Exception as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.patch("/stock/where")
+async def update_stock_where_endpoint(
+    stock_update: StockWhereUpdate,
+    product_name: Optional[str] = None,
+    store_name: Optional[str] = None,
+    max_price: Optional[float] = None,
+    is_available: Optional[bool] = None,
+    category: Optional[str] = None,
+    store_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    product_name_exact: Optional[str] = None,
+    product_name_prefix: Optional[str] = None,
+    store_name_exact: Optional[str] = None,
+    store_name_prefix: Optional[str] = None,
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
+    try:
+        params = dict(
+            product_name=product_name,
+            store_name=store_name,
+            max_price=max_price,
+            is_available=is_available,
+            category=category,
+            store_id=store_id,
+            product_id=product_id,
+            product_name_exact=product_name_exact,
+            product_name_prefix=product_name_prefix,
+            store_name_exact=store_name_exact,
+            store_name_prefix=store_name_prefix
+        )
+        result = await run_service(db, lambda session: update_stock_where_service(session, stock_update, **params))
+        return create_response(
+            status_code=status.HTTP_200_OK,
+            message="Stocks updated successfully",
+            data=result
+        )
+
+    except (ValueError, LookupError) as e:
+        # Nothing to update, or no filter: the request is invalid, no stock is looked up
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    except SQLAlchemyError as e:
+        await rollback(db)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    except Exception as e:
+        await rollback(db)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 if __name__ == "__main__":
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Create all tables and add the indexes missing from an existing database
+    upgrade(engine)
+
+    # Loaded before serving, rather than by the first requests
+    with SessionLocal() as db:
+        if READ_PATH == "index":
+            name_cache.warm(db)
+            stock_index.build(db)
+
+    # Runs the background deletions, starting with the ones a previous run left pending
+    purger.start(SessionLocal)
     
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -1,13 +1,18 @@
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import List
 
 from database.session import Base
+from database.fts import add_name_search
 
 class Product(Base):
     __tablename__ = "products"
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     name: Mapped[str] = mapped_column(nullable=False)
-    stock: Mapped[List["Stock"]] = relationship(back_populates="product")  # Use forward reference
+    # Left to the ON DELETE CASCADE of stock.product_id, a deleted product does not load its stock
+    stock: Mapped[List["Stock"]] = relationship(
+        back_populates="product", order_by="Stock.id", cascade="save-update, merge, delete", passive_deletes=True
+    )  # Use forward reference
 
     def __repr__(self) -> str:
         return f"""<Product
@@ -33,4 +38,11 @@ class Product(Base):
         return [stock._asdict() for stock in self.stock]
 
     def getId(self):
-        return self.id
\ No newline at end of file
+        return self.id
+
+
+# Case-insensitive index for the exact and prefix name matches, see database/name_match.py
+Index("ix_products_name_nocase", Product.name.collate("NOCASE"))
+
+# Trigram full-text index over the name, see database/fts.py
+add_name_search(Product.__table__)
@@ -1,15 +1,20 @@
 
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import List
 
 from database.session import Base
+from database.fts import add_name_search
 from models.stock import Stock
 
 class Store(Base):
     __tablename__ = "stores"
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     name: Mapped[str] = mapped_column(nullable=False)
-    stock: Mapped[List[Stock]] = relationship(back_populates="store")
+    # Left to the ON DELETE CASCADE of stock.store_id, a deleted store does not load its stock
+    stock: Mapped[List[Stock]] = relationship(
+        back_populates="store", order_by="Stock.id", cascade="save-update, merge, delete", passive_deletes=True
+    )
 
     def _asdict(self):
         return {
@@ -28,4 +33,11 @@ class Store(Base):
         return [stock._asdict() for stock in self.stock]
 
     def getId(self):
-        return self.id
\ No newline at end of file
+        return self.id
+
+
+# Case-insensitive index for the exact and prefix name matches, see database/name_match.py
+Index("ix_stores_name_nocase", Store.name.collate("NOCASE"))
+
+# Trigram full-text index over the name, see database/fts.py
+add_name_search(Store.__table__)
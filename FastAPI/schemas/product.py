@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
-from typing import List
-from schemas.stock import StockResponse
+from typing import List, Optional
+from typing_extensions import TypedDict
+from schemas.stock import StockResponse, StockRow
 
 # --- CREATE MODELS ---
 class ProductCreate(BaseModel):
@@ -16,6 +17,27 @@ class ProductResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class ProductSummaryResponse(BaseModel):
+    id: int
+    name: str
+    stock_count: int
+    min_price: Optional[float]
+    max_price: Optional[float]
+
+    model_config = ConfigDict(from_attributes=True)
+
+# --- ROW TYPES ---
+# `ProductResponse` of the projection read path, which returns dicts
+class ProductRow(TypedDict):
+    id: int
+    name: str
+    stock: List[StockRow]
+
+# A product of include=none, without its stock
+class ProductNameRow(TypedDict):
+    id: int
+    name: str
+
 # --- UPDATE MODELS ---
 class ProductUpdate(BaseModel):
     name: str
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing_extensions import TypedDict
 
 # --- CREATE MODELS ---
 class StockCreate(BaseModel):
@@ -23,6 +24,18 @@ class StockResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+# --- ROW TYPES ---
+# `StockResponse` of the projection and index read paths, which return dicts
+class StockRow(TypedDict):
+    id: int
+    store_id: int
+    product_id: int
+    price: float
+    is_available: bool
+    category: str
+    product_name: str
+    store_name: str
+
 # --- UPDATE MODELS ---
 class StockUpdate(BaseModel):
     # Field(None) makes the field optional
@@ -30,4 +43,22 @@ class StockUpdate(BaseModel):
     is_available: bool = Field(None)
     category: str = Field(None)
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class StockBulkUpdate(StockUpdate):
+    id: int  # ID of the stock to update
+
+class StockWhereUpdate(BaseModel):
+    price: float = Field(None)
+    price_factor: float = Field(None)  # Multiplies the price of each stock
+    is_available: bool = Field(None)
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @model_validator(mode="after")
+    def check_price(self):
+        if self.price is None and self.price_factor is None and self.is_available is None:
+            raise ValueError("Nothing to update")
+        if self.price is not None and self.price_factor is not None:
+            raise ValueError("Set either price or price_factor")
+        return self
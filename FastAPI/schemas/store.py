@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
-from typing import List
-from .stock import StockResponse
+from typing import List, Optional
+from typing_extensions import TypedDict
+from .stock import StockResponse, StockRow
 
 # --- CREATE MODELS ---
 class StoreCreate(BaseModel):
@@ -16,6 +17,27 @@ class StoreResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class StoreSummaryResponse(BaseModel):
+    id: int
+    name: str
+    stock_count: int
+    min_price: Optional[float]
+    max_price: Optional[float]
+
+    model_config = ConfigDict(from_attributes=True)
+
+# --- ROW TYPES ---
+# `StoreResponse` of the projection read path, which returns dicts
+class StoreRow(TypedDict):
+    id: int
+    name: str
+    stock: List[StockRow]
+
+# A store of include=none, without its stock
+class StoreNameRow(TypedDict):
+    id: int
+    name: str
+
 # --- UPDATE MODELS ---
 class StoreUpdate(BaseModel):
     name: str
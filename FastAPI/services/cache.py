@@ -0,0 +1,382 @@
+"""
+Response cache between the GET list endpoints and `get_stocks_service`, `get_products_service` and
+`get_stores_service`, and the validators of conditional GETs on those endpoints.
+
+Entries are keyed on the service and its non-empty parameters. The write services report each row
+they create, update or delete with `record_change`, which evicts only the entries that row could
+change once the write commits: the ones whose filters match it before or after the write, or whose
+response shows it. Writes made by other processes are picked up from the `table_versions` counters
+before each lookup, and evict every entry read from the tables they wrote to.
+
+The updates sent as a single `UPDATE ... RETURNING` never read the row before, so they report the
+new row alone with `record_update`. Besides the entries its new values match, the ones that show
+the row are evicted then, whatever its old values were. A deleted product or store is reported
+alone as well, the ON DELETE CASCADE deleting its stock in the database.
+An update of any number of rows that returns none, `PATCH /stock/where`, reports only its table
+with `record_table_write`, and every entry read from it is evicted, as for a write of another process.
+
+The ETag of a read is derived from the counters of the tables it reads and its parameters, so it
+changes with any write to those tables and a matching `If-None-Match` is answered without a query.
+"""
+import hashlib
+import os
+
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, TypeVar
+
+from database.table_versions import on_table_change, watcher_for
+from schemas.product import ProductNameRow, ProductRow
+from schemas.stock import StockRow
+from schemas.store import StoreNameRow, StoreRow
+from utils.cache import TTLLRUCache
+from utils.response import RawJSON
+from utils.single_flight import SingleFlight
+
+RESPONSE_CACHE_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "1024"))
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 2 ** 20)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+
+response_cache = TTLLRUCache(RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_BYTES, RESPONSE_CACHE_TTL)
+# Identical reads running at the same time, over the same table counters, share one service call
+single_flight = SingleFlight()
+
+# Called with each change a commit of this process made, see `on_change`
+_change_listeners: List[Callable[[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]] = []
+
+T = TypeVar("T")
+
+
+class CachedRead(NamedTuple):
+    kind: str  # "stock", "products" or "stores", the table the service lists
+    params: Dict[str, Any]
+    result: Tuple[RawJSON, Optional[str]]  # The rows encoded to a JSON array, and the next cursor
+    ids: Dict[str, Set[int]]  # Product and store ids shown in the response
+
+
+class Validators(NamedTuple):
+    etag: str  # Strong ETag, quoted
+    last_modified: float  # Unix time
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Counters of the response cache and of request coalescing in this process, served by GET /stats.
+
+    Returns:
+        Dict[str, Dict[str, int]]: `response_cache`: its entries, their size in bytes, hits and
+            misses. `single_flight`: the reads that ran (`calls`) and the requests that waited for
+            one of them instead of reading (`coalesced`).
+    """
+    return {"response_cache": response_cache.stats(), "single_flight": single_flight.stats()}
+
+
+def read_validators(db: Session, kind: str, params: Dict[str, Any]) -> Optional[Validators]:
+    """
+    ETag and Last-Modified of a GET list read, without querying the tables it reads.
+
+    Args:
+        db (Session): Session of the read, an AsyncSession works as well.
+        kind (str): "stock", "products" or "stores".
+        params (Dict[str, Any]): Keyword arguments of the service, without the session.
+
+    Returns:
+        Optional[Validators]: None for an in-memory database, which has no shared counters.
+    """
+    watcher = watcher_for(db.get_bind())
+    if watcher is None:
+        return None
+
+    watcher.check()
+    key = _read_key(kind, params)
+    snapshot = watcher.versions(sorted(_read_tables(kind, dict(key[1]))))
+    digest = hashlib.blake2b(repr((snapshot.file, snapshot.versions, key)).encode(), digest_size=16).hexdigest()
+    return Validators(f'"{digest}"', snapshot.modified)
+
+
+async def read_validators_async(db: Session, kind: str, params: Dict[str, Any]) -> Optional[Validators]:
+    """
+    `read_validators` on the threadpool, whatever the DB_MODE: the watcher polls SQLite with the
+    blocking sqlite3 module, which would hold the event loop, even through `run_service` in async mode.
+    """
+    return await run_in_threadpool(read_validators, db, kind, params)
+
+
+def cached_read(
+    kind: str, params: Dict[str, Any], validators: Optional[Validators], read: Callable[[], Tuple[List[Any], Optional[str]]]
+) -> Tuple[RawJSON, Optional[str], Optional[Validators]]:
+    """
+    Return the cached result of a GET list service, or call it and cache its result.
+
+    Args:
+        kind (str): "stock", "products" or "stores".
+        params (Dict[str, Any]): Keyword arguments of the service, without the session.
+        validators (Optional[Validators]): `read_validators` of the read, taken before it. Taking
+            them polls for the writes of other processes, which evicts their entries.
+        read (Callable[[], Tuple[List[Any], Optional[str]]]): Calls the service with `params`.
+
+    Returns:
+        Tuple[RawJSON, Optional[str], Optional[Validators]]: The rows returned by the service, already
+            encoded to a JSON array, the next cursor and the validators of the read.
+    """
+    # Taken before reading, so the rows are never older than the counters the ETag is made of.
+    # An entry still cached is as new as the counters: commits evict it before they are seen.
+    key = _read_key(kind, params)
+
+    cached = response_cache.get(key)
+    if cached is not None:
+        return (*cached.result, validators)
+
+    return (*_read_and_cache(key, read), validators)
+
+
+# Dict rows of the projection and index read paths by kind and include, the shapes of the response models
+ROW_ADAPTERS: Dict[Tuple[str, Optional[str]], TypeAdapter] = {
+    ("stock", None): TypeAdapter(List[StockRow]),
+    ("products", "stock"): TypeAdapter(List[ProductRow]),
+    ("products", "none"): TypeAdapter(List[ProductNameRow]),
+    ("stores", "stock"): TypeAdapter(List[StoreRow]),
+    ("stores", "none"): TypeAdapter(List[StoreNameRow]),
+}
+
+
+def encode_rows(kind: str, params: Dict[str, Any], rows: List[Any]) -> bytes:
+    """
+    Encode the rows of a GET list service to a JSON array, checking the dict rows on the way.
+
+    Response models, validated when built, are encoded as they are. Dicts are encoded with the
+    `ROW_ADAPTERS` entry of their shape, which checks the type of every value against the response
+    model in the same pass, e.g. a string price, and writes only the fields of the model.
+
+    Raises:
+        PydanticSerializationError: If a value of a dict row does not have the type of its field.
+    """
+    adapter = ROW_ADAPTERS.get((kind, params.get("include")))
+    if adapter is None or not rows or not isinstance(rows[0], dict):
+        return to_json(rows)
+    return adapter.dump_json(rows, warnings="error")
+
+
+def _read_and_cache(
+    key: Tuple[str, Tuple[Tuple[str, Any], ...]], read: Callable[[], Tuple[List[Any], Optional[str]]]
+) -> Tuple[RawJSON, Optional[str]]:
+    kind, params = key
+    generation = response_cache.generation
+    rows, next_cursor = read()
+    # Encoded once here, every response served from the entry writes these bytes as they are
+    data = RawJSON(encode_rows(kind, dict(params), rows))
+    cached = CachedRead(kind, dict(params), (data, next_cursor), _shown_ids(kind, rows))
+    response_cache.put(key, cached, len(data.body), generation)
+    return data, next_cursor
+
+
+def coalesce(
+    kind: str, params: Dict[str, Any], validators: Optional[Validators], read: Callable[[], Awaitable[T]]
+) -> Awaitable[T]:
+    """
+    Await `read()`, or the identical read another request is awaiting on the event loop.
+
+    Both database modes await their reads on the loop, so requests are joined there, before a
+    threadpool thread or a connection is taken. Only reads of the same table counters are joined,
+    so a request made after a write never gets a result read before it.
+
+    Args:
+        kind (str): "stock", "products" or "stores".
+        params (Dict[str, Any]): Keyword arguments of the service, without the session.
+        validators (Optional[Validators]): `read_validators` of the read.
+        read (Callable[[], Awaitable[T]]): Runs `cached_read` with `run_detached_service`: the read
+            outlives the request starting it when that one is cancelled, not its session.
+    """
+    return single_flight.do_async((_read_key(kind, params), validators), read)
+
+
+def record_change(db: Session, table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    """
+    Evict the cached reads a write could change when the transaction of `db` commits.
+
+    Args:
+        db (Session): Session of the write, before its commit.
+        table (str): "stock", "products" or "stores".
+        old (Optional[Dict[str, Any]]): `_asdict()` of a stock or `_asdict_no_stock()` of a product or
+            store before the write, None on create. A deleted product or store stands for its stock too.
+        new (Optional[Dict[str, Any]]): The same after the write, None on delete.
+    """
+    db.info.setdefault("cache_changes", []).append((table, old, new, False))
+
+
+def record_update(db: Session, table: str, new: Dict[str, Any]) -> None:
+    """
+    `record_change` of an update whose old values were not read. The listeners get None as `old`.
+
+    Args:
+        db (Session): Session of the write, before its commit.
+        table (str): "stock", "products" or "stores".
+        new (Dict[str, Any]): `_asdict()` of the stock or `_asdict_no_stock()` of the product or store
+            after the write, as returned by the UPDATE.
+    """
+    db.info.setdefault("cache_changes", []).append((table, None, new, True))
+
+
+def on_change(listener: Callable[[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]) -> Callable:
+    """
+    Register `listener` to be called with the `table`, `old` and `new` of each `record_change` once
+    its transaction commits, before the cached reads are evicted.
+    """
+    _change_listeners.append(listener)
+    return listener
+
+
+# Ahead of the listener of database.table_versions, so the entries are gone once the new counters are seen
+@event.listens_for(Session, "after_commit", insert=True)
+def _evict_changes(session: Session) -> None:
+    rows_by_table: Dict[str, List[Dict[str, Any]]] = {}
+    # New rows of the updates reported by `record_update`
+    updated_by_table: Dict[str, List[Dict[str, Any]]] = {}
+    # Deleted products and stores, whose stock was deleted with them
+    deleted_by_table: Dict[str, List[Dict[str, Any]]] = {}
+    for table, old, new, old_unknown in session.info.pop("cache_changes", ()):
+        for listener in _change_listeners:
+            listener(table, old, new)
+        rows_by_table.setdefault(table, []).extend(row for row in (old, new) if row is not None)
+        if old_unknown:
+            updated_by_table.setdefault(table, []).append(new)
+        if new is None and table != "stock":
+            deleted_by_table.setdefault(table, []).append(old)
+    # One pass over the entries per table, however many rows a bulk write changed
+    for table, rows in rows_by_table.items():
+        updated, deleted = updated_by_table.get(table, []), deleted_by_table.get(table, [])
+        response_cache.evict(
+            lambda cached: (
+                _affected(cached, table, rows) or _shows(cached, table, updated) or _loses_stock(cached, table, deleted)
+            )
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changes(session: Session) -> None:
+    session.info.pop("cache_changes", None)
+
+
+@on_table_change
+def _evict_table(table: str) -> None:
+    # Another process wrote to `table`, without telling which rows
+    response_cache.evict(lambda cached: table in _read_tables(cached.kind, cached.params))
+
+
+def _read_key(kind: str, params: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, Any], ...]]:
+    return kind, tuple(sorted((name, value) for name, value in params.items() if value is not None))
+
+
+def _read_tables(kind: str, params: Dict[str, Any]) -> Set[str]:
+    if kind == "stock":
+        return {"stock", "products", "stores"}
+    include = params.get("include", "stock")
+    other = "stores" if kind == "products" else "products"
+    return {kind} | ({"stock"} if include != "none" else set()) | ({other} if include == "stock" else set())
+
+
+def _fields(item: Any) -> Dict[str, Any]:
+    # The orm read path returns response models, the projection path dicts
+    return item if isinstance(item, dict) else dict(item)
+
+
+def _shown_ids(kind: str, rows: List[Any]) -> Dict[str, Set[int]]:
+    ids = {"products": set(), "stores": set()}
+    for row in map(_fields, rows):
+        if kind == "stock":
+            ids["products"].add(row["product_id"])
+            ids["stores"].add(row["store_id"])
+            continue
+        ids[kind].add(row["id"])
+        other = "stores" if kind == "products" else "products"
+        for stock in map(_fields, row.get("stock", ())):
+            ids[other].add(stock[f"{other[:-1]}_id"])
+    return ids
+
+
+def _contains(term: str, text: str) -> bool:
+    # Python's lower() folds at least every character SQLite's LIKE, NOCASE and trigram fold,
+    # so a row matching in SQL always matches here
+    return term.lower() in text.lower()
+
+
+def _name_matches(params: Dict[str, Any], prefix: str, name: str) -> bool:
+    """
+    Whether `name` passes the `<prefix>name`, `<prefix>name_exact` and `<prefix>name_prefix` filters.
+    """
+    term, exact, start = (params.get(f"{prefix}{suffix}") for suffix in ("name", "name_exact", "name_prefix"))
+    return (
+        (not term or _contains(term, name))
+        and (not exact or exact.lower() == name.lower())
+        and (not start or name.lower().startswith(start.lower()))
+    )
+
+
+def _stock_matches(params: Dict[str, Any], stock: Dict[str, Any]) -> bool:
+    """
+    Whether a stock passes the filters of `get_stocks_service`.
+    """
+    return (
+        _name_matches(params, "product_", stock["product_name"])
+        and _name_matches(params, "store_", stock["store"])
+        and (params.get("max_price") is None or stock["price"] <= params["max_price"])
+        and (params.get("is_available") is None or stock["is_available"] == params["is_available"])
+        and (not params.get("category") or _contains(params["category"], stock["category"]))
+        and (params.get("store_id") is None or stock["store_id"] == params["store_id"])
+        and (params.get("product_id") is None or stock["product_id"] == params["product_id"])
+    )
+
+
+def _affected(cached: CachedRead, table: str, rows: Iterable[Dict[str, Any]]) -> bool:
+    params = cached.params
+
+    if cached.kind == "stock":
+        if table == "stock":
+            return any(_stock_matches(params, row) for row in rows)
+        # A renamed product or store is shown by the stock of the response, or its stock may now
+        # pass a name filter
+        prefix = f"{table[:-1]}_"
+        has_name_filter = any(params.get(f"{prefix}{suffix}") for suffix in ("name", "name_exact", "name_prefix"))
+        return any(
+            row["id"] in cached.ids[table] or (has_name_filter and _name_matches(params, prefix, row["name"]))
+            for row in rows
+        )
+
+    if table == cached.kind:
+        parent_id = params.get("id")
+        return any((not parent_id or row["id"] == parent_id) and _name_matches(params, "", row["name"]) for row in rows)
+
+    include = params.get("include", "stock")
+    if table == "stock":
+        foreign_key = f"{cached.kind[:-1]}_id"
+        return include != "none" and any(row[foreign_key] in cached.ids[cached.kind] for row in rows)
+    # Only the names of the other side are shown, in the nested stock
+    return include == "stock" and any(row["id"] in cached.ids[table] for row in rows)
+
+
+def _shows(cached: CachedRead, table: str, rows: List[Dict[str, Any]]) -> bool:
+    """
+    Whether the entry may show one of the updated `rows` with its old values, which are unknown.
+    """
+    if cached.kind == "stock" and table == "stock":
+        # An update keeps the product and store of a stock, so a response holding its old values
+        # shows both
+        return any(row["product_id"] in cached.ids["products"] and row["store_id"] in cached.ids["stores"] for row in rows)
+    if table == cached.kind:
+        return any(row["id"] in cached.ids[table] for row in rows)
+    # `_affected` decides the other cases from the ids shown and the new values only
+    return False
+
+
+def _loses_stock(cached: CachedRead, table: str, parents: List[Dict[str, Any]]) -> bool:
+    """
+    Whether the entry may count stock of the deleted `parents`, which their delete cascaded to.
+    """
+    if not parents or cached.kind in ("stock", table):
+        # `_affected` evicts the entries showing the parents or their stock
+        return False
+    # A summary counts the stock of every store or product, without showing which
+    return cached.params.get("include", "stock") == "summary"
@@ -1,12 +1,28 @@
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
 
-from schemas.product import ProductCreate, ProductResponse, ProductUpdate
+from schemas.product import ProductCreate, ProductResponse, ProductSummaryResponse, ProductUpdate
 from schemas.stock import StockResponse
 
 from models.product import Product
 from models.stock import Stock
 
+from database.deletions import visible
+from database.fts import name_search
+from database.loaders import READ_PATH
+from database.name_match import equals_ignore_case, starts_with_ignore_case
+from database.table_versions import bump_table_versions
+
+from services.cache import record_change, record_update
+from services.deletion import check_delete_mode, start_deletion
+from services.stock import (
+    check_include, load_nested_stock, nested_stock_option, project_nested_stock, summarize_nested_stock
+)
+
+from utils.bulk import check_batch_size
+from utils.pagination import seek, fetch_page
+
 # ------------ API POST ------------
 
 def create_product_service(product: ProductCreate, db: Session) -> dict:
@@ -22,17 +38,59 @@ def create_product_service(product: ProductCreate, db: Session) -> dict:
             id (int): The unique ID of the created product.
             name (str): The name of the created product.
     """
-    new_product = Product(name=product.name)
-    db.add(new_product)
+    # One INSERT returning the created row, nothing is read again after the commit
+    statement = insert(Product).values(name=product.name).returning(Product.id, Product.name)
+    created = db.execute(statement).one()._asdict()
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["products"])
+    record_change(db, "products", None, created)
+    db.commit()
+
+    return created
+
+
+def create_products_bulk_service(products: List[ProductCreate], db: Session) -> List[dict]:
+    """
+    Service to create many products with insertmanyvalues, in one transaction.
+
+    Args:
+        products (List[ProductCreate]): The schemas containing the details of the products to be created.
+        db (Session): SQLAlchemy session object.
+
+    Returns:
+        List[dict]: The created products in the order of `products`, each with the keys of `create_product_service`.
+
+    Raises:
+        BulkError: If the number of products is out of range. No product is created then.
+    """
+    check_batch_size(products)
+    rows = [{"name": product.name} for product in products]
+
+    # Multi-row INSERTs, numbered in the order of `rows` but returned in no set order
+    returned = db.execute(insert(Product).returning(Product.id, Product.name), rows)
+    created = [row._asdict() for row in sorted(returned, key=lambda row: row.id)]
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["products"])
+    for product in created:
+        record_change(db, "products", None, product)
     db.commit()
-    db.refresh(new_product)  # Refresh to get the ID
 
-    return new_product._asdict_no_stock()
+    return created
 
 
 # ------------ API GET ------------
 
-def get_products_service(id: Optional[int], name: Optional[str], db: Session) -> List[ProductResponse]:
+def get_products_service(
+    id: Optional[int],
+    name: Optional[str],
+    db: Session,
+    name_exact: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include: str = "stock",
+    stock_limit: Optional[int] = None
+) -> Tuple[List[ProductResponse], Optional[str]]:
     """
     Service function to fetch products based on optional filters.
 
@@ -40,26 +98,92 @@ def get_products_service(id: Optional[int], name: Optional[str], db: Session) ->
         id (Optional[int]): ID of the product to filter by.
         name (Optional[str]): Name of the product to filter by.
         db (Session): SQLAlchemy session object.
+        name_exact (Optional[str]): Exact name of the product to filter by, ignoring case.
+        name_prefix (Optional[str]): Start of the name of the product to filter by, ignoring case.
+        limit (Optional[int]): Page size, returns every product if neither limit nor cursor is provided.
+        cursor (Optional[str]): Cursor of the page to fetch, from the previous page.
+        include (str): What to embed of the stock of each product, one of `STOCK_INCLUDES`.
+        stock_limit (Optional[int]): Max stock rows embedded per product with include=stock.
 
     Returns:
-        List[ProductResponse]: List of the products.
+        Tuple[List[ProductResponse], Optional[str]]: List of the products, and the cursor of the next page
+            (None on the last page).
 
     Raises:
+        LookupError: If include is invalid.
+        PaginationError: If the cursor, the limit or the stock limit is invalid.
         ValueError: If no products are found.
     """
-    query = db.query(Product).options(joinedload(Product.stock).joinedload(Stock.store))  # Join stock and product
+    check_include(include, stock_limit)
+
+    if READ_PATH != "orm":
+        # (id, name) tuples, the stock is read as plain rows below
+        query = db.query(Product.id, Product.name)
+    else:
+        query = db.query(Product)
+        if include == "stock" and stock_limit is None:
+            # Whole collections, loaded with the strategy set in database/loaders.py
+            query = query.options(nested_stock_option(Product.stock))
+
+    # Sort key columns, the id last
+    matches = name_search("products", name) if name else None
+    if matches is not None:
+        # Full-text lookup, best ranked matches first
+        matches = matches.subquery()
+        query = query.join(matches, matches.c.rowid == Product.id)
+        keys = (matches.c.rank, Product.id)
+    elif name_prefix:
+        # Alphabetical like an autocomplete, the NOCASE name index already holds this order
+        keys = (Product.name.collate("NOCASE"), Product.id)
+    else:
+        keys = (Product.id,)
+
+    # Before the filters, SQLite seeks from the first bound on the leading sort key
+    query = seek(query, keys, cursor)
+
+    # Without the products being deleted in the background
+    query = query.filter(visible(Product))
 
     # Filter by product id or name if provided
     if id:
         query = query.filter(Product.id == id)
-    if name:
+    if name and matches is None:
         query = query.filter(Product.name.ilike(f"%{name}%"))
+    if name_exact:
+        query = query.filter(equals_ignore_case(Product.name, name_exact))
+    if name_prefix:
+        query = query.filter(starts_with_ignore_case(Product.name, name_prefix))
 
-    products = query.all()
+    if limit is None and cursor is None:
+        products, next_cursor = query.order_by(*keys).all(), None
+    else:
+        products, next_cursor = fetch_page(query, keys, limit)
 
     if not products:
         raise ValueError("Product not found")  # Raise a generic exception to signal the controller
 
+    if READ_PATH != "orm":
+        product_dicts = [dict(zip(("id", "name"), product)) for product in products]
+    else:
+        product_dicts = [product._asdict_no_stock() for product in products]
+    ids = [product["id"] for product in product_dicts]
+
+    if include == "summary":
+        summaries = summarize_nested_stock(db, Stock.product_id, ids)
+        return [
+            ProductSummaryResponse(**product, **summaries[product["id"]])
+            for product in product_dicts
+        ], next_cursor
+    if include == "none":
+        return product_dicts, next_cursor
+
+    if READ_PATH != "orm":
+        stock_by_product = project_nested_stock(db, Stock.product_id, ids, stock_limit)
+        return [{**product, "stock": stock_by_product[product["id"]]} for product in product_dicts], next_cursor
+
+    if stock_limit is not None:
+        load_nested_stock(db, products, stock_limit)
+
     product_responses = [
         ProductResponse(
             id=product.id,
@@ -77,42 +201,59 @@ def get_products_service(id: Optional[int], name: Optional[str], db: Session) ->
                 )
                 for stock in product.stock
             ]
-        ).model_dump()  # Use model_dump() to serialize the ProductResponse instance
+        )  # Encoded as is by create_response
         for product in products
     ]
 
-    return product_responses
+    return product_responses, next_cursor
 
 
 # ------------ API DELETE ------------
 
-def delete_product_service(product_id: int, db: Session) -> dict:
+def delete_product_service(product_id: int, db: Session, mode: str = "sync") -> dict:
     """
     Service to delete a product by ID from the database.
 
     Args:
         product_id (int): The ID of the product to delete.
         db (Session): The SQLAlchemy session.
+        mode (str): "sync" to delete the product and its stock now, "async" to hide them now and
+            delete them in the background, see services/deletion.py.
 
     Returns:
-        dict: A dictionary containing the ID of the deleted product.
+        dict: A dictionary containing the ID of the deleted product, and with mode=async the
+            `deletion_id` to follow the deletion with.
 
     Raises:
-        ValueError: If the product with the given ID does not exist.
+        LookupError: If the mode is invalid.
+        ValueError: If the product with the given ID does not exist, or is already being deleted.
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
-    
-    if not product:
+    check_delete_mode(mode)
+    if mode == "async":
+        deletion_id = start_deletion(db, Product, product_id)
+        if deletion_id is None:
+            raise ValueError("Product not found")
+        return {"product_id": product_id, "deletion_id": deletion_id}
+
+    # One DELETE, its stock goes with it through the ON DELETE CASCADE of stock.product_id
+    statement = (
+        delete(Product)
+        .where(Product.id == product_id, visible(Product))
+        .returning(Product.id, Product.name)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.execute(statement).first()
+
+    # No row matched the id
+    if deleted is None:
         raise ValueError("Product not found")
-    
-    # Delete associated stocks
-    for stock in product.stock:
-        db.delete(stock)
-    
-    # Delete the product itself
-    db.delete(product)
+
+    # Not a flush, so the counters are bumped here, the stock table's as well
+    bump_table_versions(db, ["products", "stock"])
+    # The listeners drop the stock of the product along with it
+    record_change(db, "products", deleted._asdict(), None)
     db.commit()
-    
+
     # Return the deleted product ID as confirmation
     return {"product_id": product_id}
 
@@ -130,16 +271,29 @@ def update_product_service(product_id: int, product_update: ProductUpdate, db: S
 
     Returns:
         dict: A dictionary with the updated product details.
+
+    Raises:
+        ValueError: If the product with the given ID does not exist.
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
-    
-    if not product:
+    # One UPDATE returning the updated row, the product is not read before
+    statement = (
+        update(Product)
+        .where(Product.id == product_id, visible(Product))
+        .values(name=product_update.name)
+        .returning(Product.id, Product.name)
+        .execution_options(synchronize_session=False)
+    )
+    updated = db.execute(statement).first()
+
+    # No row matched the id
+    if updated is None:
         raise ValueError("Product not found")
-    
-    # Update the product data
-    product.name = product_update.name
+
+    updated = updated._asdict()
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["products"])
+    record_update(db, "products", updated)
     db.commit()
-    db.refresh(product)
-    
+
     # Return the updated product data
-    return product._asdict_no_stock()
\ No newline at end of file
+    return updated
\ No newline at end of file
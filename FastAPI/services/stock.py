@@ -1,14 +1,30 @@
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from sqlalchemy import ColumnElement, Float, and_, bindparam, cast, delete, exists, func, insert, literal, select, update
+from sqlalchemy.orm import InstrumentedAttribute, Load, Session
+from sqlalchemy.orm import Query as OrmQuery  # fastapi_app.py star-imports the services next to fastapi.Query
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Any, Dict, List, Optional, Set, Tuple, Type, Union
 
 from schemas.product import ProductCreate, ProductResponse, ProductUpdate
 from schemas.store import StoreCreate, StoreResponse, StoreUpdate
-from schemas.stock import StockCreate, StockResponse, StockUpdate
+from schemas.stock import StockBulkUpdate, StockCreate, StockResponse, StockUpdate, StockWhereUpdate
 
 from models.product import Product
 from models.store import Store
 from models.stock import Stock
 
+from database.deletions import visible
+from database.fts import name_search
+from database.name_match import equals_ignore_case, starts_with_ignore_case
+from database.loaders import READ_PATH, eager_load
+from database.table_versions import bump_table_versions, record_table_write
+
+from services.cache import record_change, record_update
+from services.name_cache import name_cache
+from services.stock_index import stock_index
+
+from utils.bulk import BulkError, check_batch_size, item_error
+from utils.pagination import PaginationError, seek, fetch_page
+
 # ------------ API POST ------------
 
 def create_stock_service(stock: StockCreate, db: Session) -> dict:
@@ -33,46 +49,276 @@ def create_stock_service(stock: StockCreate, db: Session) -> dict:
     Raises:
         ValueError: If no Store or Product is found.
     """
-    # Check if the store exists
-    store = db.query(Store).filter(Store.id == stock.store_id).first()
-    if not store:
-        raise ValueError("Store not found")
-
-    # Check if the product exists
-    product = db.query(Product).filter(Product.id == stock.product_id).first()
-    if not product:
-        raise ValueError("Product not found")
-
-    # Create the new stock
-    new_stock = Stock(
-        store_id=stock.store_id,
-        product_id=stock.product_id,
-        price=stock.price,
-        is_available=stock.is_available,
-        category=stock.category
+    return _insert_one_stock(db, stock.model_dump())
+
+
+def create_stock_bulk_service(stocks: List[StockCreate], db: Session) -> List[dict]:
+    """
+    Service to create many stocks in one transaction.
+
+    Args:
+        stocks (List[StockCreate]): The schemas containing the details of the stocks to be created.
+        db (Session): SQLAlchemy session object.
+
+    Returns:
+        List[dict]: The created stocks in the order of `stocks`, each with the keys of `create_stock_service`.
+
+    Raises:
+        BulkError: If the number of stocks is out of range, or with every stock whose store or product
+            does not exist. No stock is created then.
+    """
+    check_batch_size(stocks)
+    return _insert_stock(db, [stock.model_dump() for stock in stocks])
+
+
+def _insert_one_stock(db: Session, stock: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Insert a stock with the keys of `StockCreate` and commit, without loading its store and product.
+
+    The INSERT selects the row from the store and product, by primary key, so it also reads their
+    names and inserts nothing when either does not exist or is being deleted. Only then does an
+    EXISTS query tell which.
+
+    Returns:
+        Dict[str, Any]: `Stock._asdict()` of the created stock.
+
+    Raises:
+        ValueError: If the store or the product does not exist.
+    """
+    row = (
+        select(
+            Store.id, Product.id, literal(stock["price"]), literal(stock["is_available"]), literal(stock["category"]),
+            Store.name, Product.name,
+        )
+        .join(Product, and_(Product.id == stock["product_id"], visible(Product)))
+        .where(Store.id == stock["store_id"], visible(Store))
     )
+    columns = ["store_id", "product_id", "price", "is_available", "category", "store_name", "product_name"]
+    created = db.execute(insert(Stock).from_select(columns, row).returning(*STOCK_RETURNING)).first()
 
-    # Add the new stock to both the product and store stock lists
-    store.stock.append(new_stock)
-    product.stock.append(new_stock)
+    if created is None:
+        store_exists = db.execute(select(exists().where(Store.id == stock["store_id"], visible(Store)))).scalar_one()
+        raise ValueError("Product not found" if store_exists else "Store not found")
 
-    db.add(new_stock)
+    created = created._asdict()
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["stock"])
+    record_change(db, "stock", None, created)
     db.commit()
-    db.refresh(new_stock)  # Refresh to get the ID
 
-    return new_stock._asdict()
+    return created
+
+
+# Columns of `Stock._asdict()`, for the writes returning the rows they write. SQLite returns the
+# values as written, before the REAL affinity of the column turns an integer price into a float
+STOCK_RETURNING = (
+    Stock.id, Stock.store_id, Stock.product_id, cast(Stock.price, Float).label("price"), Stock.is_available,
+    Stock.category, Stock.store_name.label("store"), Stock.product_name,
+)
+
+
+def _parent_names(db: Session, model: Union[Type[Store], Type[Product]], ids: Set[int]) -> Dict[int, str]:
+    """
+    Names of the stores or products of `ids` that exist and are not being deleted, with one query
+    per chunk of ids.
+    """
+    ids = list(ids)
+    names = {}
+    for start in range(0, len(ids), PARENT_CHUNK_SIZE):
+        chunk = ids[start:start + PARENT_CHUNK_SIZE]
+        names.update(db.execute(select(model.id, model.name).where(model.id.in_(chunk), visible(model))).all())
+    return names
+
+
+def _insert_stock(db: Session, stocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Insert many stocks, each with the keys of `StockCreate`, and commit.
+
+    The existence of their stores and products is checked with one query per table, which also
+    reads the names the rows are inserted with. The rows are then sent by insertmanyvalues as
+    multi-row INSERTs.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        stocks (List[Dict[str, Any]]): The validated stocks.
+
+    Returns:
+        List[Dict[str, Any]]: `Stock._asdict()` of each created stock, in the order of `stocks`.
+
+    Raises:
+        BulkError: With every stock whose store or product does not exist, nothing is inserted then.
+    """
+    stores = _parent_names(db, Store, {stock["store_id"] for stock in stocks})
+    products = _parent_names(db, Product, {stock["product_id"] for stock in stocks})
+
+    errors = []
+    for index, stock in enumerate(stocks):
+        if stock["store_id"] not in stores:
+            errors.append(item_error(index, "store_id", "Store not found", "not_found", stock["store_id"]))
+        if stock["product_id"] not in products:
+            errors.append(item_error(index, "product_id", "Product not found", "not_found", stock["product_id"]))
+    if errors:
+        raise BulkError(errors)
+
+    rows = [
+        {**stock, "store_name": stores[stock["store_id"]], "product_name": products[stock["product_id"]]}
+        for stock in stocks
+    ]
+    # SQLite numbers the rows of an INSERT in the order of its VALUES, but returns them in no set
+    # order. Asking SQLAlchemy for the order of the parameters would make it insert row by row, as
+    # SQLite has no sentinel column, so the RETURNING rows are sorted by id instead
+    returned = db.execute(insert(Stock).returning(*STOCK_RETURNING), rows)
+    created = [row._asdict() for row in sorted(returned, key=lambda row: row.id)]
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["stock"])
+    for stock in created:
+        record_change(db, "stock", None, stock)
+    db.commit()
+
+    return created
 
 
 # ------------ API GET ------------
 
+# Fields of a stock response, and the stock columns the projection read path selects for them.
+# The names are the copies on the stock row, see database/stock_names.py
+STOCK_FIELDS = ("id", "store_id", "product_id", "price", "is_available", "category", "product_name", "store_name")
+STOCK_COLUMNS = (
+    Stock.id, Stock.store_id, Stock.product_id, Stock.price, Stock.is_available, Stock.category,
+    Stock.product_name, Stock.store_name,
+)
+
+
+def stock_rows(db: Session) -> OrmQuery:
+    """
+    Query of the stock columns of a stock response as plain tuples, without building any entity.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+
+    Returns:
+        Query: `STOCK_COLUMNS` of each stock, from the stock table alone, filtered like `db.query(Stock)`.
+    """
+    return db.query(*STOCK_COLUMNS)
+
+
+def stock_dicts(stocks: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    """
+    Stock responses of `STOCK_COLUMNS` rows.
+
+    Args:
+        stocks (List[Tuple[Any, ...]]): Rows of `stock_rows`.
+
+    Returns:
+        List[Dict[str, Any]]: Stock responses in the order of the rows. A stock whose product or
+            store does not exist, the names of which are NULL, is left out like an inner join would.
+    """
+    # The keys of STOCK_FIELDS in a dict display, faster than zipping them on every row
+    return [
+        {
+            "id": id, "store_id": store_id, "product_id": product_id, "price": price, "is_available": is_available,
+            "category": category, "product_name": product_name, "store_name": store_name,
+        }
+        for id, store_id, product_id, price, is_available, category, product_name, store_name in stocks
+        if product_name is not None and store_name is not None
+    ]
+
+
+def index_stock_dicts(db: Session, stocks: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    """
+    Stock responses of stock index rows, which hold no names, with the names of `name_cache`.
+
+    Args:
+        db (Session): SQLAlchemy session object, to read the names `name_cache` has not loaded.
+        stocks (List[Tuple[Any, ...]]): Rows of the stock index, the first six of `STOCK_COLUMNS`.
+
+    Returns:
+        List[Dict[str, Any]]: Stock responses in the order of the rows, without the stock whose
+            product or store does not exist.
+    """
+    # store_id and product_id are the second and third of STOCK_COLUMNS
+    products = name_cache.names(db, "products", {stock[2] for stock in stocks})
+    stores = name_cache.names(db, "stores", {stock[1] for stock in stocks})
+    return [
+        {
+            "id": id, "store_id": store_id, "product_id": product_id, "price": price, "is_available": is_available,
+            "category": category, "product_name": products[product_id], "store_name": stores[store_id],
+        }
+        for id, store_id, product_id, price, is_available, category in stocks
+        if product_id in products and store_id in stores
+    ]
+
+
+def stock_filters(
+    product_name: Optional[str] = None,
+    store_name: Optional[str] = None,
+    max_price: Optional[float] = None,
+    is_available: Optional[bool] = None,
+    category: Optional[str] = None,
+    store_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    product_name_exact: Optional[str] = None,
+    product_name_prefix: Optional[str] = None,
+    store_name_exact: Optional[str] = None,
+    store_name_prefix: Optional[str] = None
+) -> List[ColumnElement[bool]]:
+    """
+    Criteria of the stock filters of `get_stocks_service`, which `update_stock_where_service` updates by.
+
+    Returns:
+        List[ColumnElement[bool]]: One criterion per filter provided, for `Query.filter` or `Update.where`.
+    """
+    criteria = []
+    if product_name:
+        matches = name_search("products", product_name)
+        if matches is None:
+            criteria.append(Stock.product_name.ilike(f"%{product_name}%"))
+        else:
+            criteria.append(Stock.product_id.in_(matches.with_only_columns(matches.selected_columns.rowid)))
+    if store_name:
+        matches = name_search("stores", store_name)
+        if matches is None:
+            criteria.append(Stock.store_name.ilike(f"%{store_name}%"))
+        else:
+            criteria.append(Stock.store_id.in_(matches.with_only_columns(matches.selected_columns.rowid)))
+    if max_price is not None:
+        criteria.append(Stock.price <= max_price)
+    if is_available is not None:
+        criteria.append(Stock.is_available == is_available)
+    if category:
+        criteria.append(Stock.category.ilike(f"%{category}%"))
+    if store_id is not None:
+        criteria.append(Stock.store_id == store_id)
+    if product_id is not None:
+        criteria.append(Stock.product_id == product_id)
+    if product_name_exact:
+        criteria.append(equals_ignore_case(Stock.product_name, product_name_exact))
+    if product_name_prefix:
+        criteria.append(starts_with_ignore_case(Stock.product_name, product_name_prefix))
+    if store_name_exact:
+        criteria.append(equals_ignore_case(Stock.store_name, store_name_exact))
+    if store_name_prefix:
+        criteria.append(starts_with_ignore_case(Stock.store_name, store_name_prefix))
+
+    return criteria
+
+
 def get_stocks_service(
     db: Session, 
     product_name: Optional[str], 
     store_name: Optional[str], 
     max_price: Optional[float], 
     is_available: Optional[bool], 
-    category: Optional[str]
-) -> List[StockResponse]:
+    category: Optional[str],
+    store_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    product_name_exact: Optional[str] = None,
+    product_name_prefix: Optional[str] = None,
+    store_name_exact: Optional[str] = None,
+    store_name_prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[StockResponse], Optional[str]]:
     """
     Service function to fetch stocks based on optional filters.
 
@@ -83,33 +329,64 @@ def get_stocks_service(
         max_price (float): Max price to filter by.
         is_available (bool): Availability to filter by. True if the product is in stock/False if not.
         category (str): Category to filter by.
+        store_id (Optional[int]): ID of the store to filter by.
+        product_id (Optional[int]): ID of the product to filter by.
+        product_name_exact (Optional[str]): Exact name of the product to filter by, ignoring case.
+        product_name_prefix (Optional[str]): Start of the name of the product to filter by, ignoring case.
+        store_name_exact (Optional[str]): Exact name of the store to filter by, ignoring case.
+        store_name_prefix (Optional[str]): Start of the name of the store to filter by, ignoring case.
+        limit (Optional[int]): Page size, returns every stock if neither limit nor cursor is provided.
+        cursor (Optional[str]): Cursor of the page to fetch, from the previous page.
 
     Returns:
-        List[StockResponse]: List of stocks with their details.
+        Tuple[List[StockResponse], Optional[str]]: List of stocks with their details, and the cursor of the next page
+            (None on the last page).
 
     Raises:
+        PaginationError: If the cursor or the limit is invalid.
         ValueError: If no stocks are found.
     """
-    query = db.query(Stock).options(joinedload(Stock.product), joinedload(Stock.store))
+    if READ_PATH == "index":
+        found = stock_index.find(
+            db, product_name, store_name, max_price, is_available, category, store_id, product_id,
+            product_name_exact, product_name_prefix, store_name_exact, store_name_prefix, limit, cursor
+        )
+        if found is not None:
+            stocks, next_cursor = found
+            if not stocks:
+                raise ValueError("No matching stocks found")
+            return index_stock_dicts(db, stocks), next_cursor
+        # Being built by another request meanwhile, read the database like the projection path
+
+    if READ_PATH == "orm":
+        query = db.query(Stock).options(eager_load(Stock.product), eager_load(Stock.store))
+    else:
+        query = stock_rows(db)
+
+    # Without the stock of the stores and products being deleted in the background
+    query = query.filter(visible(Stock))
 
     # Apply filters based on provided parameters
-    if product_name:
-        query = query.filter(Stock.product.has(Product.name.ilike(f"%{product_name}%")))
-    if store_name:
-        query = query.filter(Stock.store.has(Store.name.ilike(f"%{store_name}%")))
-    if max_price is not None:
-        query = query.filter(Stock.price <= max_price)
-    if is_available is not None:
-        query = query.filter(Stock.is_available == is_available)
-    if category:
-        query = query.filter(Stock.category.ilike(f"%{category}%"))
-
-    # Execute the query and get all results
-    stocks = query.all()
+    query = query.filter(*stock_filters(
+        product_name, store_name, max_price, is_available, category, store_id, product_id,
+        product_name_exact, product_name_prefix, store_name_exact, store_name_prefix
+    ))
+
+    if limit is None and cursor is None:
+        # Execute the query and get all results. Sorted here, an ORDER BY id would make SQLite
+        # prefer a rowid scan over the filter indexes
+        next_cursor = None
+        stocks = sorted(query.all(), key=lambda stock: stock.id)
+    else:
+        # A page walks the rowid from the cursor on and stops after `limit` matches
+        stocks, next_cursor = fetch_page(seek(query, (Stock.id,), cursor), (Stock.id,), limit)
 
     # If no stocks found, raise an exception
     if not stocks:
         raise ValueError("No matching stocks found")
+
+    if READ_PATH != "orm":
+        return stock_dicts(stocks), next_cursor
     
     stock_responses = [
         StockResponse(
@@ -121,11 +398,156 @@ def get_stocks_service(
             category=stock.category,
             product_name=stock.product.name,
             store_name=stock.store.name
-        ).model_dump()  # Serialize using model_dump() here
+        )  # Encoded as is by create_response
         for stock in stocks
     ]
 
-    return stock_responses
+    return stock_responses, next_cursor
+
+
+# ------------ NESTED STOCK ------------
+
+# What GET /store and GET /product embed of each row: the stock list, its summary or nothing
+STOCK_INCLUDES = ("stock", "summary", "none")
+
+# Parent ids per query, far below SQLite's bound parameter limit
+PARENT_CHUNK_SIZE = 500
+
+
+def check_include(include: str, stock_limit: Optional[int]) -> None:
+    """
+    Validate the `include` and `stock_limit` parameters of GET /store and GET /product.
+
+    Raises:
+        LookupError: If `include` is not one of `STOCK_INCLUDES`.
+        PaginationError: If `stock_limit` is lower than 1.
+    """
+    if include not in STOCK_INCLUDES:
+        raise LookupError(f"include must be one of {', '.join(STOCK_INCLUDES)}")
+    if stock_limit is not None and stock_limit < 1:
+        raise PaginationError("stock_limit must be at least 1")
+
+
+def _parent_columns(parents: List[Union[Store, Product]]) -> Tuple[InstrumentedAttribute, InstrumentedAttribute]:
+    """
+    Foreign key of the stock pointing at the parents, and the relationship to the other side.
+    """
+    if isinstance(parents[0], Store):
+        return Stock.store_id, Stock.product
+    return Stock.product_id, Stock.store
+
+
+def nested_stock_option(collection: InstrumentedAttribute) -> Load:
+    """
+    Loader option for the whole `stock` collection of stores or products and the other side of each stock.
+
+    Args:
+        collection (InstrumentedAttribute): `Store.stock` or `Product.stock`.
+
+    Returns:
+        Load: Option for the query of the parents, with the strategies of database/loaders.py.
+    """
+    # The parent side of each stock is already in the session, only the other side is loaded
+    other_side = Stock.product if collection is Store.stock else Stock.store
+    # Without the stock whose other side is being deleted in the background
+    return eager_load(collection.and_(visible(Stock))).options(eager_load(other_side))
+
+
+def _first_stock(query: OrmQuery, foreign_key: InstrumentedAttribute, ids: List[int], stock_limit: int) -> OrmQuery:
+    """
+    Restrict a stock query to the first `stock_limit` rows, the lowest ids, of each parent in `ids`.
+
+    No loader strategy can bound how many rows a parent brings, so the stock of each parent is
+    numbered in SQL with ROW_NUMBER().
+    """
+    ranked = (
+        select(Stock.id, func.row_number().over(partition_by=foreign_key, order_by=Stock.id).label("position"))
+        .where(foreign_key.in_(ids), visible(Stock))
+        .subquery()
+    )
+    return query.join(ranked, ranked.c.id == Stock.id).filter(ranked.c.position <= stock_limit)
+
+
+def load_nested_stock(db: Session, parents: List[Union[Store, Product]], stock_limit: int) -> None:
+    """
+    Load the first `stock_limit` rows of the `stock` collection of the given stores or products,
+    with one query per chunk of parents.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        parents (List[Union[Store, Product]]): Stores or products, all of the same type.
+        stock_limit (int): Max stock rows per parent, the lowest ids first.
+    """
+    if not parents:
+        return
+
+    foreign_key, other_side = _parent_columns(parents)
+    stock_by_parent = {parent.id: [] for parent in parents}
+    ids = list(stock_by_parent)
+
+    for start in range(0, len(ids), PARENT_CHUNK_SIZE):
+        chunk = ids[start:start + PARENT_CHUNK_SIZE]
+        query = _first_stock(db.query(Stock).options(eager_load(other_side)), foreign_key, chunk, stock_limit)
+        for stock in query.order_by(Stock.id):
+            stock_by_parent[getattr(stock, foreign_key.key)].append(stock)
+
+    for parent in parents:
+        # Set as loaded state without history, so the session never flushes a trimmed collection
+        set_committed_value(parent, "stock", stock_by_parent[parent.id])
+
+
+def project_nested_stock(
+    db: Session, foreign_key: InstrumentedAttribute, ids: List[int], stock_limit: Optional[int]
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Read the stock of the given stores or products as response dicts, without building any entity.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        foreign_key (InstrumentedAttribute): `Stock.store_id` or `Stock.product_id`.
+        ids (List[int]): Ids of the stores or products.
+        stock_limit (Optional[int]): Max stock rows per parent, the lowest ids first. Every row if not provided.
+
+    Returns:
+        Dict[int, List[Dict[str, Any]]]: Stock of each parent id, ordered by id like the `stock` relationships.
+    """
+    stock_by_parent = {parent_id: [] for parent_id in ids}
+
+    for start in range(0, len(ids), PARENT_CHUNK_SIZE):
+        chunk = ids[start:start + PARENT_CHUNK_SIZE]
+        query = stock_rows(db).filter(foreign_key.in_(chunk), visible(Stock))
+        if stock_limit is not None:
+            query = _first_stock(query, foreign_key, chunk, stock_limit)
+        for stock in stock_dicts(query.order_by(Stock.id).all()):
+            stock_by_parent[stock[foreign_key.key]].append(stock)
+
+    return stock_by_parent
+
+
+def summarize_nested_stock(db: Session, foreign_key: InstrumentedAttribute, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Count the stock of the given stores or products and get their min and max price in SQL.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        foreign_key (InstrumentedAttribute): `Stock.store_id` or `Stock.product_id`.
+        ids (List[int]): Ids of the stores or products.
+
+    Returns:
+        Dict[int, Dict[str, Any]]: `stock_count`, `min_price` and `max_price` by parent id.
+    """
+    summaries = {parent_id: {"stock_count": 0, "min_price": None, "max_price": None} for parent_id in ids}
+
+    for start in range(0, len(ids), PARENT_CHUNK_SIZE):
+        rows = (
+            db.query(foreign_key, func.count(Stock.id), func.min(Stock.price), func.max(Stock.price))
+            .filter(foreign_key.in_(ids[start:start + PARENT_CHUNK_SIZE]), visible(Stock))
+            .group_by(foreign_key)
+        )
+        for parent_id, stock_count, min_price, max_price in rows:
+            summaries[parent_id] = {"stock_count": stock_count, "min_price": min_price, "max_price": max_price}
+
+    return summaries
 
 
 # ------------ API DELETE ------------
@@ -140,14 +562,26 @@ def delete_stock_service(stock_id: int, db: Session) -> dict:
 
     Returns:
         dict: A dictionary containing the ID of the deleted store.
+
+    Raises:
+        ValueError: If the stock with the given ID does not exist.
     """
-    stock = db.query(Stock).filter(Stock.id == stock_id).first()
-    
-    if not stock:
+    # One DELETE returning the deleted row, the stock is not read before
+    statement = (
+        delete(Stock)
+        .where(Stock.id == stock_id, visible(Stock))
+        .returning(*STOCK_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.execute(statement).first()
+
+    # No row matched the id
+    if deleted is None:
         raise ValueError("Stock not found")
-    
-    # Delete the stock
-    db.delete(stock)
+
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["stock"])
+    record_change(db, "stock", deleted._asdict(), None)
     db.commit()
 
     # Return the deleted product ID as confirmation
@@ -160,7 +594,7 @@ def update_stock_service(
     db: Session, 
     stock_id: int, 
     stock_update: StockUpdate
-) -> Stock:
+) -> dict:
     """
     Service to update a stock by ID.
 
@@ -170,35 +604,204 @@ def update_stock_service(
         stock_update (StockUpdate): The schema containing the details of the stock to be updated.
 
     Returns:
-        Stock: The schema of the updated store details.
+        dict: `Stock._asdict()` of the updated stock.
         
     Raises:
         ValueError: If the store with the given ID is not found or if there's nothing to update.
     """
-    # Fetch the stock to update
-    stock = db.query(Stock).filter(Stock.id == stock_id).first()
+    # Fields provided for update
+    values = stock_update.model_dump(exclude_none=True)
 
-    if not stock:
+    # If no fields are provided, raise an error
+    if not values:
+        raise ValueError("Nothing to update")
+
+    # One UPDATE returning the updated row, the stock is not read before
+    statement = (
+        update(Stock)
+        .where(Stock.id == stock_id, visible(Stock))
+        .values(**values)
+        .returning(*STOCK_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+    updated = db.execute(statement).first()
+
+    # No row matched the id
+    if updated is None:
         raise ValueError("Stock not found")
 
-    # Check if any field is provided for update
-    updated = False
+    updated = updated._asdict()
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["stock"])
+    record_update(db, "stock", updated)
+    db.commit()
 
-    if stock_update.price is not None:
-        stock.price = stock_update.price
-        updated = True
-    if stock_update.is_available is not None:
-        stock.is_available = stock_update.is_available
-        updated = True
-    if stock_update.category is not None:
-        stock.category = stock_update.category
-        updated = True
+    return updated
 
-    # If no fields are provided, raise an error
-    if not updated:
+def update_stock_bulk_service(stocks: List[StockBulkUpdate], db: Session) -> List[dict]:
+    """
+    Service to update many stocks in one transaction.
+
+    Args:
+        stocks (List[StockBulkUpdate]): The id of each stock and the fields to update.
+        db (Session): SQLAlchemy session object.
+
+    Returns:
+        List[dict]: `Stock._asdict()` of the updated stocks, in the order of `stocks`.
+
+    Raises:
+        BulkError: If the number of stocks is out of range, or with every item that updates nothing,
+            repeats an id or whose stock does not exist. No stock is updated then.
+    """
+    check_batch_size(stocks)
+
+    updates, errors, ids = [], [], set()
+    for index, stock in enumerate(stocks):
+        values = stock.model_dump(exclude_none=True)
+        if values.keys() == {"id"}:
+            errors.append({"type": "missing", "loc": ["body", index], "msg": "Nothing to update", "input": values})
+        if stock.id in ids:
+            errors.append(item_error(index, "id", "Stock updated twice", "duplicate", stock.id))
+        ids.add(stock.id)
+        updates.append(values)
+    if errors:
+        raise BulkError(errors)
+
+    return _update_stock(db, updates)
+
+
+def update_stock_where_service(
+    db: Session,
+    stock_update: StockWhereUpdate,
+    product_name: Optional[str] = None,
+    store_name: Optional[str] = None,
+    max_price: Optional[float] = None,
+    is_available: Optional[bool] = None,
+    category: Optional[str] = None,
+    store_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    product_name_exact: Optional[str] = None,
+    product_name_prefix: Optional[str] = None,
+    store_name_exact: Optional[str] = None,
+    store_name_prefix: Optional[str] = None
+) -> dict:
+    """
+    Service to update every stock passing the filters of `get_stocks_service` with a single UPDATE.
+
+    Args:
+        db (Session): The SQLAlchemy session.
+        stock_update (StockWhereUpdate): The price or price factor, and the availability to set.
+        The filters are those of `get_stocks_service`, at least one is required.
+
+    Returns:
+        dict: `updated`, the number of stocks updated.
+
+    Raises:
+        LookupError: If no filter is provided.
+        ValueError: If there's nothing to update.
+    """
+    criteria = stock_filters(
+        product_name, store_name, max_price, is_available, category, store_id, product_id,
+        product_name_exact, product_name_prefix, store_name_exact, store_name_prefix
+    )
+    return _update_stock_where(db, stock_update.model_dump(exclude_none=True), criteria)
+
+
+# Fields of a stock an update may set
+STOCK_UPDATE_KEYS = ("price", "is_available", "category")
+
+# Updated stocks read back per query, far below SQLite's bound parameter limit
+UPDATE_CHUNK_SIZE = 500
+
+
+def _update_stock(db: Session, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Update many stocks, each given by its `id` and the `STOCK_UPDATE_KEYS` to set, and commit.
+
+    The updates setting the same fields are sent as one executemany of a single UPDATE. The rows are
+    then read back, with one query per chunk of ids, which also finds the ids no stock matched.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        updates (List[Dict[str, Any]]): The validated updates, each of another stock.
+
+    Returns:
+        List[Dict[str, Any]]: `Stock._asdict()` of each updated stock, in the order of `updates`.
+
+    Raises:
+        BulkError: With every update whose stock does not exist, nothing is updated then.
+    """
+    statements: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for values in updates:
+        fields = tuple(key for key in STOCK_UPDATE_KEYS if key in values)
+        # The SET clause is made of the parameters named after columns, so the id goes by another name
+        statements.setdefault(fields, []).append({"stock_id": values["id"], **{key: values[key] for key in fields}})
+    for rows in statements.values():
+        statement = update(Stock.__table__).where(Stock.id == bindparam("stock_id"), visible(Stock))
+        db.connection().execute(statement, rows)
+
+    ids = [values["id"] for values in updates]
+    updated = {}
+    for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+        chunk = ids[start:start + UPDATE_CHUNK_SIZE]
+        for row in db.execute(select(*STOCK_RETURNING).where(Stock.id.in_(chunk), visible(Stock))):
+            updated[row.id] = row._asdict()
+
+    errors = [
+        item_error(index, "id", "Stock not found", "not_found", values["id"])
+        for index, values in enumerate(updates)
+        if values["id"] not in updated
+    ]
+    if errors:
+        # Undo the updates of the stocks that exist
+        db.rollback()
+        raise BulkError(errors)
+
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["stock"])
+    for stock_id in ids:
+        record_update(db, "stock", updated[stock_id])
+    db.commit()
+
+    return [updated[stock_id] for stock_id in ids]
+
+
+def _update_stock_where(db: Session, values: Dict[str, Any], criteria: List[ColumnElement[bool]]) -> Dict[str, int]:
+    """
+    Update the stocks matching `criteria` with one UPDATE and commit, without reading them.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        values (Dict[str, Any]): The validated `price` or `price_factor`, and `is_available`.
+        criteria (List[ColumnElement[bool]]): Criteria of `stock_filters`.
+
+    Returns:
+        Dict[str, int]: `updated`, the number of stocks updated.
+
+    Raises:
+        LookupError: If `criteria` is empty, which would update every stock.
+        ValueError: If there's nothing to update.
+    """
+    if not values:
         raise ValueError("Nothing to update")
+    if not criteria:
+        raise LookupError("At least one filter is required")
+
+    if "price_factor" in values:
+        values["price"] = Stock.price * values.pop("price_factor")
+
+    statement = (
+        update(Stock)
+        .where(visible(Stock), *criteria)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    updated = db.execute(statement).rowcount
 
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["stock"])
+    # However many rows changed, none is read back: the caches drop what they hold of the stock
+    record_table_write(db, ["stock"])
     db.commit()
-    db.refresh(stock)  # Refresh the stock to get the updated data
-    
-    return stock._asdict()
\ No newline at end of file
+
+    return {"updated": updated}
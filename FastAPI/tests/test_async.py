@@ -0,0 +1,132 @@
+import asyncio
+import pytest
+import warnings
+import os
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from fastapi_app import app, get_db
+from database.test_session import AsyncTestingSessionLocal, engine, async_engine, override_get_db, override_get_async_db
+from database.session import Base, run_detached_service
+from models.stock import Stock
+from services.cache import coalesce, response_cache
+from services.name_cache import name_cache
+from services.stock_index import stock_index
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+@pytest.fixture(scope="module")
+def client():
+    # Swap to the AsyncSession dependency only while this module runs
+    app.dependency_overrides[get_db] = override_get_async_db
+    Base.metadata.create_all(bind=engine)
+    # The tables are recreated behind the write services, drop what other modules cached
+    response_cache.clear()
+    stock_index.invalidate()
+    name_cache.clear()
+
+    # A single portal keeps every request (and the aiosqlite pool) on the same event loop
+    with TestClient(app) as client:
+        client.post("/store", json={"name": "Nike"})
+        client.post("/product", json={"name": "Air Max"})
+        client.post("/stock", json={
+                "store_id": 1,
+                "product_id": 1,
+                "price": 300,
+                "is_available": True,
+                "category": "Tênis"
+            }
+        )
+
+        yield client
+
+        client.portal.call(async_engine.dispose)
+
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.drop_all(bind=engine)
+
+    # Close the connection
+    engine.dispose()
+
+    TEST_DB_PATH = "./test.db"
+
+    # Delete the test database
+    if os.path.exists(TEST_DB_PATH):
+        os.remove(TEST_DB_PATH)
+
+
+def test_async_get_stock(client):
+    response = client.get("/stock")
+    assert response.status_code == 200
+    assert response.json()["data"] == [
+        {
+            "id": 1,
+            "store_id": 1,
+            "product_id": 1,
+            "price": 300.0,
+            "is_available": True,
+            "category": "Tênis",
+            "product_name": "Air Max",
+            "store_name": "Nike",
+        }
+    ]
+
+def test_async_get_store_lazy_loads_nested_stock(client):
+    response = client.get("/store", params={"id": 1})
+    assert response.status_code == 200
+    assert response.json()["data"][0]["stock"][0]["product_name"] == "Air Max"
+
+def test_async_create_stock_missing_store(client):
+    response = client.post("/stock", json={
+            "store_id": 10,
+            "product_id": 1,
+            "price": 300,
+            "is_available": True,
+            "category": "Tênis"
+        }
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Store not found"
+
+def test_async_update_stock(client):
+    response = client.put("/stock/1", json={"price": 250})
+    assert response.status_code == 200
+    assert response.json()["data"]["price"] == 250.0
+
+def test_async_update_store(client):
+    response = client.put("/store/1", json={"name": "Nike 2.0"})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"id": 1, "name": "Nike 2.0"}
+
+def test_async_delete_stock(client):
+    response = client.delete("/stock/1")
+    assert response.status_code == 200
+    assert client.get("/stock").status_code == 404
+
+
+def test_async_coalesced_read_outlives_the_cancelled_request(client):
+    sessions = []
+
+    def read(session):
+        sessions.append(session)
+        return session.execute(select(func.count()).select_from(Stock)).scalar_one()
+
+    async def request(db):
+        return await coalesce("stock", {"outlives": True}, None, lambda: run_detached_service(db, read))
+
+    async def requests():
+        async with AsyncTestingSessionLocal() as first, AsyncTestingSessionLocal() as second:
+            leader = asyncio.create_task(request(first))
+            follower = asyncio.create_task(request(second))
+            await asyncio.sleep(0)
+            # The client of the first request goes away, `get_db` closes its session
+            leader.cancel()
+            await first.close()
+            return await follower, first.sync_session
+
+    count, leader_session = client.portal.call(requests)
+    with engine.connect() as connection:
+        assert count == connection.execute(select(func.count()).select_from(Stock)).scalar_one()
+    assert sessions and sessions[0] is not leader_session
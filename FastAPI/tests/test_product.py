@@ -7,6 +7,9 @@ from fastapi.testclient import TestClient
 from fastapi_app import app, get_db
 from database.test_session import engine, override_get_db
 from database.session import Base
+from services.cache import response_cache
+from services.name_cache import name_cache
+from services.stock_index import stock_index
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -18,6 +21,10 @@ client = TestClient(app)
 @pytest.fixture(scope="module")
 def setup_database():
     Base.metadata.create_all(bind=engine)
+    # The tables are recreated behind the write services, drop what other modules cached
+    response_cache.clear()
+    stock_index.invalidate()
+    name_cache.clear()
     client.post("/store", json={"name": "Nike"})
     client.post("/store", json={"name": "Adidas"})
     client.post("/product", json={"name": "Air Max"})
@@ -229,6 +236,64 @@ def test_get_product_by_name(setup_database):
         },
     ]
 
+def test_get_product_by_name_substring_ignores_case(setup_database):
+    response = client.get("product", params={"name": "ORUM"})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()["data"]] == ["Forum Low", "Forum Mid"]
+
+def test_get_product_by_name_exact_ignores_case(setup_database):
+    response = client.get("product", params={"name_exact": "air max"})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()["data"]] == ["Air Max"]
+
+def test_get_product_by_name_prefix(setup_database):
+    response = client.get("product", params={"name_prefix": "air "})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()["data"]] == ["Air Force", "Air Max"]
+
+def test_get_product_by_name_prefix_escapes_wildcards(setup_database):
+    response = client.get("product", params={"name_prefix": "Air_"})
+    assert response.status_code == 404
+
+def test_get_product_paginated(setup_database):
+    response = client.get("product", params={"limit": 2})
+    assert response.status_code == 200
+    assert [product["id"] for product in response.json()["data"]] == [1, 2]
+
+    names = []
+    cursor = None
+    while True:
+        response = client.get("product", params={"limit": 2, "cursor": cursor} if cursor else {"limit": 2})
+        assert response.status_code == 200
+        names += [product["name"] for product in response.json()["data"]]
+        cursor = response.json().get("next_cursor")
+        if cursor is None:
+            break
+    assert names == ["Air Max", "Air Force", "Forum Low", "Forum Mid", "Test Product"]
+
+def test_get_product_paginated_by_name_prefix(setup_database):
+    response = client.get("product", params={"name_prefix": "forum", "limit": 1})
+    assert response.json()["data"][0]["name"] == "Forum Low"
+
+    response = client.get("product", params={"name_prefix": "forum", "limit": 1, "cursor": response.json()["next_cursor"]})
+    assert response.status_code == 200
+    assert response.json()["data"][0]["name"] == "Forum Mid"
+    assert "next_cursor" not in response.json()
+
+def test_get_product_invalid_cursor(setup_database):
+    response = client.get("product", params={"limit": 2, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+    # A list of the right length holding an object, [{"a":1}]
+    response = client.get("product", params={"limit": 2, "cursor": "W3siYSI6MX1d"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+def test_get_product_invalid_limit(setup_database):
+    response = client.get("product", params={"limit": 0})
+    assert response.status_code == 422
+
 def test_get_product_not_in_database(setup_database):
     response = client.get("product", params={"name": "AllStar"})
     assert response.status_code == 404
@@ -243,6 +308,10 @@ def test_delete_product_success(setup_database):
     assert response.json()["message"] == "Product deleted successfully"
     assert response.json()["data"]["product_id"] == 5
 
+def test_get_deleted_product_by_name(setup_database):
+    response = client.get("product", params={"name": "Test Product"})
+    assert response.status_code == 404
+
 def test_delete_product_not_in_database(setup_database):
     response = client.delete("product/10")
     assert response.status_code == 404
@@ -260,6 +329,11 @@ def test_update_product_success(setup_database):
         "name": "Air Max Branco",
     }
 
+def test_get_updated_product_by_new_name(setup_database):
+    response = client.get("product", params={"name": "branco"})
+    assert response.status_code == 200
+    assert [product["id"] for product in response.json()["data"]] == [1]
+
 def test_update_product_wrong_type(setup_database):
     response = client.put("product/1", json={"name": None})
     assert response.status_code == 422
@@ -1,12 +1,28 @@
+import asyncio
 import pytest
 import warnings
 import os
+import json
+import sqlite3
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
+import fastapi_app
 from fastapi_app import app, get_db
 from database.test_session import engine, override_get_db
 from database.session import Base
+from database.stock_names import count_stale_stock_names, create_stock_names, repair_stock_names
+import services.cache
+from services.cache import response_cache, single_flight
+from services.name_cache import name_cache
+from services.stock_index import stock_index
+from services.stock import get_stocks_service
+from utils.cache import TTLLRUCache
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -18,6 +34,10 @@ client = TestClient(app)
 @pytest.fixture(scope="module")
 def setup_database():
     Base.metadata.create_all(bind=engine)
+    # The tables are recreated behind the write services, drop what other modules cached
+    response_cache.clear()
+    stock_index.invalidate()
+    name_cache.clear()
     client.post("/store", json={"name": "Nike"})
     client.post("/store", json={"name": "Adidas"})
     client.post("/product", json={"name": "Air Max"})
@@ -175,6 +195,21 @@ def test_create_stock_wrong_type_category(setup_database):
     assert response.status_code == 422
     assert response.json()["detail"][0]["msg"] == "Input should be a valid string"
 
+def test_create_stock_missing_parent(setup_database):
+    ids = [row["id"] for row in client.get("stock").json()["data"]]
+    stock = {"store_id": 1, "product_id": 3, "price": 200, "is_available": True, "category": "Tênis"}
+
+    response = client.post("stock", json={**stock, "store_id": 10})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Store not found"
+
+    response = client.post("stock", json={**stock, "product_id": 10})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Product not found"
+
+    # Nothing was inserted
+    assert [row["id"] for row in client.get("stock").json()["data"]] == ids
+
 # ------------ API GET ------------
 
 def test_get_stock_empty(setup_database):
@@ -412,6 +447,295 @@ def test_get_stock_by_category(setup_database):
         },
     ]
 
+def test_get_stock_by_store_id_and_product_id(setup_database):
+    response = client.get("stock", params={"store_id": 2, "product_id": 4})
+    assert response.status_code == 200
+    assert response.json()["data"] == [
+        {
+            "id": 4,
+            "store_id": 2,
+            "product_id": 4,
+            "price": 600.0,
+            "is_available": True,
+            "category": "Tênis",
+            "product_name": "Forum Mid",
+            "store_name": "Adidas",
+        }
+    ]
+
+def test_get_stock_by_store_name_exact_and_product_name_prefix(setup_database):
+    response = client.get("stock", params={"store_name_exact": "adidas", "product_name_prefix": "forum"})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.json()["data"]] == [3, 4]
+
+def test_get_stock_paginated(setup_database):
+    response = client.get("stock", params={"store_id": 2, "limit": 1})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.json()["data"]] == [3]
+
+    response = client.get("stock", params={"store_id": 2, "limit": 1, "cursor": response.json()["next_cursor"]})
+    assert [stock["id"] for stock in response.json()["data"]] == [4]
+    assert "next_cursor" not in response.json()
+
+def test_get_stock_same_bytes_as_stdlib_json(setup_database):
+    response = client.get("stock", params={"store_name_exact": "adidas"})
+    assert response.status_code == 200
+    # Same body JSONResponse would render, the non-ASCII category included
+    assert response.content == json.dumps(response.json(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def test_get_stock_cached_until_a_matching_write(setup_database):
+    response_cache.clear()
+    client.get("stock", params={"store_id": 1})
+    client.get("stock", params={"store_id": 2})
+
+    # A stock of store 2 changes, only the read of store 2 is evicted
+    client.put("stock/3", json={"price": 750})
+    hits = response_cache.hits
+    assert client.get("stock", params={"store_id": 1}).status_code == 200
+    assert response_cache.hits == hits + 1
+    response = client.get("stock", params={"store_id": 2})
+    assert response_cache.hits == hits + 1
+    assert [stock["price"] for stock in response.json()["data"]] == [750.0, 600.0]
+
+    client.put("stock/3", json={"price": 800})
+
+def test_get_stock_cached_read_evicted_when_an_update_moves_a_row_out(setup_database):
+    response_cache.clear()
+    ids = [stock["id"] for stock in client.get("stock", params={"max_price": 600}).json()["data"]]
+    assert 4 in ids
+
+    # The UPDATE returns the new price only, the read showing the old one is evicted all the same
+    client.put("stock/4", json={"price": 900})
+    response = client.get("stock", params={"max_price": 600})
+    assert [stock["id"] for stock in response.json()["data"]] == [id for id in ids if id != 4]
+
+    client.put("stock/4", json={"price": 600})
+
+def test_get_stock_read_again_after_another_process_writes(setup_database):
+    response_cache.clear()
+    client.get("stock", params={"store_id": 1})
+
+    # Another worker writes through a connection of its own, bumping the counter like the write services
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        connection.execute("UPDATE stock SET price = 350 WHERE id = 1")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'stock'")
+
+    misses = response_cache.misses
+    response = client.get("stock", params={"store_id": 1})
+    assert response_cache.misses == misses + 1
+    assert response.json()["data"][0]["price"] == 350.0
+
+    client.put("stock/1", json={"price": 300})
+
+def test_get_stock_not_modified_until_a_write(setup_database):
+    response = client.get("stock", params={"store_id": 1})
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache" and "Last-Modified" in response.headers
+
+    # Answered from the counters, neither the cache nor the database is read
+    hits, misses = response_cache.hits, response_cache.misses
+    response = client.get("stock", params={"store_id": 1}, headers={"If-None-Match": f'W/"other", {etag}'})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["ETag"] == etag
+    assert (response_cache.hits, response_cache.misses) == (hits, misses)
+
+    assert client.get("stock", params={"store_id": 2}).headers["ETag"] != etag
+
+    # Any write to the stock table changes the ETag of every stock read
+    client.put("stock/3", json={"price": 750})
+    response = client.get("stock", params={"store_id": 1}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    client.put("stock/3", json={"price": 800})
+
+def test_get_stock_validators_read_off_the_event_loop(setup_database, monkeypatch):
+    loops = []
+    original = services.cache.read_validators
+
+    def read_validators(db, kind, params):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return original(db, kind, params)
+
+    monkeypatch.setattr(services.cache, "read_validators", read_validators)
+    assert client.get("stock", params={"store_id": 1}).status_code == 200
+    # The watcher polls SQLite with the blocking sqlite3 module, on a threadpool thread
+    assert loops == [None]
+
+def test_get_stock_identical_requests_share_one_query(setup_database, monkeypatch):
+    calls = []
+
+    def slow_get_stocks_service(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.2)  # Still running when the other requests arrive
+        return get_stocks_service(**kwargs)
+
+    monkeypatch.setattr(fastapi_app, "get_stocks_service", slow_get_stocks_service)
+    response_cache.clear()
+    coalesced = single_flight.coalesced
+
+    # A single portal, so every request is awaited on the same event loop
+    with TestClient(app) as concurrent_client, ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: concurrent_client.get("stock", params={"category": "Tênis"}), range(8)))
+
+    assert len(calls) == 1
+    assert single_flight.coalesced == coalesced + 7
+    # Served by GET /stats as well
+    stats = client.get("/stats").json()["data"]
+    assert stats["single_flight"] == single_flight.stats() and stats["single_flight"]["coalesced"] == coalesced + 7
+    assert stats["response_cache"]["entries"] == len(response_cache)
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json() == responses[0].json() for response in responses)
+
+def test_get_stock_cached_rows_sent_as_encoded(setup_database):
+    response_cache.clear()
+    first = client.get("stock", params={"category": "Tênis"})
+    hits = response_cache.hits
+    second = client.get("stock", params={"category": "Tênis"})
+    assert response_cache.hits == hits + 1
+    assert second.content == first.content == json.dumps(first.json(), separators=(",", ":"), ensure_ascii=False).encode()
+
+def test_get_stock_dict_rows_checked_against_the_response_model(setup_database, monkeypatch):
+    row = {
+        "id": 1, "store_id": 1, "product_id": 1, "price": 300, "is_available": True,
+        "category": "Tênis", "product_name": "Air Max", "store_name": "Nike",
+    }
+    monkeypatch.setattr(fastapi_app, "get_stocks_service", lambda **kwargs: ([{**row, "internal": 1}], None))
+    response_cache.clear()
+    # Encoded with the fields of StockResponse alone, the price as a float
+    assert client.get("stock", params={"store_id": 1}).json()["data"] == [{**row, "price": 300.0}]
+
+    monkeypatch.setattr(fastapi_app, "get_stocks_service", lambda **kwargs: ([{**row, "price": "abc"}], None))
+    response_cache.clear()
+    assert client.get("stock", params={"store_id": 1}).status_code == 500
+    response_cache.clear()
+
+def test_get_stock_reads_the_stock_table_alone(setup_database, monkeypatch):
+    monkeypatch.setattr("services.stock.READ_PATH", "projection")
+    client.get("stock", params={"store_id": 1})
+    response_cache.clear()
+
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # The names are copied to the stock rows by the rename itself
+    client.put("product/1", json={"name": "Air Max 90"})
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.get("stock", params={"store_id": 1})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert response.json()["data"][0]["product_name"] == "Air Max 90"
+    assert len(statements) == 1 and "JOIN" not in statements[0]
+
+    # A rename by another process is seen through the counters
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        connection.execute("UPDATE products SET name = 'Air Max 95' WHERE id = 1")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'products'")
+    response = client.get("stock", params={"store_id": 1})
+    assert response.json()["data"][0]["product_name"] == "Air Max 95"
+
+    client.put("product/1", json={"name": "Air Max"})
+
+def test_stock_names_follow_writes(setup_database, monkeypatch):
+    monkeypatch.setattr("services.stock.READ_PATH", "projection")
+    response_cache.clear()
+
+    # A rename is copied to the stock rows, and the name filters read the copies
+    client.put("store/2", json={"name": "Adidas Originals"})
+    response = client.get("stock", params={"store_name_exact": "adidas originals"})
+    assert {stock["store_name"] for stock in response.json()["data"]} == {"Adidas Originals"}
+    assert client.get("stock", params={"store_name_exact": "adidas"}).status_code == 404
+    client.put("store/2", json={"name": "Adidas"})
+
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        # Another writer can not make a copy differ from the name
+        connection.execute("UPDATE stock SET store_name = 'Puma' WHERE id = 1")
+        assert connection.execute("SELECT store_name FROM stock WHERE id = 1").fetchone() == ("Nike",)
+
+        # Rows written without the triggers are found and repaired
+        connection.execute("DROP TRIGGER stock_names_au")
+        connection.execute("UPDATE stock SET store_name = 'Puma' WHERE id = 1")
+    with engine.begin() as connection:
+        assert count_stale_stock_names(connection) == 1
+        assert repair_stock_names(connection) == 1
+        assert count_stale_stock_names(connection) == 0
+        assert create_stock_names(connection)
+
+def test_get_stock_index_matches_projection(setup_database, monkeypatch):
+    pytest.importorskip("numpy")
+    # Same bytes as the projection path, SQLite's ASCII-only case folding and LIKE wildcards included
+    for params in (
+        {},
+        {"category": "tên"},
+        {"category": "TÊNIS"},
+        {"category": "t_nis", "max_price": 700},
+        {"product_name": "air", "is_available": True},
+        {"product_name": "ai"},
+        {"store_name_exact": "adidas", "product_name_prefix": "forum"},
+        {"store_id": 2, "limit": 1},
+        {"limit": 2, "cursor": "WzJd"},
+    ):
+        contents = []
+        for read_path in ("projection", "index"):
+            monkeypatch.setattr("services.stock.READ_PATH", read_path)
+            response_cache.clear()
+            contents.append(client.get("stock", params=params).content)
+        assert contents[0] == contents[1]
+
+def test_get_stock_index_follows_writes(setup_database, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr("services.stock.READ_PATH", "index")
+    stock_index.invalidate()
+    client.get("stock")
+    size = len(stock_index)
+
+    builds = []
+    build = stock_index.build
+    monkeypatch.setattr(stock_index, "build", lambda db: builds.append(db) or build(db))
+
+    # The writes of this process are applied to the arrays as they commit
+    stock_id = client.post("stock", json={
+        "store_id": 2, "product_id": 1, "price": 100, "is_available": False, "category": "Bota"
+    }).json()["data"]["id"]
+    client.put(f"stock/{stock_id}", json={"price": 90})
+    client.put("product/1", json={"name": "Air Max 90"})
+    response = client.get("stock", params={"category": "bota"})
+    assert [(stock["price"], stock["product_name"]) for stock in response.json()["data"]] == [(90.0, "Air Max 90")]
+
+    client.delete(f"stock/{stock_id}")
+    assert client.get("stock", params={"category": "bota"}).status_code == 404
+    assert len(stock_index) == size and builds == []
+    client.put("product/1", json={"name": "Air Max"})
+
+    # A write of another process is only seen through the counters, the index is built again
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        connection.execute("UPDATE stock SET price = 350 WHERE id = 1")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'stock'")
+    assert client.get("stock", params={"store_id": 1}).json()["data"][0]["price"] == 350.0
+    assert len(builds) == 1
+
+    client.put("stock/1", json={"price": 300})
+
+def test_cache_bounds_and_invalidation():
+    cache = TTLLRUCache(max_entries=2, max_bytes=100, ttl=60)
+    cache.put("a", "a", 10, cache.generation)
+    cache.put("b", "b", 10, cache.generation)
+    cache.get("a")
+    cache.put("c", "c", 10, cache.generation)
+    # The least recently used entry goes first
+    assert cache.get("b") is None and cache.get("a") == "a"
+    assert not cache.put("d", "d", 101, cache.generation)
+
+    # A value read before an invalidation is not stored
+    generation = cache.generation
+    assert cache.evict(lambda value: value == "a") == 1
+    assert not cache.put("a", "stale", 10, generation)
+
 def test_get_stock_not_in_database(setup_database):
     response = client.get("stock", params={"product_name": "AllStar"})
     assert response.status_code == 404
@@ -478,3 +802,119 @@ def test_update_stock_missing_id(setup_database):
     response = client.put("stock/", json={"price": 1000})
     assert response.status_code == 405
     assert response.json()["detail"] == "Method Not Allowed"
+
+
+# ------------ API BULK ------------
+
+def test_create_bulk_success(setup_database):
+    stores = client.post("/store/bulk", json=[{"name": "Puma"}, {"name": "Reebok"}])
+    assert stores.status_code == 201
+    assert [store["name"] for store in stores.json()["data"]] == ["Puma", "Reebok"]
+    products = client.post("/product/bulk", json=[{"name": "Suede"}])
+    assert products.status_code == 201
+
+    store_ids = [store["id"] for store in stores.json()["data"]]
+    product_id = products.json()["data"][0]["id"]
+    response = client.post("/stock/bulk", json=[
+        {"store_id": store_id, "product_id": product_id, "price": 400, "is_available": True, "category": "Tênis"}
+        for store_id in store_ids
+    ])
+    assert response.status_code == 201
+    created = response.json()["data"]
+    # In the order of the body, with the keys of POST /stock
+    assert [(stock["store_id"], stock["store"], stock["product_name"]) for stock in created] == [
+        (store_ids[0], "Puma", "Suede"), (store_ids[1], "Reebok", "Suede")
+    ]
+    assert created[0]["id"] < created[1]["id"]
+
+    response = client.get("stock", params={"product_id": product_id})
+    assert [stock["id"] for stock in response.json()["data"]] == [stock["id"] for stock in created]
+
+def test_create_bulk_item_errors(setup_database):
+    count = len(client.get("stock").json()["data"])
+    response = client.post("/stock/bulk", json=[
+        {"store_id": 1, "product_id": 1, "price": 10, "is_available": True, "category": "Tênis"},
+        {"store_id": 1, "product_id": 999, "price": 10, "is_available": True, "category": "Tênis"},
+        {"store_id": 999, "product_id": 1, "price": 10, "is_available": True, "category": "Tênis"},
+    ])
+    assert response.status_code == 422
+    assert [(error["loc"], error["msg"]) for error in response.json()["detail"]] == [
+        (["body", 1, "product_id"], "Product not found"),
+        (["body", 2, "store_id"], "Store not found"),
+    ]
+    # Nothing is created when any item fails
+    assert len(client.get("stock").json()["data"]) == count
+
+def test_create_bulk_batch_size(setup_database, monkeypatch):
+    monkeypatch.setattr("utils.bulk.BULK_MAX_ITEMS", 2)
+    response = client.post("/store/bulk", json=[{"name": "A"}, {"name": "B"}, {"name": "C"}])
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["msg"] == "Bulk requests take between 1 and 2 items"
+    assert client.post("/store/bulk", json=[]).status_code == 422
+
+def test_update_bulk_success(setup_database):
+    response_cache.clear()
+    client.get("stock", params={"store_id": 1})
+
+    response = client.patch("/stock/bulk", json=[
+        {"id": 3, "is_available": False, "category": "Sneaker"},
+        {"id": 2, "price": 850},
+    ])
+    assert response.status_code == 200
+    assert response.json()["message"] == "Stocks updated successfully"
+    # In the order of the body, with the keys of PUT /stock/{stock_id}
+    assert [(stock["id"], stock["price"], stock["is_available"], stock["category"]) for stock in response.json()["data"]] == [
+        (3, 800.0, False, "Sneaker"), (2, 850.0, True, "Tênis")
+    ]
+
+    # The cached read showing stock 2 is evicted
+    response = client.get("stock", params={"store_id": 1})
+    assert {stock["id"]: stock["price"] for stock in response.json()["data"]}[2] == 850.0
+
+    client.patch("/stock/bulk", json=[{"id": 3, "is_available": True, "category": "Tênis"}, {"id": 2, "price": 800}])
+
+def test_update_bulk_item_errors(setup_database):
+    response = client.patch("/stock/bulk", json=[{"id": 2, "price": 1}, {"id": 999, "price": 1}])
+    assert response.status_code == 422
+    assert [(error["loc"], error["msg"]) for error in response.json()["detail"]] == [
+        (["body", 1, "id"], "Stock not found"),
+    ]
+    # Nothing is updated when any item fails
+    assert client.get("stock", params={"store_id": 1}).json()["data"][1]["price"] == 800.0
+
+    response = client.patch("/stock/bulk", json=[{"id": 2, "price": 1}, {"id": 2}])
+    assert [(error["loc"], error["msg"]) for error in response.json()["detail"]] == [
+        (["body", 1], "Nothing to update"),
+        (["body", 1, "id"], "Stock updated twice"),
+    ]
+
+def test_update_where_success(setup_database):
+    response_cache.clear()
+    prices = [stock["price"] for stock in client.get("stock", params={"store_id": 2}).json()["data"]]
+
+    response = client.patch("/stock/where", params={"store_id": 2}, json={"price_factor": 0.5})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"updated": len(prices)}
+
+    # The write drops every cached read of the stock
+    response = client.get("stock", params={"store_id": 2})
+    assert [stock["price"] for stock in response.json()["data"]] == [price / 2 for price in prices]
+
+    response = client.patch("/stock/where", params={"store_id": 2, "max_price": 100}, json={"is_available": False})
+    assert response.json()["data"] == {"updated": 0}
+
+    client.patch("/stock/where", params={"store_id": 2}, json={"price_factor": 2})
+
+def test_update_where_invalid(setup_database):
+    # Without a filter every stock would be updated
+    response = client.patch("/stock/where", json={"price": 1})
+    assert response.status_code == 422
+    assert response.json()["detail"] == "At least one filter is required"
+
+    response = client.patch("/stock/where", params={"store_id": 2}, json={"price": 1, "price_factor": 2})
+    assert response.status_code == 422
+
+    # A validation error, not a stock that was not found
+    response = client.patch("/stock/where", params={"store_id": 2}, json={})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["msg"] == "Value error, Nothing to update"
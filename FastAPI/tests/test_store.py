@@ -5,8 +5,12 @@ import os
 from fastapi.testclient import TestClient
 
 from fastapi_app import app, get_db
-from database.test_session import engine, override_get_db
+from database.test_session import TestingSessionLocal, engine, override_get_db
 from database.session import Base
+from services.cache import response_cache
+from services.deletion import purge_pending
+from services.name_cache import name_cache
+from services.stock_index import stock_index
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -18,6 +22,10 @@ client = TestClient(app)
 @pytest.fixture(scope="module")
 def setup_database():
     Base.metadata.create_all(bind=engine)
+    # The tables are recreated behind the write services, drop what other modules cached
+    response_cache.clear()
+    stock_index.invalidate()
+    name_cache.clear()
     client.post("/store", json={"name": "Nike"})
     client.post("/store", json={"name": "Adidas"})
     client.post("/product", json={"name": "Air Max"})
@@ -221,6 +229,60 @@ def test_get_store_by_name(setup_database):
         }
     ]
 
+def test_get_store_stock_summary(setup_database):
+    response = client.get("store", params={"include": "summary"})
+    assert response.status_code == 200
+    assert response.json()["data"][:2] == [
+        {"id": 1, "name": "Nike", "stock_count": 2, "min_price": 300.0, "max_price": 800.0},
+        {"id": 2, "name": "Adidas", "stock_count": 2, "min_price": 600.0, "max_price": 800.0},
+    ]
+    assert response.json()["data"][2]["stock_count"] == 0
+
+def test_get_store_without_stock(setup_database):
+    response = client.get("store", params={"id": 1, "include": "none"})
+    assert response.status_code == 200
+    assert response.json()["data"] == [{"id": 1, "name": "Nike"}]
+
+def test_get_store_stock_limit(setup_database):
+    response = client.get("store", params={"stock_limit": 1})
+    assert response.status_code == 200
+    assert [[stock["id"] for stock in store["stock"]] for store in response.json()["data"]] == [[1], [3], []]
+
+def test_get_store_invalid_include(setup_database):
+    response = client.get("store", params={"include": "everything"})
+    assert response.status_code == 422
+
+def test_get_store_stock_sub_resource(setup_database):
+    response = client.get("store/2/stock", params={"limit": 1})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.json()["data"]] == [3]
+
+    response = client.get("store/2/stock", params={"limit": 1, "cursor": response.json()["next_cursor"]})
+    assert [stock["id"] for stock in response.json()["data"]] == [4]
+    assert "next_cursor" not in response.json()
+
+def test_get_product_stock_sub_resource(setup_database):
+    response = client.get("product/3/stock", params={"store_name_exact": "adidas"})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.json()["data"]] == [3]
+
+def test_get_read_paths_match(setup_database, monkeypatch):
+    # Both read paths must send the same bytes
+    for path, params in (
+        ("/store", {}),
+        ("/store", {"stock_limit": 1}),
+        ("/store", {"include": "summary"}),
+        ("/product", {"name_prefix": "forum", "limit": 1}),
+        ("/stock", {"store_name": "ad", "max_price": 700}),
+    ):
+        contents = []
+        for read_path in ("orm", "projection"):
+            for service in ("services.stock", "services.product", "services.store"):
+                monkeypatch.setattr(f"{service}.READ_PATH", read_path)
+            response_cache.clear()
+            contents.append(client.get(path, params=params).content)
+        assert contents[0] == contents[1]
+
 def test_get_store_not_in_database(setup_database):
     response = client.get("/store", params={"name": "Kabum"})
     assert response.status_code == 404
@@ -240,6 +302,65 @@ def test_delete_store_not_in_database(setup_database):
     assert response.status_code == 404
     assert response.json()["detail"] == "Store not found"
 
+def test_delete_store_deletes_its_stock(setup_database):
+    store_id = client.post("/store", json={"name": "Puma"}).json()["data"]["id"]
+    stock = {"store_id": store_id, "product_id": 1, "price": 500, "is_available": True, "category": "Tênis"}
+    client.post("/stock", json=stock)
+    client.post("/stock", json={**stock, "product_id": 2})
+    response_cache.clear()
+    assert len(client.get("/stock", params={"store_id": store_id}).json()["data"]) == 2
+    stock_count = client.get("/product", params={"id": 1, "include": "summary"}).json()["data"][0]["stock_count"]
+
+    assert client.delete(f"/store/{store_id}").status_code == 200
+
+    # Deleted by the cascade, and gone from the cached reads and the stock index
+    assert client.get("/stock", params={"store_id": store_id}).status_code == 404
+    response = client.get("/product", params={"id": 1, "include": "summary"})
+    assert response.json()["data"][0]["stock_count"] == stock_count - 1
+
+
+def test_delete_store_in_background(setup_database):
+    store_id = client.post("/store", json={"name": "Fila"}).json()["data"]["id"]
+    stock = {"store_id": store_id, "product_id": 1, "price": 500, "is_available": True, "category": "Tênis"}
+    client.post("/stock", json=stock)
+    client.post("/stock", json={**stock, "product_id": 2})
+    response_cache.clear()
+    stock_count = client.get("/product", params={"id": 1, "include": "summary"}).json()["data"][0]["stock_count"]
+
+    response = client.delete(f"/store/{store_id}", params={"mode": "async"})
+    assert response.status_code == 202
+    assert response.json()["message"] == "Store deletion started"
+    deletion_id = response.json()["data"]["deletion_id"]
+
+    # Hidden from the reads and the writes while its stock is still there
+    assert client.get("/store", params={"id": store_id}).status_code == 404
+    assert client.get("/stock", params={"store_id": store_id}).status_code == 404
+    response = client.get("/product", params={"id": 1, "include": "summary"})
+    assert response.json()["data"][0]["stock_count"] == stock_count - 1
+    response = client.get("/product", params={"id": 1})
+    assert all(stock["store_id"] != store_id for stock in response.json()["data"][0]["stock"])
+    assert client.post("/stock", json=stock).json()["detail"] == "Store not found"
+    assert client.delete(f"/store/{store_id}", params={"mode": "async"}).status_code == 404
+    assert client.get(f"/deletion/{deletion_id}").json()["data"]["done"] is False
+
+    # The tests start no worker, the deletion is run here one stock row per transaction
+    with TestingSessionLocal() as db:
+        assert purge_pending(db, chunk_size=1, pause=0) == [deletion_id]
+
+    response = client.get(f"/deletion/{deletion_id}")
+    assert response.json()["data"] == {"id": deletion_id, "table": "stores", "row_id": store_id, "purged": 2, "done": True}
+
+
+def test_delete_store_invalid_mode(setup_database):
+    response = client.delete("/store/1", params={"mode": "later"})
+    assert response.status_code == 422
+
+
+def test_get_deletion_not_in_database(setup_database):
+    response = client.get("/deletion/1000")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Deletion not found"
+
 
 # ------------ API UPDATE ------------
 
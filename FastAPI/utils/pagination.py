@@ -0,0 +1,142 @@
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import ColumnElement
+
+# Page size used when only a cursor is given, and the largest `limit` accepted
+MAX_PAGE_SIZE = 100
+
+
+class PaginationError(Exception):
+    """
+    Raised for a malformed cursor or a `limit` out of range.
+    """
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+
+    Args:
+        key (Sequence[Any]): Values of the keyset columns, the row id last.
+
+    Returns:
+        str: URL safe cursor for the next page.
+    """
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor made by `encode_cursor`.
+
+    Args:
+        cursor (str): Cursor sent by the client.
+        size (int): Number of keyset columns the cursor must hold.
+
+    Returns:
+        List[Any]: Values of the keyset columns.
+
+    Raises:
+        PaginationError: If the cursor was not made for this keyset, or holds other than scalars.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise PaginationError("Invalid cursor")
+
+    if not isinstance(key, list) or len(key) != size:
+        raise PaginationError("Invalid cursor")
+    # Sort keys are ids, names and search ranks, an object or list would reach the SQL
+    if any(isinstance(value, bool) or not isinstance(value, (int, float, str)) for value in key):
+        raise PaginationError("Invalid cursor")
+
+    return key
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Validate the `limit` of a page.
+
+    Args:
+        limit (Optional[int]): Page size sent by the client.
+
+    Returns:
+        int: The limit, `MAX_PAGE_SIZE` if not provided.
+
+    Raises:
+        PaginationError: If the limit is out of range.
+    """
+    if limit is None:
+        return MAX_PAGE_SIZE
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise PaginationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def seek(query: Query, keys: Sequence[ColumnElement], cursor: Optional[str]) -> Query:
+    """
+    Start `query` right after the row the cursor points at.
+
+    Apply it before the other filters: SQLite starts the index range at the first bound it finds
+    on the leading sort key, so deep pages seek straight to the cursor instead of skipping the
+    rows of the previous pages like OFFSET does.
+
+    Args:
+        query (Query): Query to paginate.
+        keys (Sequence[ColumnElement]): Sort key columns, ending with the unique id column.
+        cursor (Optional[str]): `next_cursor` of the previous page, None for the first page.
+
+    Returns:
+        Query: The query filtered to the rows after the cursor.
+
+    Raises:
+        PaginationError: If the cursor is malformed.
+    """
+    if cursor is None:
+        return query
+
+    after = decode_cursor(cursor, len(keys))
+    if len(keys) == 1:
+        return query.filter(keys[0] > after[0])
+
+    # SQLite does not seek with a row value, the redundant bound on the leading key does
+    return query.filter(keys[0] >= after[0], tuple_(*keys) > tuple_(*after))
+
+
+def fetch_page(query: Query, keys: Sequence[ColumnElement], limit: Optional[int]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch the first `limit` rows of `query` ordered by `keys`.
+
+    Args:
+        query (Query): Filtered query of one entity or of columns, without ORDER BY.
+        keys (Sequence[ColumnElement]): Sort key columns, ending with the unique id column.
+        limit (Optional[int]): Page size, `MAX_PAGE_SIZE` if not provided.
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: Entities or column tuples of the page and the cursor of
+            the next page, None on the last page.
+
+    Raises:
+        PaginationError: If the limit is out of range.
+    """
+    limit = page_size(limit)
+
+    # The sort key is appended to the selected entity or columns
+    width = len(query.column_descriptions)
+
+    # One extra row tells whether there is a next page
+    rows = query.add_columns(*keys).order_by(*keys).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][width:])
+
+    if width == 1:
+        return [row[0] for row in rows], next_cursor
+    return [row[:width] for row in rows], next_cursor
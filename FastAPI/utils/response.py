@@ -1,21 +1,61 @@
-from typing import Optional, Any
+from typing import Any, Dict, NamedTuple, Optional
 from fastapi.responses import JSONResponse
+from pydantic_core import to_json
 
-def create_response(status_code: int, message: str, data: Optional[Any] = None) -> JSONResponse:
+
+class RawJSON(NamedTuple):
+    """
+    A JSON value encoded ahead of the response, written to the body as it is.
+    """
+    body: bytes
+
+
+class PydanticJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded by pydantic-core in a single pass.
+
+    Dicts, lists and pydantic models (already validated on construction) are written straight
+    to bytes, without a `model_dump()` copy or a second walk by the stdlib `json` module.
+    The bytes are the same as JSONResponse's: compact separators and UTF-8 text. `RawJSON` members
+    of a dict body are written as they are, without being encoded again.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, dict) and any(isinstance(value, RawJSON) for value in content.values()):
+            return b"{" + b",".join(
+                to_json(key) + b":" + (value.body if isinstance(value, RawJSON) else to_json(value))
+                for key, value in content.items()
+            ) + b"}"
+        return to_json(content)
+
+
+def create_response(
+    status_code: int,
+    message: str,
+    data: Optional[Any] = None,
+    next_cursor: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> PydanticJSONResponse:
     """
     Standardized response format for the API.
 
     Args:
         status_code (int): HTTP status code for the response.
         message (str): Message describing the result (e.g., success or error).
-        data (Optional[Any]): Data to be included in the response body.
+        data (Optional[Any]): Data to be included in the response body, dicts, pydantic models
+                              or `RawJSON`.
+        next_cursor (Optional[str]): Cursor of the next page of a paginated list, left out
+                                     of the body on the last page.
+        headers (Optional[Dict[str, str]]): Extra response headers, e.g. `validator_headers(...)`.
 
     Returns:
-        JSONResponse: A JSON response object containing the status code, message, 
-                      and optional data in the response body.
+        PydanticJSONResponse: A JSON response object containing the status code, message,
+                              and optional data in the response body.
     """
     response_content = {"message": message}
     if data is not None:
         response_content["data"] = data
-    
-    return JSONResponse(status_code=status_code, content=response_content)
\ No newline at end of file
+    if next_cursor is not None:
+        response_content["next_cursor"] = next_cursor
+
+    return PydanticJSONResponse(status_code=status_code, content=response_content, headers=headers)
@@ -0,0 +1,57 @@
+"""
+Compare the encoding of a large GET /stock body by Flask's default JSON provider and the orjson one, and
+by the orjson one from the rows encoded once by the response cache.
+
+Run from the Flask folder:
+    python -m benchmarks.bench_json_provider --rows 50000
+"""
+import argparse
+import time
+
+import orjson
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from services.stock import STOCK_FIELDS
+from utils.json_provider import ORJSONProvider
+
+
+def stock_dicts(rows: int) -> list:
+    return [
+        dict(zip(STOCK_FIELDS, (
+            i + 1, i % 100 + 1, i // 100 + 1, float(i % 1000), True, "Tênis", f"Store {i % 100}", f"Product {i // 100}"
+        )))
+        for i in range(rows)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    rows = stock_dicts(args.rows)
+    body = {"message": "Stocks fetched successfully", "data": rows}
+    # A response cache hit: the rows were encoded when the read was cached
+    cached_body = {**body, "data": orjson.Fragment(orjson.dumps(rows, option=orjson.OPT_SORT_KEYS))}
+
+    cases = (
+        ("default", DefaultJSONProvider(app), body),
+        ("orjson", ORJSONProvider(app), body),
+        ("orjson, cached read", ORJSONProvider(app), cached_body),
+    )
+    print(f"{'provider':<22}{'ms':>10}{'KiB':>10}")
+    for name, provider, content in cases:
+        best = float("inf")
+        with app.app_context():
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = provider.response(content)
+                best = min(best, time.perf_counter() - start)
+        print(f"{name:<22}{best * 1000:>10.1f}{len(response.data) / 1024:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Trigram FTS5 indexes over `products.name` and `stores.name` for the contains-match name filters.
+
+An `ilike('%term%')` can never use an index, the trigram tokenizer indexes every 3 character
+substring instead, so `"term"` matches the same rows through an index lookup. The FTS table is an
+external content table kept in sync with its source table by triggers.
+"""
+from sqlalchemy import DDL, Table, column, event, literal_column, select, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+from typing import Dict, Optional
+
+# Trigram queries need at least 3 characters, shorter terms fall back to ilike
+MIN_TERM_LENGTH = 3
+
+# Source table name -> lightweight FTS table used to build queries
+NAME_SEARCH_TABLES: Dict[str, Table] = {}
+
+
+def _name_search_ddl(source: str) -> list:
+    fts = f"{source}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"name, content='{source}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF name ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+    ]
+
+
+def add_name_search(source: Table) -> None:
+    """
+    Create (and drop) the FTS table and its triggers together with the source table.
+
+    Args:
+        source (Table): Table with `id` and `name` columns, e.g. `Product.__table__`.
+    """
+    NAME_SEARCH_TABLES[source.name] = table(f"{source.name}_fts", column("rowid"), column("rank"))
+
+    for statement in _name_search_ddl(source.name):
+        event.listen(source, "after_create", DDL(statement))
+    event.listen(source, "before_drop", DDL(f"DROP TABLE IF EXISTS {source.name}_fts"))
+
+
+def create_name_search(connection: Connection, source: str) -> bool:
+    """
+    Add the FTS table and triggers to an existing database and index the rows already there.
+
+    Args:
+        connection (Connection): Connection inside a transaction.
+        source (str): Name of the source table.
+
+    Returns:
+        bool: True if the FTS table had to be created.
+    """
+    fts = f"{source}_fts"
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+    ).first()
+
+    for statement in _name_search_ddl(source):
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    return not exists
+
+
+def name_search(source: str, term: str) -> Optional[Select]:
+    """
+    Build a ranked `SELECT rowid, rank` of the rows whose name contains `term`.
+
+    Args:
+        source (str): Name of the source table.
+        term (str): Substring to look for, case insensitive.
+
+    Returns:
+        Optional[Select]: The FTS query, or None if the term is too short for the trigram index.
+    """
+    if len(term) < MIN_TERM_LENGTH:
+        return None
+
+    fts = NAME_SEARCH_TABLES[source]
+    # Quote the term so FTS5 reads it as one literal string and not as query syntax
+    phrase = '"' + term.replace('"', '""') + '"'
+
+    return select(fts.c.rowid, fts.c.rank).where(literal_column(fts.name).op("MATCH")(phrase))
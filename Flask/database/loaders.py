@@ -0,0 +1,58 @@
+import os
+
+from sqlalchemy.orm import InstrumentedAttribute, Load, joinedload, selectinload, subqueryload
+from typing import Dict, Optional
+
+# Eager loading strategies the services can pick from
+LOADER_STRATEGIES = {
+    # LEFT JOIN in the parent query: one row per child, the parent columns repeated on each
+    "joined": joinedload,
+    # One extra SELECT ... WHERE parent_id IN (...) per level, each row sent once
+    "selectin": selectinload,
+    # One extra SELECT joined to the parent query wrapped as a subquery
+    "subquery": subqueryload,
+}
+
+# Strategy of the stock collections, selected with the LOADER_STRATEGY env var
+LOADER_STRATEGY = os.getenv("LOADER_STRATEGY", "selectin")
+if LOADER_STRATEGY not in LOADER_STRATEGIES:
+    # Fail on startup rather than on the first request
+    raise ValueError(f"Unknown loader strategy '{LOADER_STRATEGY}', expected one of {', '.join(LOADER_STRATEGIES)}")
+
+# How the GET list services read: "projection" selects only the columns of the response into
+# plain rows, "orm" loads Stock, Product and Store entities with the strategies below, "index"
+# answers get_stocks_service from the in-memory arrays of services/stock_index.py (needs numpy)
+# and reads the other lists like "projection"
+READ_PATHS = ("projection", "orm", "index")
+READ_PATH = os.getenv("READ_PATH", "projection")
+if READ_PATH not in READ_PATHS:
+    raise ValueError(f"Unknown read path '{READ_PATH}', expected one of {', '.join(READ_PATHS)}")
+
+RELATIONSHIP_LOADERS: Dict[str, str] = {
+    "Store.stock": LOADER_STRATEGY,
+    "Product.stock": LOADER_STRATEGY,
+    # Many-to-one: the join adds a few columns to each row, never more rows
+    "Stock.store": "joined",
+    "Stock.product": "joined",
+}
+
+
+def eager_load(relationship: InstrumentedAttribute, strategy: Optional[str] = None) -> Load:
+    """
+    Loader option for a relationship with its configured strategy.
+
+    Args:
+        relationship (InstrumentedAttribute): The relationship to load, e.g. `Store.stock`.
+        strategy (Optional[str]): Name in LOADER_STRATEGIES. Defaults to the one in RELATIONSHIP_LOADERS.
+
+    Returns:
+        Load: Option for `Query.options`, chain the next level with its `.options()`.
+
+    Raises:
+        ValueError: If the strategy does not exist.
+    """
+    strategy = strategy or RELATIONSHIP_LOADERS.get(str(relationship), "joined")
+    if strategy not in LOADER_STRATEGIES:
+        raise ValueError(f"Unknown loader strategy '{strategy}', expected one of {', '.join(LOADER_STRATEGIES)}")
+
+    return LOADER_STRATEGIES[strategy](relationship)
@@ -1,10 +1,14 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from database.profile import configure_engine
+
 DATABASE_URL = "sqlite:///sample.db?charset=utf8"
 
 engine = create_engine(DATABASE_URL, echo=True)
+configure_engine(engine)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The write services return the rows their statements return, nothing is read again after a commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
\ No newline at end of file
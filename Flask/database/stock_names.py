@@ -0,0 +1,132 @@
+"""
+Copies of the product and store names on the stock rows, `stock.product_name` and `stock.store_name`.
+
+Stock listings render and filter on these columns instead of joining products and stores. Triggers
+keep them equal to the name of the product and store of the row, NULL while it does not exist: a
+rename or delete is copied to the stock of the product or store with one set-based UPDATE, and a
+stock inserted or updated with other names gets them set. The create services write the names in
+their INSERT already, so that trigger only fires for other writers.
+
+Rows written before the triggers existed are found by `count_stale_stock_names` and fixed by
+`repair_stock_names`, which the migration runs once the columns are added.
+
+Run from the app folder to count the stale rows, and with --repair to fix them:
+    python -m database.stock_names [--repair]
+"""
+import argparse
+
+from sqlalchemy import DDL, Table, event
+from sqlalchemy.engine import Connection
+from typing import Dict
+
+# Source table -> foreign key and name column of stock
+PARENTS = {"products": ("product_id", "product_name"), "stores": ("store_id", "store_name")}
+
+
+def _parent_name(source: str, row: str) -> str:
+    foreign_key, _ = PARENTS[source]
+    return f"(SELECT name FROM {source} WHERE id = {row}.{foreign_key})"
+
+
+def _stale(row: str) -> str:
+    return " OR ".join(f"{row}.{column} IS NOT {_parent_name(source, row)}" for source, (_, column) in PARENTS.items())
+
+
+def _set_names(row: str) -> str:
+    return ", ".join(f"{column} = {_parent_name(source, row)}" for source, (_, column) in PARENTS.items())
+
+
+def _stock_names_ddl() -> Dict[str, str]:
+    # Trigger name -> CREATE TRIGGER statement
+    update_names = f"UPDATE stock SET {_set_names('new')} WHERE id = new.id; END"
+    statements = {
+        "stock_names_ai": f"AFTER INSERT ON stock WHEN {_stale('new')} BEGIN {update_names}",
+        "stock_names_au": (
+            f"AFTER UPDATE OF product_id, store_id, product_name, store_name ON stock WHEN {_stale('new')} "
+            f"BEGIN {update_names}"
+        ),
+    }
+    for source, (foreign_key, column) in PARENTS.items():
+        statements.update({
+            f"{source}_stock_names_ai": (
+                f"AFTER INSERT ON {source} BEGIN UPDATE stock SET {column} = new.name WHERE {foreign_key} = new.id; END"
+            ),
+            f"{source}_stock_names_au": (
+                f"AFTER UPDATE OF name ON {source} BEGIN "
+                f"UPDATE stock SET {column} = new.name WHERE {foreign_key} = new.id; END"
+            ),
+            f"{source}_stock_names_ad": (
+                f"AFTER DELETE ON {source} BEGIN UPDATE stock SET {column} = NULL WHERE {foreign_key} = old.id; END"
+            ),
+        })
+    return {name: f"CREATE TRIGGER IF NOT EXISTS {name} {body}" for name, body in statements.items()}
+
+
+def add_stock_names(stock: Table) -> None:
+    """
+    Create the triggers together with the stock table, the last of the three to be created.
+
+    Args:
+        stock (Table): `Stock.__table__`.
+    """
+    for statement in _stock_names_ddl().values():
+        event.listen(stock, "after_create", DDL(statement))
+
+
+def create_stock_names(connection: Connection) -> bool:
+    """
+    Add the missing triggers to an existing database.
+
+    Args:
+        connection (Connection): Connection inside a transaction.
+
+    Returns:
+        bool: True if any had to be created.
+    """
+    existing = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars())
+
+    statements = _stock_names_ddl()
+    for statement in statements.values():
+        connection.exec_driver_sql(statement)
+
+    return not existing.issuperset(statements)
+
+
+def count_stale_stock_names(connection: Connection) -> int:
+    """
+    Count the stock rows whose names differ from the names of their product and store.
+    """
+    return connection.exec_driver_sql(f"SELECT count(*) FROM stock WHERE {_stale('stock')}").scalar_one()
+
+
+def repair_stock_names(connection: Connection) -> int:
+    """
+    Copy the names of the products and stores to the stock rows that differ, with one UPDATE.
+
+    Args:
+        connection (Connection): Connection inside a transaction.
+
+    Returns:
+        int: Number of rows fixed.
+    """
+    return connection.exec_driver_sql(f"UPDATE stock SET {_set_names('stock')} WHERE {_stale('stock')}").rowcount
+
+
+if __name__ == "__main__":
+    from sqlalchemy.orm import Session
+
+    from database.session import engine
+    from database.table_versions import bump_table_versions
+
+    parser = argparse.ArgumentParser(description="Check the names copied to the stock rows.")
+    parser.add_argument("--repair", action="store_true", help="copy the current names to the stale rows")
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        stale = count_stale_stock_names(db.connection())
+        print(f"Stale stock rows: {stale}")
+        if args.repair and stale:
+            print(f"Repaired stock rows: {repair_stock_names(db.connection())}")
+            # Other processes drop the responses they cached with the old names
+            bump_table_versions(db, ["stock"])
+            db.commit()
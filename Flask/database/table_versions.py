@@ -0,0 +1,218 @@
+"""
+Per-table write counters, shared by every process using the same database file.
+
+Each transaction writing to a table bumps its counter in `table_versions` within the same transaction
+(see the session events below). `TableVersionWatcher` polls `PRAGMA data_version` on a connection of
+its own: the value changes whenever any other connection commits, and only then are the counters read
+to tell which tables changed. Counters that moved without a commit of this process mean another worker
+wrote, and the listeners registered with `on_table_change` drop what they cached from those tables.
+A write of this process that does not report the rows it changed, see `record_table_write`, has them
+drop the same.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapped, Session, mapped_column
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from database.session import Base
+
+# Called with the name of a table another process wrote to, or a write of this process left unreported
+_listeners: List[Callable[[str], None]] = []
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(nullable=False)
+
+
+class TableVersions(NamedTuple):
+    file: Optional[Tuple[int, int]]  # Device and inode of the database file
+    versions: Tuple[int, ...]  # Counter of each table asked for, 0 if never written to
+    modified: float  # Unix time the most recently changed of the tables was seen changing
+
+
+def on_table_change(listener: Callable[[str], None]) -> Callable[[str], None]:
+    """
+    Register `listener` to be called with the name of each table another process wrote to, and of each
+    table passed to `record_table_write` once its transaction commits.
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def _file_id(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def _notify(tables: Iterable[str]) -> None:
+    for table in tables:
+        for listener in _listeners:
+            listener(table)
+
+
+class TableVersionWatcher:
+    """
+    Last seen counter of each table of one database file, and the connection polling it.
+
+    Listeners are notified before the new counters are seen, so whoever reads the counters with
+    `versions` no longer finds what the listeners drop.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self) -> None:
+        # Autocommit, so no read transaction pins the connection to an old snapshot
+        self._connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        self._file = _file_id(self._path)
+        # Nothing was cached from this file before, so the current counters are the starting point
+        self._data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+        self._seen: Dict[str, int] = dict(self._read_versions())
+        self._opened = time.time()
+        self._modified: Dict[str, float] = {}
+
+    def _read_versions(self) -> List[Tuple[str, int]]:
+        try:
+            return self._connection.execute("SELECT name, version FROM table_versions").fetchall()
+        except sqlite3.OperationalError:
+            # Not migrated yet, nothing has been counted
+            return []
+
+    def _see(self, versions: Iterable[Tuple[str, int]]) -> None:
+        now = time.time()
+        for name, version in versions:
+            if version > self._seen.get(name, 0):
+                self._seen[name] = version
+                self._modified[name] = now
+
+    def check(self) -> None:
+        """
+        Notify the tables other processes wrote to since the last check.
+        """
+        with self._lock:
+            if _file_id(self._path) != self._file:
+                # Deleted and created again: the connection still reads the old file, and every
+                # table counted in either may have changed
+                changed = set(self._seen)
+                self._connection.close()
+                self._open()
+                _notify(sorted(changed.union(self._seen)))
+                return
+
+            data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+
+            versions = self._read_versions()
+            _notify(name for name, version in versions if version > self._seen.get(name, 0))
+            self._see(versions)
+
+    def committed(self, versions: Dict[str, int]) -> None:
+        """
+        Take the counters bumped by a commit of this process.
+
+        A counter more than one past the last seen value was also bumped by another process.
+        """
+        with self._lock:
+            _notify(name for name, version in versions.items() if version > self._seen.get(name, 0) + 1)
+            self._see(versions.items())
+
+    def versions(self, tables: Iterable[str]) -> TableVersions:
+        """
+        Last seen counters of `tables`, call `check` first to include the writes of other processes.
+        """
+        tables = list(tables)
+        with self._lock:
+            return TableVersions(
+                self._file,
+                tuple(self._seen.get(table, 0) for table in tables),
+                max((self._modified.get(table, self._opened) for table in tables), default=self._opened),
+            )
+
+
+_watchers: Dict[str, TableVersionWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def watcher_for(bind: Engine) -> Optional[TableVersionWatcher]:
+    """
+    Watcher of the database file of an engine, None for an in-memory database.
+    """
+    path = bind.url.database
+    if not path or path == ":memory:":
+        return None
+
+    with _watchers_lock:
+        if path not in _watchers:
+            _watchers[path] = TableVersionWatcher(path)
+        return _watchers[path]
+
+
+def bump_table_versions(session: Session, tables: Iterable[str]) -> None:
+    """
+    Bump the counters of `tables` in the transaction of `session`, once per transaction.
+
+    Flushed entities are counted on their own; writes sent as Core statements name their tables here.
+    """
+    versions = session.info.setdefault("table_versions", {})
+    for table in set(tables) - versions.keys():
+        statement = (
+            insert(TableVersion)
+            .values(name=table, version=1)
+            .on_conflict_do_update(index_elements=[TableVersion.name], set_={"version": TableVersion.version + 1})
+            .returning(TableVersion.version)
+        )
+        versions[table] = session.connection().execute(statement).scalar_one()
+
+
+def record_table_write(session: Session, tables: Iterable[str]) -> None:
+    """
+    Have the `on_table_change` listeners drop what they cached from `tables` when the transaction of
+    `session` commits, as for a write of another process.
+
+    For the writes changing rows they do not read, e.g. an UPDATE by filter, whose rows could be
+    any number. The counters are still bumped with `bump_table_versions`.
+    """
+    session.info.setdefault("written_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session: Session, flush_context) -> None:
+    # Still the pre-flush state here; collection changes alone leave the row as it is
+    bump_table_versions(session, (
+        instance.__table__.name
+        for instance in chain(session.new, session.dirty, session.deleted)
+        if instance not in session.dirty or session.is_modified(instance, include_collections=False)
+    ))
+
+
+@event.listens_for(Session, "after_commit")
+def _take_table_versions(session: Session) -> None:
+    # Before the new counters are seen, like the writes of other processes
+    _notify(sorted(session.info.pop("written_tables", ())))
+    versions = session.info.pop("table_versions", None)
+    if versions:
+        watcher = watcher_for(session.get_bind())
+        if watcher is not None:
+            watcher.committed(versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_table_versions(session: Session) -> None:
+    session.info.pop("table_versions", None)
+    session.info.pop("written_tables", None)
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify, g
+from sqlalchemy.exc import SQLAlchemyError
+
+from services.deletion import get_deletion_service
+
+deletion_blueprint = Blueprint("deletion", __name__)
+
+
+# ------------ API GET ------------
+
+@deletion_blueprint.route("/<int:deletion_id>", methods=["GET"])
+def get_deletion_endpoint(deletion_id):
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        deletion = get_deletion_service(deletion_id, db)
+
+        return jsonify({
+            "status": "success",
+            "message": "Deletion fetched successfully",
+            "data": deletion
+        }), 200
+
+    except ValueError as e:
+        return jsonify({"detail": [{"msg": "Deletion not found", "error": str(e)}]}), 404
+    
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+    
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
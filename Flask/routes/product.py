@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify, g
 from sqlalchemy.exc import SQLAlchemyError
 from services.product import *
+from services.stock import get_stocks_service
+from services.cache import cached_read, read_validators
+from utils.bulk import BulkError
+from utils.conditional import not_modified, validator_headers
+from utils.pagination import MAX_PAGE_SIZE
+from utils.query import bool_arg, float_arg, int_arg
 
 product_blueprint = Blueprint("product", __name__)
 
@@ -34,6 +40,35 @@ def create_product_endpoint():
         db.rollback()
         return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
 
+@product_blueprint.route("/bulk", methods=["POST"])
+def create_products_bulk_endpoint():
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        # Parse request JSON, a list of products
+        products_data = request.get_json()
+
+        # Call service to create every product in one transaction
+        new_products = create_products_bulk_service(products_data, db=db)
+
+        return jsonify({
+            "status": "success",
+            "message": "Products created successfully",
+            "data": new_products
+        }), 201
+
+    except BulkError as e:
+        db.rollback()
+        return jsonify({"detail": e.errors}), 422
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
+
+
 # ------------ API GET ------------
 
 @product_blueprint.route("/", methods=["GET"], strict_slashes=False)
@@ -43,14 +78,32 @@ def get_products_endpoint():
         # Extract query parameters
         product_id = request.args.get("id", type=int, default=None)
         name = request.args.get("name", type=str, default=None)
-
-        products = get_products_service(db=db, product_id=product_id, name=name)
-
-        return jsonify({
+        name_exact = request.args.get("name_exact", type=str, default=None)
+        name_prefix = request.args.get("name_prefix", type=str, default=None)
+        limit = request.args.get("limit", type=int, default=None)
+        cursor = request.args.get("cursor", type=str, default=None)
+        include = request.args.get("include", type=str, default="stock")
+        stock_limit = request.args.get("stock_limit", type=int, default=None)
+
+        params = dict(
+            product_id=product_id, name=name, name_exact=name_exact, name_prefix=name_prefix,
+            limit=limit, cursor=cursor, include=include, stock_limit=stock_limit
+        )
+        validators = read_validators(db, "products", params)
+        if not_modified(request.headers.get("If-None-Match"), validators):
+            return "", 304, validator_headers(validators)
+
+        products, next_cursor, validators = cached_read(db, "products", params, lambda: get_products_service(db=db, **params))
+
+        response = {
             "status": "success",
             "message": "Products fetched successfully",
             "data": products
-        }), 200
+        }
+        if next_cursor is not None:
+            response["next_cursor"] = next_cursor
+
+        return jsonify(response), 200, validator_headers(validators)
 
     except ValueError as e:
         return jsonify({"detail": [{"msg": "Product not found", "error": str(e)}]}), 404
@@ -63,13 +116,81 @@ def get_products_endpoint():
         db.rollback()
         return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
 
+@product_blueprint.route("/<int:product_id>/stock", methods=["GET"])
+def get_product_stock_endpoint(product_id):
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        # Extract query parameters, the stock of the product is always paginated
+        store_name = request.args.get("store_name", type=str, default=None)
+        store_name_exact = request.args.get("store_name_exact", type=str, default=None)
+        store_name_prefix = request.args.get("store_name_prefix", type=str, default=None)
+        max_price = float_arg(request.args, "max_price")
+        is_available = bool_arg(request.args, "is_available")
+        category = request.args.get("category", type=str, default=None)
+        store_id = int_arg(request.args, "store_id")
+        limit = request.args.get("limit", type=int, default=MAX_PAGE_SIZE)
+        cursor = request.args.get("cursor", type=str, default=None)
+
+        params = dict(
+            product_name=None,
+            store_name=store_name,
+            max_price=max_price,
+            is_available=is_available,
+            category=category,
+            store_id=store_id,
+            product_id=product_id,
+            store_name_exact=store_name_exact,
+            store_name_prefix=store_name_prefix,
+            limit=limit,
+            cursor=cursor,
+        )
+        validators = read_validators(db, "stock", params)
+        if not_modified(request.headers.get("If-None-Match"), validators):
+            return "", 304, validator_headers(validators)
+
+        stocks, next_cursor, validators = cached_read(db, "stock", params, lambda: get_stocks_service(db=db, **params))
+
+        response = {
+            "status": "success",
+            "message": "Stocks fetched successfully",
+            "data": stocks
+        }
+        if next_cursor is not None:
+            response["next_cursor"] = next_cursor
+
+        return jsonify(response), 200, validator_headers(validators)
+
+    except TypeError as e:
+        return jsonify({"detail": [{"msg": "Invalid type", "error": str(e)}]}), 422
+    
+    except ValueError as e:
+        return jsonify({"detail": [{"msg": "Stock not found", "error": str(e)}]}), 404
+    
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+    
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
+
 # ------------ API DELETE ------------
 
 @product_blueprint.route("/<int:product_id>", methods=["DELETE"])
 def delete_product_endpoint(product_id):
     db = g.db  # Get the database session created in `@before_request`
     try:
-        result = delete_product_service(product_id, db)
+        mode = request.args.get("mode", type=str, default="sync")
+
+        result = delete_product_service(product_id, db, mode)
+
+        if mode == "async":
+            # Hidden already, its stock is deleted by the worker of services/deletion.py
+            return jsonify({
+                "status_code": 202,
+                "message": "Product deletion started",
+                "data": result
+            }), 202
 
         return jsonify({
             "status_code": 200,
@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+
+from services.cache import cache_stats
+
+stats_blueprint = Blueprint("stats", __name__)
+
+
+# ------------ API GET ------------
+
+@stats_blueprint.route("/", methods=["GET"], strict_slashes=False)
+def get_stats_endpoint():
+    # Counters of this process alone, each worker keeps its own
+    return jsonify({
+        "status": "success",
+        "message": "Stats fetched successfully",
+        "data": cache_stats()
+    }), 200
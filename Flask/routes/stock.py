@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify, g
 from sqlalchemy.exc import SQLAlchemyError
 
 from services.stock import *
+from services.cache import cached_read, read_validators
+from utils.bulk import BulkError
+from utils.conditional import not_modified, validator_headers
+from utils.query import bool_arg, float_arg, int_arg
 
 stock_blueprint = Blueprint("stock", __name__)
 
@@ -30,6 +34,9 @@ def create_stock_endpoint():
     except TypeError as e:
         return jsonify({"detail": [{"msg": "Invalid type", "error": str(e)}]}), 422
     
+    except ValueError as e:
+        return jsonify({"detail": [{"msg": str(e), "error": str(e)}]}), 404
+    
     except SQLAlchemyError as e:
         db.rollback()
         return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
@@ -39,6 +46,35 @@ def create_stock_endpoint():
         return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
 
 
+@stock_blueprint.route("/bulk", methods=["POST"])
+def create_stock_bulk_endpoint():
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        # Parse request JSON, a list of stocks
+        stocks_data = request.get_json()
+
+        # Call service to create every stock in one transaction
+        new_stock = create_stock_bulk_service(stocks_data, db=db)
+
+        return jsonify({
+            "status": "success",
+            "message": "Stocks created successfully",
+            "data": new_stock
+        }), 201
+
+    except BulkError as e:
+        db.rollback()
+        return jsonify({"detail": e.errors}), 422
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
+
+
 # ------------ API GET ------------
 
 @stock_blueprint.route("/", methods=["GET"], strict_slashes=False)
@@ -48,26 +84,53 @@ def get_stocks_endpoint():
         # Extract query parameters
         product_name = request.args.get("product_name", type=str, default=None)
         store_name = request.args.get("store_name", type=str, default=None)
-        max_price = request.args.get("max_price", type=float, default=None)
-        is_available = request.args.get("is_available", type=bool, default=None)
+        max_price = float_arg(request.args, "max_price")
+        is_available = bool_arg(request.args, "is_available")
         category = request.args.get("category", type=str, default=None)
+        store_id = int_arg(request.args, "store_id")
+        product_id = int_arg(request.args, "product_id")
+        product_name_exact = request.args.get("product_name_exact", type=str, default=None)
+        product_name_prefix = request.args.get("product_name_prefix", type=str, default=None)
+        store_name_exact = request.args.get("store_name_exact", type=str, default=None)
+        store_name_prefix = request.args.get("store_name_prefix", type=str, default=None)
+        limit = request.args.get("limit", type=int, default=None)
+        cursor = request.args.get("cursor", type=str, default=None)
 
         # Call the service to fetch store data
-        stocks = get_stocks_service(
-            db=db,
+        params = dict(
             product_name=product_name,
             store_name=store_name,
             max_price=max_price,
             is_available=is_available,
             category=category,
+            store_id=store_id,
+            product_id=product_id,
+            product_name_exact=product_name_exact,
+            product_name_prefix=product_name_prefix,
+            store_name_exact=store_name_exact,
+            store_name_prefix=store_name_prefix,
+            limit=limit,
+            cursor=cursor,
         )
+        validators = read_validators(db, "stock", params)
+        if not_modified(request.headers.get("If-None-Match"), validators):
+            return "", 304, validator_headers(validators)
 
-        return jsonify({
+        stocks, next_cursor, validators = cached_read(db, "stock", params, lambda: get_stocks_service(db=db, **params))
+
+        response = {
             "status": "success",
             "message": "Stocks fetched successfully",
             "data": stocks
-        }), 200
+        }
+        if next_cursor is not None:
+            response["next_cursor"] = next_cursor
 
+        return jsonify(response), 200, validator_headers(validators)
+
+    except TypeError as e:
+        return jsonify({"detail": [{"msg": "Invalid type", "error": str(e)}]}), 422
+    
     except ValueError as e:
         return jsonify({"detail": [{"msg": "Stock not found", "error": str(e)}]}), 404
     
@@ -141,3 +204,81 @@ def update_stock_endpoint(stock_id):
     except Exception as e:
         db.rollback()
         return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
+
+
+@stock_blueprint.route("/bulk", methods=["PATCH"])
+def update_stock_bulk_endpoint():
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        # Parse request JSON, a list of stock updates
+        stocks_update = request.get_json()
+
+        # Call service to update every stock in one transaction
+        updated_stock = update_stock_bulk_service(stocks_update, db=db)
+
+        return jsonify({
+            "status": "success",
+            "message": "Stocks updated successfully",
+            "data": updated_stock
+        }), 200
+
+    except BulkError as e:
+        db.rollback()
+        return jsonify({"detail": e.errors}), 422
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
+
+
+@stock_blueprint.route("/where", methods=["PATCH"])
+def update_stock_where_endpoint():
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        # Parse request JSON
+        stock_data = request.get_json()
+
+        # Extract the filters, those of GET /stock
+        params = dict(
+            product_name=request.args.get("product_name", type=str, default=None),
+            store_name=request.args.get("store_name", type=str, default=None),
+            max_price=float_arg(request.args, "max_price"),
+            is_available=bool_arg(request.args, "is_available"),
+            category=request.args.get("category", type=str, default=None),
+            store_id=int_arg(request.args, "store_id"),
+            product_id=int_arg(request.args, "product_id"),
+            product_name_exact=request.args.get("product_name_exact", type=str, default=None),
+            product_name_prefix=request.args.get("product_name_prefix", type=str, default=None),
+            store_name_exact=request.args.get("store_name_exact", type=str, default=None),
+            store_name_prefix=request.args.get("store_name_prefix", type=str, default=None),
+        )
+
+        # Call the service to update every matching stock with one UPDATE
+        result = update_stock_where_service(db, stock_data, **params)
+
+        return jsonify({
+            "status": "success",
+            "message": "Stocks updated successfully",
+            "data": result
+        }), 200
+
+    except KeyError as e:
+        return jsonify({"detail": [{"msg": "Nothing to update", "error": str(e)}]}), 422
+
+    except TypeError as e:
+        return jsonify({"detail": [{"msg": "Invalid type", "error": str(e)}]}), 422
+
+    except LookupError as e:
+        return jsonify({"detail": [{"msg": "Filter required", "error": str(e)}]}), 422
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
@@ -2,6 +2,12 @@ from flask import Blueprint, request, jsonify, g
 from sqlalchemy.exc import SQLAlchemyError
 
 from services.store import *
+from services.stock import get_stocks_service
+from services.cache import cached_read, read_validators
+from utils.bulk import BulkError
+from utils.conditional import not_modified, validator_headers
+from utils.pagination import MAX_PAGE_SIZE
+from utils.query import bool_arg, float_arg, int_arg
 
 store_blueprint = Blueprint("store", __name__)
 
@@ -39,6 +45,35 @@ def create_store_endpoint():
         return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
 
 
+@store_blueprint.route("/bulk", methods=["POST"])
+def create_stores_bulk_endpoint():
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        # Parse request JSON, a list of stores
+        stores_data = request.get_json()
+
+        # Call service to create every store in one transaction
+        new_stores = create_stores_bulk_service(stores_data, db=db)
+
+        return jsonify({
+            "status": "success",
+            "message": "Stores created successfully",
+            "data": new_stores
+        }), 201
+
+    except BulkError as e:
+        db.rollback()
+        return jsonify({"detail": e.errors}), 422
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
+
+
 # ------------ API GET ------------
 
 @store_blueprint.route("/", methods=["GET"], strict_slashes=False)
@@ -48,15 +83,33 @@ def get_stores_endpoint():
         # Extract query parameters
         store_id = request.args.get("id", type=int, default=None)
         name = request.args.get("name", type=str, default=None)
+        name_exact = request.args.get("name_exact", type=str, default=None)
+        name_prefix = request.args.get("name_prefix", type=str, default=None)
+        limit = request.args.get("limit", type=int, default=None)
+        cursor = request.args.get("cursor", type=str, default=None)
+        include = request.args.get("include", type=str, default="stock")
+        stock_limit = request.args.get("stock_limit", type=int, default=None)
 
         # Call the service to fetch store data
-        stores = get_stores_service(db=db, store_id=store_id, name=name)
+        params = dict(
+            store_id=store_id, name=name, name_exact=name_exact, name_prefix=name_prefix,
+            limit=limit, cursor=cursor, include=include, stock_limit=stock_limit
+        )
+        validators = read_validators(db, "stores", params)
+        if not_modified(request.headers.get("If-None-Match"), validators):
+            return "", 304, validator_headers(validators)
 
-        return jsonify({
+        stores, next_cursor, validators = cached_read(db, "stores", params, lambda: get_stores_service(db=db, **params))
+
+        response = {
             "status": "success",
             "message": "Stores fetched successfully",
             "data": stores
-        }), 200
+        }
+        if next_cursor is not None:
+            response["next_cursor"] = next_cursor
+
+        return jsonify(response), 200, validator_headers(validators)
 
     except ValueError as e:
         return jsonify({"detail": [{"msg": "Store not found", "error": str(e)}]}), 404
@@ -70,14 +123,82 @@ def get_stores_endpoint():
         return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
     
 
+@store_blueprint.route("/<int:store_id>/stock", methods=["GET"])
+def get_store_stock_endpoint(store_id):
+    db = g.db  # Get the database session created in `@before_request`
+    try:
+        # Extract query parameters, the stock of the store is always paginated
+        product_name = request.args.get("product_name", type=str, default=None)
+        product_name_exact = request.args.get("product_name_exact", type=str, default=None)
+        product_name_prefix = request.args.get("product_name_prefix", type=str, default=None)
+        max_price = float_arg(request.args, "max_price")
+        is_available = bool_arg(request.args, "is_available")
+        category = request.args.get("category", type=str, default=None)
+        product_id = int_arg(request.args, "product_id")
+        limit = request.args.get("limit", type=int, default=MAX_PAGE_SIZE)
+        cursor = request.args.get("cursor", type=str, default=None)
+
+        params = dict(
+            product_name=product_name,
+            store_name=None,
+            max_price=max_price,
+            is_available=is_available,
+            category=category,
+            store_id=store_id,
+            product_id=product_id,
+            product_name_exact=product_name_exact,
+            product_name_prefix=product_name_prefix,
+            limit=limit,
+            cursor=cursor,
+        )
+        validators = read_validators(db, "stock", params)
+        if not_modified(request.headers.get("If-None-Match"), validators):
+            return "", 304, validator_headers(validators)
+
+        stocks, next_cursor, validators = cached_read(db, "stock", params, lambda: get_stocks_service(db=db, **params))
+
+        response = {
+            "status": "success",
+            "message": "Stocks fetched successfully",
+            "data": stocks
+        }
+        if next_cursor is not None:
+            response["next_cursor"] = next_cursor
+
+        return jsonify(response), 200, validator_headers(validators)
+
+    except TypeError as e:
+        return jsonify({"detail": [{"msg": "Invalid type", "error": str(e)}]}), 422
+    
+    except ValueError as e:
+        return jsonify({"detail": [{"msg": "Stock not found", "error": str(e)}]}), 404
+    
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Database error", "error": str(e)}]}), 500
+    
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": [{"msg": "Bad request", "error": str(e)}]}), 400
+
 # ------------ API DELETE ------------
 
 @store_blueprint.route("/<int:store_id>", methods=["DELETE"])
 def delete_store_endpoint(store_id):
     db = g.db  # Get the database session created in `@before_request`
     try:
+        mode = request.args.get("mode", type=str, default="sync")
+
         # Call the service to delete store data
-        result = delete_store_service(store_id, db)
+        result = delete_store_service(store_id, db, mode)
+
+        if mode == "async":
+            # Hidden already, its stock is deleted by the worker of services/deletion.py
+            return jsonify({
+                "status_code": 202,
+                "message": "Store deletion started",
+                "data": result
+            }), 202
 
         return jsonify({
             "status_code": 200,
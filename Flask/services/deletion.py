@@ -0,0 +1,209 @@
+"""
+Background deletion of stores and products with too much stock to delete in one transaction.
+
+`start_deletion` hides the row at once, see database/deletions.py, and reports it deleted to the
+listeners of `record_change`, as the reads will no longer show it. The worker of this process then
+deletes its stock `DELETION_CHUNK_SIZE` rows per transaction, pausing `DELETION_PAUSE` seconds
+between them so the writes of the requests get the write lock in turn, and finally deletes the row.
+Nothing it deletes was visible anymore, so it reports no change and bumps no counter.
+
+The worker is started on startup with `purger.start`, and resumes the deletions left pending by a
+previous run. Without it, the rows stay hidden until it runs.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, Callable, Dict, List, Optional, Type, Union
+
+from database.deletions import PARENT_COLUMNS, Deletion, visible
+from database.table_versions import bump_table_versions
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from services.cache import record_change
+
+# Stock rows deleted per transaction
+DELETION_CHUNK_SIZE = int(os.getenv("DELETION_CHUNK_SIZE", "1000"))
+# Seconds between two chunks
+DELETION_PAUSE = float(os.getenv("DELETION_PAUSE", "0.01"))
+# Seconds before the worker tries again after a failed deletion, e.g. on a locked database
+RETRY_DELAY = 1.0
+
+# How DELETE /store/{id} and DELETE /product/{id} delete: "sync" deletes the row and its stock
+# before answering, "async" answers 202 with the id of a deletion run by the worker
+DELETE_MODES = ("sync", "async")
+
+logger = logging.getLogger(__name__)
+
+
+def check_delete_mode(mode: str) -> None:
+    """
+    Validate the `mode` parameter of DELETE /store/{id} and DELETE /product/{id}.
+
+    Raises:
+        LookupError: If `mode` is not one of `DELETE_MODES`.
+    """
+    if mode not in DELETE_MODES:
+        raise LookupError(f"mode must be one of {', '.join(DELETE_MODES)}")
+
+
+def start_deletion(db: Session, model: Union[Type[Store], Type[Product]], row_id: int) -> Optional[int]:
+    """
+    Hide a store or product and its stock, and leave deleting them to the worker.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        model (Union[Type[Store], Type[Product]]): `Store` or `Product`.
+        row_id (int): Id of the row to delete.
+
+    Returns:
+        Optional[int]: Id of the deletion, None if the row does not exist or is already being deleted.
+    """
+    table = model.__tablename__
+    row = db.execute(select(model.id, model.name).where(model.id == row_id, visible(model))).first()
+    if row is None:
+        return None
+
+    statement = insert(Deletion).values(table_name=table, row_id=row_id).returning(Deletion.id)
+    deletion_id = db.execute(statement).scalar_one()
+    # Not a flush, so the counters are bumped here: the reads of the row and of its stock change
+    bump_table_versions(db, [table, "stock"])
+    # As of this commit the row is gone for the reads, the listeners drop it and its stock
+    record_change(db, table, row._asdict(), None)
+    db.commit()
+
+    purger.wake()
+    return deletion_id
+
+
+def get_deletion_service(deletion_id: int, db: Session) -> Dict[str, Any]:
+    """
+    Service to fetch the progress of a background deletion.
+
+    Args:
+        deletion_id (int): The id returned by the DELETE request.
+        db (Session): SQLAlchemy session object.
+
+    Returns:
+        dict: `Deletion._asdict()`: its id, the table and id of the deleted row, the stock rows
+            deleted so far and whether it is done.
+
+    Raises:
+        ValueError: If the deletion does not exist.
+    """
+    deletion = db.get(Deletion, deletion_id)
+    if deletion is None:
+        raise ValueError("Deletion not found")
+    return deletion._asdict()
+
+
+def purge(
+    db: Session, deletion_id: int, chunk_size: int = DELETION_CHUNK_SIZE, pause: float = DELETION_PAUSE
+) -> int:
+    """
+    Run a deletion: its stock chunk by chunk, each chunk committed on its own, then the row.
+
+    Resumes where an interrupted run stopped, chunks are taken from whatever stock is left.
+
+    Args:
+        db (Session): SQLAlchemy session object.
+        deletion_id (int): Id of a pending deletion.
+        chunk_size (int): Stock rows deleted per transaction.
+        pause (float): Seconds slept between two transactions.
+
+    Returns:
+        int: Stock rows deleted by this run.
+    """
+    deletion = db.execute(select(Deletion.table_name, Deletion.row_id).where(Deletion.id == deletion_id)).one()
+    model = Store if deletion.table_name == "stores" else Product
+    foreign_key = getattr(Stock, PARENT_COLUMNS[deletion.table_name])
+
+    purged = 0
+    while True:
+        # SQLite has no DELETE ... LIMIT by default, the chunk is picked through the foreign key index
+        chunk = select(Stock.id).where(foreign_key == deletion.row_id).limit(chunk_size)
+        statement = delete(Stock).where(Stock.id.in_(chunk)).execution_options(synchronize_session=False)
+        deleted = db.execute(statement).rowcount
+        purged += deleted
+
+        progress = {"purged": Deletion.purged + deleted}
+        if deleted < chunk_size:
+            # The last chunk, the row goes in the same transaction. A stock added meanwhile by
+            # another process goes with it through the ON DELETE CASCADE
+            db.execute(delete(model).where(model.id == deletion.row_id).execution_options(synchronize_session=False))
+            progress["done"] = True
+        db.execute(update(Deletion).where(Deletion.id == deletion_id).values(**progress))
+        db.commit()
+
+        if deleted < chunk_size:
+            return purged
+        time.sleep(pause)
+
+
+def purge_pending(db: Session, chunk_size: int = DELETION_CHUNK_SIZE, pause: float = DELETION_PAUSE) -> List[int]:
+    """
+    Run every pending deletion, oldest first, including the ones started while running.
+
+    Returns:
+        List[int]: Ids of the deletions run.
+    """
+    done = []
+    while True:
+        pending = select(Deletion.id).where(Deletion.done.is_(False)).order_by(Deletion.id).limit(1)
+        deletion_id = db.execute(pending).scalar()
+        if deletion_id is None:
+            return done
+        purge(db, deletion_id, chunk_size, pause)
+        done.append(deletion_id)
+
+
+class Purger:
+    """
+    Worker thread of this process running the pending deletions, woken by each new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sessions: Optional[Callable[[], Session]] = None
+
+    def start(self, sessions: sessionmaker) -> None:
+        """
+        Start the worker, which first runs the deletions left pending.
+
+        Args:
+            sessions (sessionmaker): Factory of the sync sessions of the worker, whatever the DB_MODE.
+        """
+        with self._lock:
+            self._sessions = sessions
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="purger", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def wake(self) -> None:
+        """
+        Have the worker look for pending deletions, if it is started.
+        """
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                with self._sessions() as db:
+                    purge_pending(db)
+            except Exception:
+                # Left pending, tried again after a while
+                logger.exception("Background deletion failed")
+                time.sleep(RETRY_DELAY)
+                self._wake.set()
+
+
+purger = Purger()
@@ -0,0 +1,141 @@
+"""
+Process-local `id -> name` of every product and store, so the rows of the stock index, which hold no
+names, are rendered without joining them.
+
+Both tables are small and rarely written to. Each is read whole on startup (or by the first lookup),
+then kept current by the changes the write services report with `record_change`. A write of
+another process, seen through the `table_versions` counters, drops the table and the next lookup
+reads it again. An id missing from a loaded table, e.g. created by another process before its
+counter was seen, is read on its own.
+"""
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, Optional
+
+from database.deletions import visible
+from database.table_versions import on_table_change
+from models.product import Product
+from models.store import Store
+from services.cache import on_change
+
+# Tables cached, and their model
+NAME_TABLES = {"products": Product, "stores": Store}
+
+# Missing ids per query, far below SQLite's bound parameter limit
+MISSING_CHUNK_SIZE = 500
+
+
+class NameCache:
+    """
+    Names of the products and stores by id.
+
+    Thread-safe. The database is only read outside the lock, so an event loop running the
+    services of the async mode never blocks on another task holding it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # None until read, or since another process wrote to the table
+        self._names: Dict[str, Optional[Dict[int, str]]] = {table: None for table in NAME_TABLES}
+        # Bumped by every change, so a read started before one is not kept after it
+        self._generations: Dict[str, int] = {table: 0 for table in NAME_TABLES}
+
+    def warm(self, db: Session) -> None:
+        """
+        Read both tables, so the first requests find them loaded.
+        """
+        for table in NAME_TABLES:
+            self.names(db, table, ())
+
+    def names(self, db: Session, table: str, ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Names of the given products or stores.
+
+        Args:
+            db (Session): Session to read the table with when it is not loaded.
+            table (str): "products" or "stores".
+            ids (Iterable[int]): Ids to look up.
+
+        Returns:
+            Dict[int, str]: Name of each id found, the ids not in the database are left out.
+        """
+        ids = set(ids)
+        with self._lock:
+            names, generation = self._names[table], self._generations[table]
+
+        if names is None:
+            names = self._read(db, table, generation, None)
+        missing = [id for id in ids if id not in names]
+        for start in range(0, len(missing), MISSING_CHUNK_SIZE):
+            names = {**names, **self._read(db, table, generation, missing[start:start + MISSING_CHUNK_SIZE])}
+
+        # get(), the loaded dict is shared and a commit may delete from it meanwhile
+        return {id: name for id in ids if (name := names.get(id)) is not None}
+
+    def apply(self, table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """
+        Apply a committed change, as reported to `record_change`.
+        """
+        if table not in NAME_TABLES:
+            return
+
+        with self._lock:
+            self._generations[table] += 1
+            names = self._names[table]
+            if names is None:
+                return
+            if new is None:
+                names.pop(old["id"], None)
+            else:
+                names[new["id"]] = new["name"]
+
+    def invalidate(self, table: str) -> None:
+        """
+        Drop the names of `table`, the next lookup reads it again.
+        """
+        with self._lock:
+            self._generations[table] += 1
+            self._names[table] = None
+
+    def clear(self) -> None:
+        """
+        Drop the names of both tables.
+        """
+        for table in NAME_TABLES:
+            self.invalidate(table)
+
+    def _read(self, db: Session, table: str, generation: int, ids: Optional[list]) -> Dict[int, str]:
+        """
+        Read the names of `ids`, or of the whole table, and keep them unless a change came meanwhile.
+        """
+        model = NAME_TABLES[table]
+        # The rows being deleted in the background are left out, like a deleted row
+        query = select(model.id, model.name).where(visible(model))
+        if ids is not None:
+            query = query.where(model.id.in_(ids))
+        names = dict(db.execute(query).all())
+
+        with self._lock:
+            if self._generations[table] == generation:
+                if ids is None:
+                    self._names[table] = names
+                elif self._names[table] is not None:
+                    self._names[table].update(names)
+        return names
+
+
+name_cache = NameCache()
+
+
+@on_change
+def _apply_change(table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    name_cache.apply(table, old, new)
+
+
+@on_table_change
+def _invalidate_table(table: str) -> None:
+    # Another process wrote to `table`, without telling which rows
+    if table in NAME_TABLES:
+        name_cache.invalidate(table)
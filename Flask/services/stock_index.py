@@ -0,0 +1,459 @@
+"""
+In-memory columnar index of the stock table, answering `get_stocks_service` when `READ_PATH=index`.
+
+The stock columns are held in NumPy arrays sorted by id, the category as a code into a list of the
+distinct categories. Filters are evaluated as vectorized masks over the arrays; only the name
+filters still query SQLite, against the products and stores tables, to keep the trigram and NOCASE
+semantics of the other read paths. The names of the rows found come from `services.name_cache`.
+
+The index is built from the database on startup (or by the first read), then kept current by the
+changes the write services report with `record_change`; a deleted product or store drops its stock,
+which the ON DELETE CASCADE deleted without reporting it. A write of another process, seen through
+the `table_versions` counters, marks it stale and the next read builds it again. Until a build is
+done, `find` returns None and the service reads the database instead.
+"""
+import re
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from database.deletions import visible
+from database.fts import name_search
+from database.loaders import READ_PATH
+from database.name_match import equals_ignore_case, starts_with_ignore_case
+from database.table_versions import on_table_change
+from models.product import Product
+from models.store import Store
+from models.stock import Stock
+from services.cache import on_change
+from utils.pagination import PaginationError, decode_cursor, encode_cursor, page_size
+
+try:
+    import numpy as np
+except ImportError:  # Only the index read path needs it
+    np = None
+
+if READ_PATH == "index" and np is None:
+    # Fail on startup rather than on the first request
+    raise ImportError("READ_PATH=index needs numpy, install it with `pip install numpy`")
+
+# Array of each column, "live" is False for the deleted rows until the arrays are compacted
+COLUMN_TYPES = {
+    "id": "int64",
+    "store_id": "int64",
+    "product_id": "int64",
+    "price": "float64",
+    "is_available": "bool",
+    "category": "int32",
+    "live": "bool",
+}
+
+# Stock rows per query while building
+LOAD_CHUNK_SIZE = 100_000
+
+# Rows masked by the first step of a page scan, doubled at each following step
+SCAN_CHUNK_SIZE = 4096
+
+# Capacity of the arrays after the first insert into an empty index
+MIN_CAPACITY = 1024
+
+# Up to this many wanted ids or categories are compared one by one, more go through a lookup table
+FEW_VALUES = 4
+
+# Column of the stock of each parent table, whose rows go with a deleted parent
+PARENT_COLUMNS = {"stores": "store_id", "products": "product_id"}
+
+Change = Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+# Mask of a filter over a slice of the columns
+Test = Callable[[Dict[str, "np.ndarray"], slice], "np.ndarray"]
+
+
+def _name_ids(
+    db: Session, model: Union[Type[Product], Type[Store]], term: Optional[str], exact: Optional[str], prefix: Optional[str]
+) -> Optional["np.ndarray"]:
+    """
+    Ids of the products or stores passing the name filters, as `get_stocks_service` matches them in SQL.
+
+    Returns:
+        Optional[np.ndarray]: None without any name filter.
+    """
+    if not (term or exact or prefix):
+        return None
+
+    query = select(model.id)
+    if term:
+        matches = name_search(model.__tablename__, term)
+        if matches is None:
+            query = query.where(model.name.ilike(f"%{term}%"))
+        else:
+            query = query.where(model.id.in_(matches.with_only_columns(matches.selected_columns.rowid)))
+    if exact:
+        query = query.where(equals_ignore_case(model.name, exact))
+    if prefix:
+        query = query.where(starts_with_ignore_case(model.name, prefix))
+
+    return np.array(db.scalars(query).all(), dtype=np.int64)
+
+
+def _ilike_contains(term: str) -> Callable[[str], Any]:
+    """
+    Match of `ilike(f"%{term}%")` as SQLite evaluates it: `%` and `_` are wildcards, and only ASCII
+    letters are compared ignoring case.
+    """
+    pattern = "".join(".*" if char == "%" else "." if char == "_" else re.escape(char) for char in term)
+    return re.compile(pattern, re.ASCII | re.IGNORECASE | re.DOTALL).search
+
+
+def _isin(column: str, wanted: "np.ndarray") -> Test:
+    """
+    Test of an id or category column, True where the value is one of `wanted`.
+
+    Faster than `np.isin`, which sorts both arrays on each call: a few values are compared one by
+    one, more through a table indexed by value (ids and category codes are never negative).
+    """
+    values = wanted.tolist()
+    if len(values) <= FEW_VALUES:
+        def test(columns: Dict[str, "np.ndarray"], part: slice) -> "np.ndarray":
+            mask = np.zeros(part.stop - part.start, dtype=bool)
+            for value in values:
+                mask |= columns[column][part] == value
+            return mask
+        return test
+
+    # The last slot stays False for the values past the largest wanted one
+    table = np.zeros(max(values) + 2, dtype=bool)
+    table[wanted] = True
+    return lambda columns, part: table.take(columns[column][part], mode="clip")
+
+
+def _load(db: Session) -> Tuple[Dict[str, "np.ndarray"], List[str]]:
+    """
+    Read the arrays and the categories of a new index.
+    """
+    chunks: Dict[str, List["np.ndarray"]] = {name: [] for name in COLUMN_TYPES}
+    codes: Dict[str, int] = {}
+    query = select(Stock.id, Stock.store_id, Stock.product_id, Stock.price, Stock.is_available, Stock.category)
+    # Without the stock of the stores and products being deleted in the background
+    query = query.where(visible(Stock))
+    last_id = None
+    while True:
+        # Keyset chunks, so no query holds the whole table in memory at once
+        page = query if last_id is None else query.where(Stock.id > last_id)
+        # On the connection, without the ORM result processing of each row
+        rows = db.connection().execute(page.order_by(Stock.id).limit(LOAD_CHUNK_SIZE)).all()
+        if not rows:
+            break
+
+        ids, store_ids, product_ids, prices, available, categories = zip(*rows)
+        chunks["id"].append(np.array(ids, dtype=np.int64))
+        chunks["store_id"].append(np.array(store_ids, dtype=np.int64))
+        chunks["product_id"].append(np.array(product_ids, dtype=np.int64))
+        chunks["price"].append(np.array(prices, dtype=np.float64))
+        chunks["is_available"].append(np.array(available, dtype=bool))
+        chunks["category"].append(np.array([codes.setdefault(category, len(codes)) for category in categories], dtype=np.int32))
+        chunks["live"].append(np.ones(len(rows), dtype=bool))
+        last_id = ids[-1]
+
+    columns = {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=COLUMN_TYPES[name])
+        for name, parts in chunks.items()
+    }
+    return columns, list(codes)
+
+
+class StockIndex:
+    """
+    Columns of the stock table in NumPy arrays sorted by id.
+
+    Thread-safe. The database is only read outside the lock, so an event loop running the
+    services of the async mode never blocks on another task holding it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stale = True  # Not built yet, or written to by another process since the last build
+        self._building = False
+        self._pending: List[Change] = []  # Changes committed while building
+        self._columns: Dict[str, "np.ndarray"] = {}
+        self._size = 0  # Rows in use at the start of each array, deleted ones included
+        self._deleted = 0
+        self._categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._size - self._deleted
+
+    def build(self, db: Session) -> bool:
+        """
+        Load the index from the database, unless another build is running.
+
+        Changes committed by this process while loading are applied once the load is done.
+
+        Args:
+            db (Session): Session to read the database with.
+
+        Returns:
+            bool: False if another build was already running.
+        """
+        with self._lock:
+            if self._building:
+                return False
+            self._building = True
+            # Cleared before reading, so a write of another process seen during the load marks it stale again
+            self._stale = False
+            self._pending = []
+
+        try:
+            columns, categories = _load(db)
+        except BaseException:
+            with self._lock:
+                self._building = False
+                self._stale = True
+            raise
+
+        with self._lock:
+            self._columns = columns
+            self._size = len(columns["id"])
+            self._deleted = 0
+            self._categories = categories
+            self._category_codes = {category: code for code, category in enumerate(categories)}
+            # Set and delete are idempotent, replaying a change the load already read changes nothing
+            for change in self._pending:
+                self._apply(*change)
+            self._pending = []
+            self._building = False
+        return True
+
+    def invalidate(self) -> None:
+        """
+        Mark the index stale, the next `find` builds it again.
+        """
+        with self._lock:
+            self._stale = True
+
+    def apply(self, table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """
+        Apply a committed change, as reported to `record_change`.
+        """
+        if table != "stock" and not (table in PARENT_COLUMNS and new is None):
+            return
+
+        with self._lock:
+            if self._building:
+                self._pending.append((table, old, new))
+            elif not self._stale:
+                self._apply(table, old, new)
+
+    def find(
+        self,
+        db: Session,
+        product_name: Optional[str] = None,
+        store_name: Optional[str] = None,
+        max_price: Optional[float] = None,
+        is_available: Optional[bool] = None,
+        category: Optional[str] = None,
+        store_id: Optional[int] = None,
+        product_id: Optional[int] = None,
+        product_name_exact: Optional[str] = None,
+        product_name_prefix: Optional[str] = None,
+        store_name_exact: Optional[str] = None,
+        store_name_prefix: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Optional[Tuple[List[Tuple[Any, ...]], Optional[str]]]:
+        """
+        Stocks passing the filters of `get_stocks_service`, ordered by id.
+
+        Builds the index first if it is stale and no other build is running.
+
+        Returns:
+            Optional[Tuple[List[Tuple[Any, ...]], Optional[str]]]: Rows of the `STOCK_COLUMNS` and the
+                cursor of the next page, or None while another build is running.
+
+        Raises:
+            PaginationError: If the cursor or the limit is invalid.
+        """
+        with self._lock:
+            build = self._stale and not self._building
+        if build:
+            self.build(db)
+
+        product_ids = _name_ids(db, Product, product_name, product_name_exact, product_name_prefix)
+        store_ids = _name_ids(db, Store, store_name, store_name_exact, store_name_prefix)
+        category_matches = _ilike_contains(category) if category else None
+
+        with self._lock:
+            if self._stale or self._building:
+                return None
+
+            tests: List[Test] = []
+            if product_ids is not None:
+                tests.append(_isin("product_id", product_ids))
+            if store_ids is not None:
+                tests.append(_isin("store_id", store_ids))
+            if max_price is not None:
+                tests.append(lambda columns, part: columns["price"][part] <= max_price)
+            if is_available is not None:
+                tests.append(lambda columns, part: columns["is_available"][part] == is_available)
+            if category_matches is not None:
+                codes = [code for code, name in enumerate(self._categories) if category_matches(name)]
+                tests.append(_isin("category", np.array(codes, dtype=np.int64)))
+            if store_id is not None:
+                tests.append(lambda columns, part: columns["store_id"][part] == store_id)
+            if product_id is not None:
+                tests.append(lambda columns, part: columns["product_id"][part] == product_id)
+
+            positions, next_cursor = self._scan(tests, limit, cursor)
+            return self._rows(positions), next_cursor
+
+    def _matches(self, start: int, stop: int, tests: List[Test]) -> "np.ndarray":
+        part = slice(start, stop)
+        if not tests:
+            mask = self._columns["live"][part].copy()
+        else:
+            mask = tests[0](self._columns, part)
+            for test in tests[1:]:
+                mask &= test(self._columns, part)
+            if self._deleted:
+                mask &= self._columns["live"][part]
+        return np.flatnonzero(mask) + start
+
+    def _scan(
+        self, tests: List[Test], limit: Optional[int], cursor: Optional[str]
+    ) -> Tuple["np.ndarray", Optional[str]]:
+        if limit is None and cursor is None:
+            return self._matches(0, self._size, tests), None
+
+        limit = page_size(limit)
+        start = 0
+        if cursor is not None:
+            after = decode_cursor(cursor, 1)[0]
+            if isinstance(after, bool) or not isinstance(after, (int, float)):
+                raise PaginationError("Invalid cursor")
+            start = int(np.searchsorted(self._columns["id"][:self._size], after, side="right"))
+
+        # Growing chunks from the cursor on, stopping at one row past the page: the first pages of
+        # a broad filter never mask the whole arrays
+        found = []
+        count = 0
+        chunk = SCAN_CHUNK_SIZE
+        while start < self._size and count <= limit:
+            stop = min(start + chunk, self._size)
+            matches = self._matches(start, stop, tests)
+            found.append(matches)
+            count += len(matches)
+            start = stop
+            chunk *= 2
+
+        positions = np.concatenate(found)[:limit + 1] if found else np.empty(0, dtype=np.intp)
+        next_cursor = None
+        if len(positions) > limit:
+            positions = positions[:limit]
+            next_cursor = encode_cursor([int(self._columns["id"][positions[-1]])])
+        return positions, next_cursor
+
+    def _rows(self, positions: "np.ndarray") -> List[Tuple[Any, ...]]:
+        # tolist() converts to Python ints, floats and bools in one pass per column
+        ids, store_ids, product_ids, prices, available, codes = (
+            self._columns[name][positions].tolist()
+            for name in ("id", "store_id", "product_id", "price", "is_available", "category")
+        )
+        categories = self._categories
+        return [
+            (id, store_id, product_id, price, is_available, categories[code])
+            for id, store_id, product_id, price, is_available, code in zip(ids, store_ids, product_ids, prices, available, codes)
+        ]
+
+    def _apply(self, table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if table in PARENT_COLUMNS:
+            self._delete_stock_of(PARENT_COLUMNS[table], old["id"])
+        elif new is None:
+            self._delete(old["id"])
+        else:
+            self._set(new)
+
+    def _position(self, id: int) -> Tuple[int, bool]:
+        """
+        Position of `id` in the arrays, or where to insert it, and whether it is there.
+        """
+        ids = self._columns["id"][:self._size]
+        position = int(np.searchsorted(ids, id))
+        return position, position < self._size and ids[position] == id
+
+    def _set(self, stock: Dict[str, Any]) -> None:
+        position, found = self._position(stock["id"])
+        if not found:
+            self._insert_at(position)
+        elif not self._columns["live"][position]:
+            self._deleted -= 1
+
+        code = self._category_codes.get(stock["category"])
+        if code is None:
+            code = self._category_codes[stock["category"]] = len(self._categories)
+            self._categories.append(stock["category"])
+
+        values = {
+            "id": stock["id"],
+            "store_id": stock["store_id"],
+            "product_id": stock["product_id"],
+            "price": stock["price"],
+            "is_available": stock["is_available"],
+            "category": code,
+            "live": True,
+        }
+        for name, value in values.items():
+            self._columns[name][position] = value
+
+    def _insert_at(self, position: int) -> None:
+        if self._size == len(self._columns["id"]):
+            capacity = max(2 * self._size, MIN_CAPACITY)
+            for name, column in self._columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = grown
+
+        # Ids are assigned in increasing order, so this is nearly always an append
+        for column in self._columns.values():
+            column[position + 1:self._size + 1] = column[position:self._size]
+        self._size += 1
+
+    def _delete(self, id: int) -> None:
+        position, found = self._position(id)
+        if not found or not self._columns["live"][position]:
+            return
+
+        self._columns["live"][position] = False
+        self._deleted += 1
+        self._compact()
+
+    def _delete_stock_of(self, column: str, parent_id: int) -> None:
+        live = self._columns["live"][:self._size]
+        deleted = live & (self._columns[column][:self._size] == parent_id)
+        live[deleted] = False
+        self._deleted += int(deleted.sum())
+        self._compact()
+
+    def _compact(self) -> None:
+        if self._deleted > self._size // 2:
+            # Mostly deleted rows, which every scan still masks
+            live = self._columns["live"][:self._size]
+            self._columns = {name: column[:self._size][live] for name, column in self._columns.items()}
+            self._size -= self._deleted
+            self._deleted = 0
+
+
+stock_index = StockIndex()
+
+
+@on_change
+def _apply_change(table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    stock_index.apply(table, old, new)
+
+
+@on_table_change
+def _invalidate_table(table: str) -> None:
+    # Another process wrote to the stock, without telling which rows
+    if table == "stock":
+        stock_index.invalidate()
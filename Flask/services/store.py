@@ -1,9 +1,25 @@
-from sqlalchemy.orm import Session, joinedload
-from typing import Optional, List, Dict, Any
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from typing import Optional, List, Dict, Any, Tuple
 
 from models.store import Store
 from models.stock import Stock
 
+from database.deletions import visible
+from database.fts import name_search
+from database.loaders import READ_PATH
+from database.name_match import equals_ignore_case, starts_with_ignore_case
+from database.table_versions import bump_table_versions
+
+from services.cache import record_change, record_update
+from services.deletion import check_delete_mode, start_deletion
+from services.stock import (
+    check_include, load_nested_stock, nested_stock_option, project_nested_stock, summarize_nested_stock
+)
+
+from utils.bulk import BulkError, check_batch_size, item_error
+from utils.pagination import seek, fetch_page
+
 
 # ------------ API POST ------------
 
@@ -34,12 +50,58 @@ def create_store_service(store_data: dict, db: Session) -> dict:
             raise TypeError("Input should be a valid string")
         
         # Create and save new store
-        new_store = Store(name=store_data["name"])
-        db.add(new_store)
+        # One INSERT returning the created row, nothing is read again after the commit
+        statement = insert(Store).values(name=store_data["name"]).returning(Store.id, Store.name)
+        created = db.execute(statement).one()._asdict()
+        # Not a flush, so the counter is bumped here
+        bump_table_versions(db, ["stores"])
+        record_change(db, "stores", None, created)
         db.commit()
-        db.refresh(new_store)
         
-        return new_store._asdict_no_stock()
+        return created
+    except Exception as e:
+        db.rollback()
+        raise e
+
+
+def create_stores_bulk_service(stores_data: list, db: Session) -> List[dict]:
+    """
+    Service to create many stores with insertmanyvalues, in one transaction.
+
+    Args:
+        stores_data (list): Dictionaries with the required keys of `create_store_service`.
+        db (Session): SQLAlchemy session object.
+
+    Returns:
+        List[dict]: The created stores in the order of `stores_data`, each with the keys of `create_store_service`.
+
+    Raises:
+        BulkError: If the body is not a list or its length is out of range, or with the errors of every
+            invalid store. No store is created then.
+    """
+    check_batch_size(stores_data)
+    errors = []
+    for index, store_data in enumerate(stores_data):
+        if not isinstance(store_data, dict) or "name" not in store_data:
+            errors.append(item_error(index, "name", "Field required", "missing", None))
+        elif not isinstance(store_data["name"], str) or not store_data["name"]:
+            errors.append(item_error(index, "name", "Input should be a valid string", "string_type", store_data["name"]))
+    if errors:
+        raise BulkError(errors)
+
+    rows = [{"name": store_data["name"]} for store_data in stores_data]
+
+    try:
+        # Multi-row INSERTs, numbered in the order of `rows` but returned in no set order
+        returned = db.execute(insert(Store).returning(Store.id, Store.name), rows)
+        created = [row._asdict() for row in sorted(returned, key=lambda row: row.id)]
+        # Not a flush, so the counter is bumped here
+        bump_table_versions(db, ["stores"])
+        for store in created:
+            record_change(db, "stores", None, store)
+        db.commit()
+
+        return created
     except Exception as e:
         db.rollback()
         raise e
@@ -47,66 +109,156 @@ def create_store_service(store_data: dict, db: Session) -> dict:
 
 # ------------ API GET ------------
 
-def get_stores_service(db: Session, store_id: Optional[int] = None, name: Optional[str] = None) -> List[Dict[str, Any]]:
+def get_stores_service(
+    db: Session,
+    store_id: Optional[int] = None,
+    name: Optional[str] = None,
+    name_exact: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include: str = "stock",
+    stock_limit: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
     Service function to fetch stores based on optional filters.
 
     Args:
         store_id (Optional[int]): ID of the store to filter by.
         name (Optional[str]): Name of the store to filter by.
+        name_exact (Optional[str]): Exact name of the store to filter by, ignoring case.
+        name_prefix (Optional[str]): Start of the name of the store to filter by, ignoring case.
+        limit (Optional[int]): Page size, returns every store if neither limit nor cursor is provided.
+        cursor (Optional[str]): Cursor of the page to fetch, from the previous page.
+        include (str): What to embed of the stock of each store, one of `STOCK_INCLUDES`.
+        stock_limit (Optional[int]): Max stock rows embedded per store with include=stock.
         db (Session): SQLAlchemy session object.
 
     Returns:
-        List[Dict[str, Any]]: List of stores with their details.
+        Tuple[List[Dict[str, Any]], Optional[str]]: List of stores with their details, and the cursor of the next page
+            (None on the last page).
 
     Raises:
+        LookupError: If include is invalid.
+        PaginationError: If the cursor, the limit or the stock limit is invalid.
         ValueError: If no stores are found.
     """
-    query = db.query(Store).options(joinedload(Store.stock).joinedload(Stock.product))
+    check_include(include, stock_limit)
+
+    if READ_PATH != "orm":
+        # (id, name) tuples, the stock is read as plain rows below
+        query = db.query(Store.id, Store.name)
+    else:
+        query = db.query(Store)
+        if include == "stock" and stock_limit is None:
+            # Whole collections, loaded with the strategy set in database/loaders.py
+            query = query.options(nested_stock_option(Store.stock))
+
+    # Sort key columns, the id last
+    matches = name_search("stores", name) if name else None
+    if matches is not None:
+        # Full-text lookup, best ranked matches first
+        matches = matches.subquery()
+        query = query.join(matches, matches.c.rowid == Store.id)
+        keys = (matches.c.rank, Store.id)
+    elif name_prefix:
+        # Alphabetical like an autocomplete, the NOCASE name index already holds this order
+        keys = (Store.name.collate("NOCASE"), Store.id)
+    else:
+        keys = (Store.id,)
+
+    # Before the filters, SQLite seeks from the first bound on the leading sort key
+    query = seek(query, keys, cursor)
+
+    # Without the stores being deleted in the background
+    query = query.filter(visible(Store))
 
     # Filter by store ID or name if provided
     if store_id is not None:
         query = query.filter(Store.id == store_id)
-    if name:
+    if name and matches is None:
         query = query.filter(Store.name.ilike(f"%{name}%"))
+    if name_exact:
+        query = query.filter(equals_ignore_case(Store.name, name_exact))
+    if name_prefix:
+        query = query.filter(starts_with_ignore_case(Store.name, name_prefix))
 
-    stores = query.all()
+    if limit is None and cursor is None:
+        stores, next_cursor = query.order_by(*keys).all(), None
+    else:
+        stores, next_cursor = fetch_page(query, keys, limit)
 
     if not stores:
         raise ValueError("Store not found")
 
-    return [store._asdict() for store in stores]
+    if READ_PATH != "orm":
+        store_dicts = [dict(zip(("id", "name"), store)) for store in stores]
+    else:
+        store_dicts = [store._asdict_no_stock() for store in stores]
+    ids = [store["id"] for store in store_dicts]
+
+    if include == "summary":
+        summaries = summarize_nested_stock(db, Stock.store_id, ids)
+        return [{**store, **summaries[store["id"]]} for store in store_dicts], next_cursor
+    if include == "none":
+        return store_dicts, next_cursor
+
+    if READ_PATH != "orm":
+        stock_by_store = project_nested_stock(db, Stock.store_id, ids, stock_limit)
+        return [{**store, "stock": stock_by_store[store["id"]]} for store in store_dicts], next_cursor
+
+    if stock_limit is not None:
+        load_nested_stock(db, stores, stock_limit)
+
+    return [store._asdict() for store in stores], next_cursor
 
 
 # ------------ API DELETE ------------
 
-def delete_store_service(store_id: int, db: Session) -> dict:
+def delete_store_service(store_id: int, db: Session, mode: str = "sync") -> dict:
     """
     Service to delete a store by ID from the database.
 
     Args:
         store_id (int): The ID of the store to delete.
         db (Session): The SQLAlchemy session.
+        mode (str): "sync" to delete the store and its stock now, "async" to hide them now and
+            delete them in the background, see services/deletion.py.
 
     Returns:
-        dict: A dictionary containing the ID of the deleted store.
+        dict: A dictionary containing the ID of the deleted store, and with mode=async the
+            `deletion_id` to follow the deletion with.
 
     Raises:
-        ValueError: If the store with the given ID does not exist.
+        LookupError: If the mode is invalid.
+        ValueError: If the store with the given ID does not exist, or is already being deleted.
     """
-    store = db.query(Store).filter(Store.id == store_id).first()
-    
-    if not store:
+    check_delete_mode(mode)
+    if mode == "async":
+        deletion_id = start_deletion(db, Store, store_id)
+        if deletion_id is None:
+            raise ValueError("Store not found")
+        return {"store_id": store_id, "deletion_id": deletion_id}
+
+    # One DELETE, its stock goes with it through the ON DELETE CASCADE of stock.store_id
+    statement = (
+        delete(Store)
+        .where(Store.id == store_id, visible(Store))
+        .returning(Store.id, Store.name)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.execute(statement).first()
+
+    # No row matched the id
+    if deleted is None:
         raise ValueError("Store not found")
-    
-    # Delete associated stocks
-    for stock in store.stock:
-        db.delete(stock)
-    
-    # Delete the store itself
-    db.delete(store)
+
+    # Not a flush, so the counters are bumped here, the stock table's as well
+    bump_table_versions(db, ["stores", "stock"])
+    # The listeners drop the stock of the store along with it
+    record_change(db, "stores", deleted._asdict(), None)
     db.commit()
-    
+
     # Return the deleted store ID as confirmation
     return {"store_id": store_id}
 
@@ -136,16 +288,25 @@ def update_store_service(store_id: int, store_update: dict, db: Session) -> dict
     if not isinstance(store_update["name"], str) or not store_update["name"]:
         raise TypeError("Input should be a valid string")
     
-    store = db.query(Store).filter(Store.id == store_id).first()
-    
-    if not store:
+    # One UPDATE returning the updated row, the store is not read before
+    statement = (
+        update(Store)
+        .where(Store.id == store_id, visible(Store))
+        .values(name=store_update["name"])
+        .returning(Store.id, Store.name)
+        .execution_options(synchronize_session=False)
+    )
+    updated = db.execute(statement).first()
+
+    # No row matched the id
+    if updated is None:
         raise ValueError("Store not found")
 
-    # Update the store fields
-    store.name = store_update["name"]
-
+    updated = updated._asdict()
+    # Not a flush, so the counter is bumped here
+    bump_table_versions(db, ["stores"])
+    record_update(db, "stores", updated)
     db.commit()
-    db.refresh(store)
 
     # Return the updated store data
-    return store._asdict_no_stock()
\ No newline at end of file
+    return updated
\ No newline at end of file
@@ -3,6 +3,7 @@ import os
 from utils.create_app import create_app
 from database.test_session import Base, engine
 from database.session import Base
+from services.cache import response_cache
 
 @pytest.fixture(scope="module")
 def setup_database():
@@ -10,6 +11,8 @@ def setup_database():
     app = create_app(config_name="testing")
     with app.app_context():
         Base.metadata.create_all(bind=engine)
+        # The tables are recreated behind the write services, drop what other modules cached
+        response_cache.clear()
         
         # Get the test client for making requests
         client = app.test_client()
@@ -234,6 +237,80 @@ def test_get_product_by_name(setup_database):
         },
     ]
 
+def test_get_product_by_name_substring_ignores_case(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"name": "ORUM"})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.get_json()["data"]] == ["Forum Low", "Forum Mid"]
+
+def test_get_product_by_name_exact_ignores_case(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"name_exact": "air max"})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.get_json()["data"]] == ["Air Max"]
+
+def test_get_product_by_name_prefix(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"name_prefix": "air "})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.get_json()["data"]] == ["Air Force", "Air Max"]
+
+def test_get_product_by_name_prefix_escapes_wildcards(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"name_prefix": "Air_"})
+    assert response.status_code == 404
+
+def test_get_product_paginated(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"limit": 2})
+    assert response.status_code == 200
+    assert [product["id"] for product in response.get_json()["data"]] == [1, 2]
+
+    names = []
+    cursor = None
+    while True:
+        response = client.get("/product", query_string={"limit": 2, "cursor": cursor} if cursor else {"limit": 2})
+        assert response.status_code == 200
+        names += [product["name"] for product in response.get_json()["data"]]
+        cursor = response.get_json().get("next_cursor")
+        if cursor is None:
+            break
+    assert names == ["Air Max", "Air Force", "Forum Low", "Forum Mid", "Test Product"]
+
+def test_get_product_paginated_by_name_prefix(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"name_prefix": "forum", "limit": 1})
+    assert response.get_json()["data"][0]["name"] == "Forum Low"
+
+    response = client.get("/product", query_string={"name_prefix": "forum", "limit": 1, "cursor": response.get_json()["next_cursor"]})
+    assert response.status_code == 200
+    assert response.get_json()["data"][0]["name"] == "Forum Mid"
+    assert "next_cursor" not in response.get_json()
+
+def test_get_product_invalid_cursor(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"limit": 2, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.get_json()["detail"][0]["error"] == "Invalid cursor"
+
+    # A list of the right length holding an object, [{"a":1}]
+    response = client.get("/product", query_string={"limit": 2, "cursor": "W3siYSI6MX1d"})
+    assert response.status_code == 400
+    assert response.get_json()["detail"][0]["error"] == "Invalid cursor"
+
+def test_get_product_invalid_limit(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"limit": 0})
+    assert response.status_code == 400
+
 def test_get_product_not_in_database(setup_database):
     client = setup_database
 
@@ -252,6 +329,12 @@ def test_delete_product_success(setup_database):
     assert response.get_json()["message"] == "Product deleted successfully"
     assert response.get_json()["data"]["product_id"] == 3
 
+def test_get_deleted_product_by_name(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"name": "Forum Low"})
+    assert response.status_code == 404
+
 def test_delete_product_not_in_database(setup_database):
     client = setup_database
 
@@ -270,6 +353,13 @@ def test_update_product_success(setup_database):
     assert response.get_json()["message"] == "Product updated successfully"
     assert response.get_json()["data"] == {"id": 1, "name": "Air Max 2.0"}
 
+def test_get_updated_product_by_new_name(setup_database):
+    client = setup_database
+
+    response = client.get("/product", query_string={"name": "max 2.0"})
+    assert response.status_code == 200
+    assert [product["id"] for product in response.get_json()["data"]] == [1]
+
 def test_update_product_wrong_type(setup_database):
     client = setup_database
 
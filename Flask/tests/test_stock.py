@@ -1,8 +1,24 @@
 import pytest
 import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+import routes.stock
 from utils.create_app import create_app
 from database.test_session import Base, engine
 from database.session import Base
+from database.stock_names import count_stale_stock_names, create_stock_names, repair_stock_names
+from services.cache import response_cache, single_flight
+from services.name_cache import name_cache
+from services.stock_index import stock_index
+from services.stock import get_stocks_service
+from utils.cache import TTLLRUCache
 
 @pytest.fixture(scope="module")
 def setup_database():
@@ -10,6 +26,10 @@ def setup_database():
     app = create_app(config_name="testing")
     with app.app_context():
         Base.metadata.create_all(bind=engine)
+        # The tables are recreated behind the write services, drop what other modules cached
+        response_cache.clear()
+        stock_index.invalidate()
+        name_cache.clear()
         
         # Get the test client for making requests
         client = app.test_client()
@@ -182,6 +202,22 @@ def test_create_stock_wrong_type_category(setup_database):
     assert response.status_code == 422
     assert response.get_json()["detail"][0]["msg"] == "Invalid type"
 
+def test_create_stock_missing_parent(setup_database):
+    client = setup_database
+    ids = [row["id"] for row in client.get("/stock").get_json()["data"]]
+    stock = {"store_id": 1, "product_id": 3, "price": 200, "is_available": True, "category": "Tênis"}
+
+    response = client.post("/stock", json={**stock, "store_id": 10})
+    assert response.status_code == 404
+    assert response.get_json()["detail"][0]["msg"] == "Store not found"
+
+    response = client.post("/stock", json={**stock, "product_id": 10})
+    assert response.status_code == 404
+    assert response.get_json()["detail"][0]["msg"] == "Product not found"
+
+    # Nothing was inserted
+    assert [row["id"] for row in client.get("/stock").get_json()["data"]] == ids
+
 
 # ------------ API GET ------------
 
@@ -430,6 +466,294 @@ def test_get_stock_by_category(setup_database):
         },
     ]
 
+def test_get_stock_by_store_id_and_product_id(setup_database):
+    client = setup_database
+
+    response = client.get("/stock", query_string={"store_id": 2, "product_id": 4})
+    assert response.status_code == 200
+    assert response.get_json()["data"] == [
+        {
+            "id": 4,
+            "store_id": 2,
+            "product_id": 4,
+            "price": 600.0,
+            "is_available": True,
+            "category": "Tênis",
+            "product_name": "Forum Mid",
+            "store": "Adidas",
+        }
+    ]
+
+def test_get_stock_by_store_name_exact_and_product_name_prefix(setup_database):
+    client = setup_database
+
+    response = client.get("/stock", query_string={"store_name_exact": "adidas", "product_name_prefix": "forum"})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.get_json()["data"]] == [3, 4]
+
+def test_get_stock_paginated(setup_database):
+    client = setup_database
+
+    response = client.get("/stock", query_string={"store_id": 2, "limit": 1})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.get_json()["data"]] == [3]
+
+    response = client.get("/stock", query_string={"store_id": 2, "limit": 1, "cursor": response.get_json()["next_cursor"]})
+    assert [stock["id"] for stock in response.get_json()["data"]] == [4]
+    assert "next_cursor" not in response.get_json()
+
+def test_get_stock_json_like_flask_default(setup_database):
+    client = setup_database
+
+    response = client.get("/stock", query_string={"store_name_exact": "adidas"})
+    default = DefaultJSONProvider(client.application)
+    assert response.data == f"{default.dumps(response.get_json(), ensure_ascii=False, separators=(',', ':'))}\n".encode()
+
+    # Same formats as the default provider for the types it handles beyond JSON
+    data = {"price": Decimal("1.50"), "updated": datetime(2024, 1, 2, 3, 4, 5), "day": date(2024, 1, 2), "id": uuid.UUID(int=1)}
+    assert client.application.json.dumps(data) == default.dumps(data, separators=(",", ":"))
+
+def test_get_stock_cached_until_a_matching_write(setup_database):
+    client = setup_database
+
+    response_cache.clear()
+    client.get("/stock", query_string={"store_id": 1})
+    client.get("/stock", query_string={"store_id": 2})
+
+    # A stock of store 2 changes, only the read of store 2 is evicted
+    client.put("/stock/3", json={"price": 750})
+    hits = response_cache.hits
+    assert client.get("/stock", query_string={"store_id": 1}).status_code == 200
+    assert response_cache.hits == hits + 1
+    response = client.get("/stock", query_string={"store_id": 2})
+    assert response_cache.hits == hits + 1
+    assert [stock["price"] for stock in response.get_json()["data"]] == [750.0, 600.0]
+
+    client.put("/stock/3", json={"price": 800})
+
+def test_get_stock_cached_read_evicted_when_an_update_moves_a_row_out(setup_database):
+    client = setup_database
+
+    response_cache.clear()
+    ids = [stock["id"] for stock in client.get("/stock", query_string={"max_price": 600}).get_json()["data"]]
+    assert 4 in ids
+
+    # The UPDATE returns the new price only, the read showing the old one is evicted all the same
+    client.put("/stock/4", json={"price": 900})
+    response = client.get("/stock", query_string={"max_price": 600})
+    assert [stock["id"] for stock in response.get_json()["data"]] == [id for id in ids if id != 4]
+
+    client.put("/stock/4", json={"price": 600})
+
+def test_get_stock_read_again_after_another_process_writes(setup_database):
+    client = setup_database
+
+    response_cache.clear()
+    client.get("/stock", query_string={"store_id": 1})
+
+    # Another worker writes through a connection of its own, bumping the counter like the write services
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        connection.execute("UPDATE stock SET price = 350 WHERE id = 1")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'stock'")
+
+    misses = response_cache.misses
+    response = client.get("/stock", query_string={"store_id": 1})
+    assert response_cache.misses == misses + 1
+    assert response.get_json()["data"][0]["price"] == 350.0
+
+    client.put("/stock/1", json={"price": 300})
+
+def test_get_stock_not_modified_until_a_write(setup_database):
+    client = setup_database
+
+    response = client.get("/stock", query_string={"store_id": 1})
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache" and "Last-Modified" in response.headers
+
+    # Answered from the counters, neither the cache nor the database is read
+    hits, misses = response_cache.hits, response_cache.misses
+    response = client.get("/stock", query_string={"store_id": 1}, headers={"If-None-Match": f'W/"other", {etag}'})
+    assert response.status_code == 304 and response.data == b""
+    assert response.headers["ETag"] == etag
+    assert (response_cache.hits, response_cache.misses) == (hits, misses)
+
+    assert client.get("/stock", query_string={"store_id": 2}).headers["ETag"] != etag
+
+    # Any write to the stock table changes the ETag of every stock read
+    client.put("/stock/3", json={"price": 750})
+    response = client.get("/stock", query_string={"store_id": 1}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    client.put("/stock/3", json={"price": 800})
+
+def test_get_stock_identical_requests_share_one_query(setup_database, monkeypatch):
+    client = setup_database
+    calls = []
+
+    def slow_get_stocks_service(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.2)  # Still running when the other requests arrive
+        return get_stocks_service(**kwargs)
+
+    monkeypatch.setattr(routes.stock, "get_stocks_service", slow_get_stocks_service)
+    response_cache.clear()
+    coalesced = single_flight.coalesced
+
+    # One client per thread, like the threads of the development server
+    def get(_):
+        return client.application.test_client().get("/stock", query_string={"category": "Tênis"})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(get, range(8)))
+
+    assert len(calls) == 1
+    assert single_flight.coalesced == coalesced + 7
+    # Served by GET /stats as well
+    stats = client.get("/stats").get_json()["data"]
+    assert stats["single_flight"] == single_flight.stats() and stats["single_flight"]["coalesced"] == coalesced + 7
+    assert stats["response_cache"]["entries"] == len(response_cache)
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.get_json() == responses[0].get_json() for response in responses)
+
+def test_get_stock_cached_rows_sent_as_encoded(setup_database):
+    client = setup_database
+
+    response_cache.clear()
+    first = client.get("/stock", query_string={"category": "Tênis"})
+    hits = response_cache.hits
+    second = client.get("/stock", query_string={"category": "Tênis"})
+    assert response_cache.hits == hits + 1
+    assert second.data == first.data
+
+def test_get_stock_reads_the_stock_table_alone(setup_database, monkeypatch):
+    client = setup_database
+
+    monkeypatch.setattr("services.stock.READ_PATH", "projection")
+    client.get("/stock", query_string={"store_id": 1})
+    response_cache.clear()
+
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # The names are copied to the stock rows by the rename itself
+    client.put("/product/1", json={"name": "Air Max 90"})
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.get("/stock", query_string={"store_id": 1})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert response.get_json()["data"][0]["product_name"] == "Air Max 90"
+    assert len(statements) == 1 and "JOIN" not in statements[0]
+
+    # A rename by another process is seen through the counters
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        connection.execute("UPDATE products SET name = 'Air Max 95' WHERE id = 1")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'products'")
+    response = client.get("/stock", query_string={"store_id": 1})
+    assert response.get_json()["data"][0]["product_name"] == "Air Max 95"
+
+    client.put("/product/1", json={"name": "Air Max"})
+
+def test_stock_names_follow_writes(setup_database, monkeypatch):
+    client = setup_database
+    monkeypatch.setattr("services.stock.READ_PATH", "projection")
+    response_cache.clear()
+
+    # A rename is copied to the stock rows, and the name filters read the copies
+    client.put("/store/2", json={"name": "Adidas Originals"})
+    response = client.get("/stock", query_string={"store_name_exact": "adidas originals"})
+    assert {stock["store"] for stock in response.get_json()["data"]} == {"Adidas Originals"}
+    assert client.get("/stock", query_string={"store_name_exact": "adidas"}).status_code == 404
+    client.put("/store/2", json={"name": "Adidas"})
+
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        # Another writer can not make a copy differ from the name
+        connection.execute("UPDATE stock SET store_name = 'Puma' WHERE id = 1")
+        assert connection.execute("SELECT store_name FROM stock WHERE id = 1").fetchone() == ("Nike",)
+
+        # Rows written without the triggers are found and repaired
+        connection.execute("DROP TRIGGER stock_names_au")
+        connection.execute("UPDATE stock SET store_name = 'Puma' WHERE id = 1")
+    with engine.begin() as connection:
+        assert count_stale_stock_names(connection) == 1
+        assert repair_stock_names(connection) == 1
+        assert count_stale_stock_names(connection) == 0
+        assert create_stock_names(connection)
+
+def test_get_stock_index_matches_projection(setup_database, monkeypatch):
+    client = setup_database
+    pytest.importorskip("numpy")
+    # Same bytes as the projection path, SQLite's ASCII-only case folding and LIKE wildcards included
+    for params in (
+        {},
+        {"category": "tên"},
+        {"category": "TÊNIS"},
+        {"category": "t_nis", "max_price": 700},
+        {"product_name": "air", "is_available": True},
+        {"product_name": "ai"},
+        {"store_name_exact": "adidas", "product_name_prefix": "forum"},
+        {"store_id": 2, "limit": 1},
+        {"limit": 2, "cursor": "WzJd"},
+    ):
+        contents = []
+        for read_path in ("projection", "index"):
+            monkeypatch.setattr("services.stock.READ_PATH", read_path)
+            response_cache.clear()
+            contents.append(client.get("/stock", query_string=params).data)
+        assert contents[0] == contents[1]
+
+def test_get_stock_index_follows_writes(setup_database, monkeypatch):
+    client = setup_database
+    pytest.importorskip("numpy")
+    monkeypatch.setattr("services.stock.READ_PATH", "index")
+    stock_index.invalidate()
+    client.get("/stock")
+    size = len(stock_index)
+
+    builds = []
+    build = stock_index.build
+    monkeypatch.setattr(stock_index, "build", lambda db: builds.append(db) or build(db))
+
+    # The writes of this process are applied to the arrays as they commit
+    stock_id = client.post("/stock", json={
+        "store_id": 2, "product_id": 1, "price": 100, "is_available": False, "category": "Bota"
+    }).get_json()["data"]["id"]
+    client.put(f"/stock/{stock_id}", json={"price": 90})
+    client.put("/product/1", json={"name": "Air Max 90"})
+    response = client.get("/stock", query_string={"category": "bota"})
+    assert [(stock["price"], stock["product_name"]) for stock in response.get_json()["data"]] == [(90.0, "Air Max 90")]
+
+    client.delete(f"/stock/{stock_id}")
+    assert client.get("/stock", query_string={"category": "bota"}).status_code == 404
+    assert len(stock_index) == size and builds == []
+    client.put("/product/1", json={"name": "Air Max"})
+
+    # A write of another process is only seen through the counters, the index is built again
+    with closing(sqlite3.connect(engine.url.database)) as connection, connection:
+        connection.execute("UPDATE stock SET price = 350 WHERE id = 1")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'stock'")
+    assert client.get("/stock", query_string={"store_id": 1}).get_json()["data"][0]["price"] == 350.0
+    assert len(builds) == 1
+
+    client.put("/stock/1", json={"price": 300})
+
+def test_cache_bounds_and_invalidation():
+    cache = TTLLRUCache(max_entries=2, max_bytes=100, ttl=60)
+    cache.put("a", "a", 10, cache.generation)
+    cache.put("b", "b", 10, cache.generation)
+    cache.get("a")
+    cache.put("c", "c", 10, cache.generation)
+    # The least recently used entry goes first
+    assert cache.get("b") is None and cache.get("a") == "a"
+    assert not cache.put("d", "d", 101, cache.generation)
+
+    # A value read before an invalidation is not stored
+    generation = cache.generation
+    assert cache.evict(lambda value: value == "a") == 1
+    assert not cache.put("a", "stale", 10, generation)
+
 def test_get_store_not_in_database(setup_database):
     client = setup_database
 
@@ -514,4 +838,186 @@ def test_update_stock_missing_id(setup_database):
     client = setup_database
 
     response = client.put("/stock/", json={"price": 1000})
-    assert response.status_code == 405
\ No newline at end of file
+    assert response.status_code == 405
+
+# ------------ API BULK ------------
+
+def test_create_bulk_success(setup_database):
+    client = setup_database
+
+    stores = client.post("/store/bulk", json=[{"name": "Puma"}, {"name": "Reebok"}])
+    assert stores.status_code == 201
+    assert [store["name"] for store in stores.get_json()["data"]] == ["Puma", "Reebok"]
+    products = client.post("/product/bulk", json=[{"name": "Suede"}])
+    assert products.status_code == 201
+
+    store_ids = [store["id"] for store in stores.get_json()["data"]]
+    product_id = products.get_json()["data"][0]["id"]
+    response = client.post("/stock/bulk", json=[
+        {"store_id": store_id, "product_id": product_id, "price": 400, "is_available": True, "category": "Tênis"}
+        for store_id in store_ids
+    ])
+    assert response.status_code == 201
+    created = response.get_json()["data"]
+    # In the order of the body, with the keys of POST /stock
+    assert [(stock["store_id"], stock["store"], stock["product_name"]) for stock in created] == [
+        (store_ids[0], "Puma", "Suede"), (store_ids[1], "Reebok", "Suede")
+    ]
+    assert created[0]["id"] < created[1]["id"]
+
+    response = client.get("/stock", query_string={"product_id": product_id})
+    assert [stock["id"] for stock in response.get_json()["data"]] == [stock["id"] for stock in created]
+
+def test_create_bulk_item_errors(setup_database):
+    client = setup_database
+
+    count = len(client.get("/stock").get_json()["data"])
+    response = client.post("/stock/bulk", json=[
+        {"store_id": 1, "product_id": 1, "price": 10, "is_available": True, "category": "Tênis"},
+        {"store_id": 1, "product_id": 1, "price": "10", "is_available": True},
+        {"name": "Teste"},
+    ])
+    assert response.status_code == 422
+    assert [(error["loc"], error["msg"]) for error in response.get_json()["detail"]] == [
+        (["body", 1, "category"], "Field required"),
+        (["body", 2, "store_id"], "Field required"),
+        (["body", 2, "product_id"], "Field required"),
+        (["body", 2, "price"], "Field required"),
+        (["body", 2, "is_available"], "Field required"),
+        (["body", 2, "category"], "Field required"),
+    ]
+
+    response = client.post("/stock/bulk", json=[
+        {"store_id": 1, "product_id": 999, "price": 10, "is_available": True, "category": "Tênis"},
+        {"store_id": 1, "product_id": 1, "price": "10", "is_available": True, "category": "Tênis"},
+    ])
+    assert [(error["loc"], error["msg"]) for error in response.get_json()["detail"]] == [
+        (["body", 1, "price"], "Input should be a valid number"),
+    ]
+    response = client.post("/stock/bulk", json=[
+        {"store_id": 1, "product_id": 999, "price": 10, "is_available": True, "category": "Tênis"},
+    ])
+    assert [(error["loc"], error["msg"]) for error in response.get_json()["detail"]] == [
+        (["body", 0, "product_id"], "Product not found"),
+    ]
+    # Nothing is created when any item fails
+    assert len(client.get("/stock").get_json()["data"]) == count
+
+def test_create_bulk_batch_size(setup_database, monkeypatch):
+    client = setup_database
+
+    monkeypatch.setattr("utils.bulk.BULK_MAX_ITEMS", 2)
+    response = client.post("/store/bulk", json=[{"name": "A"}, {"name": "B"}, {"name": "C"}])
+    assert response.status_code == 422
+    assert response.get_json()["detail"][0]["msg"] == "Bulk requests take between 1 and 2 items"
+    assert client.post("/store/bulk", json=[]).status_code == 422
+    assert client.post("/store/bulk", json={"name": "A"}).status_code == 422
+
+def test_update_bulk_success(setup_database):
+    client = setup_database
+
+    response_cache.clear()
+    client.get("/stock", query_string={"store_id": 1})
+
+    response = client.patch("/stock/bulk", json=[
+        {"id": 3, "is_available": False, "category": "Sneaker"},
+        {"id": 2, "price": 850},
+    ])
+    assert response.status_code == 200
+    assert response.get_json()["message"] == "Stocks updated successfully"
+    # In the order of the body, with the keys of PUT /stock/<stock_id>
+    assert [(stock["id"], stock["price"], stock["is_available"], stock["category"]) for stock in response.get_json()["data"]] == [
+        (3, 800.0, False, "Sneaker"), (2, 850.0, True, "Tênis")
+    ]
+
+    # The cached read showing stock 2 is evicted
+    response = client.get("/stock", query_string={"store_id": 1})
+    assert {stock["id"]: stock["price"] for stock in response.get_json()["data"]}[2] == 850.0
+
+    client.patch("/stock/bulk", json=[{"id": 3, "is_available": True, "category": "Tênis"}, {"id": 2, "price": 800}])
+
+def test_update_bulk_item_errors(setup_database):
+    client = setup_database
+
+    response = client.patch("/stock/bulk", json=[{"id": 2, "price": 1}, {"id": 999, "price": 1}])
+    assert response.status_code == 422
+    assert [(error["loc"], error["msg"]) for error in response.get_json()["detail"]] == [
+        (["body", 1, "id"], "Stock not found"),
+    ]
+    # Nothing is updated when any item fails
+    assert client.get("/stock", query_string={"store_id": 1}).get_json()["data"][1]["price"] == 800.0
+
+    response = client.patch("/stock/bulk", json=[{"id": 2, "price": "1"}, {"id": 2}, {"price": 1}])
+    assert [(error["loc"], error["msg"]) for error in response.get_json()["detail"]] == [
+        (["body", 0, "price"], "Input should be a valid number"),
+        (["body", 1, "id"], "Stock updated twice"),
+        (["body", 1], "Nothing to update"),
+        (["body", 2, "id"], "Field required"),
+    ]
+
+def test_update_where_success(setup_database):
+    client = setup_database
+
+    response_cache.clear()
+    prices = [stock["price"] for stock in client.get("/stock", query_string={"store_id": 2}).get_json()["data"]]
+
+    response = client.patch("/stock/where", query_string={"store_id": 2}, json={"price_factor": 0.5})
+    assert response.status_code == 200
+    assert response.get_json()["data"] == {"updated": len(prices)}
+
+    # The write drops every cached read of the stock
+    response = client.get("/stock", query_string={"store_id": 2})
+    assert [stock["price"] for stock in response.get_json()["data"]] == [price / 2 for price in prices]
+
+    response = client.patch("/stock/where", query_string={"store_id": 2, "max_price": 100}, json={"is_available": False})
+    assert response.get_json()["data"] == {"updated": 0}
+
+    client.patch("/stock/where", query_string={"store_id": 2}, json={"price_factor": 2})
+
+def test_update_where_invalid(setup_database):
+    client = setup_database
+
+    # Without a filter every stock would be updated
+    response = client.patch("/stock/where", json={"price": 1})
+    assert response.status_code == 422
+    assert response.get_json()["detail"][0]["error"] == "At least one filter is required"
+
+    response = client.patch("/stock/where", query_string={"store_id": 2}, json={"price": 1, "price_factor": 2})
+    assert response.status_code == 422
+
+    # A validation error, not a stock that was not found
+    response = client.patch("/stock/where", query_string={"store_id": 2}, json={})
+    assert response.status_code == 422
+    assert response.get_json()["detail"][0]["msg"] == "Nothing to update"
+
+def test_update_where_is_available_false(setup_database):
+    client = setup_database
+
+    client.put("/stock/4", json={"is_available": False})
+    prices = {stock["id"]: stock["price"] for stock in client.get("/stock", query_string={"store_id": 2}).get_json()["data"]}
+
+    # Only the unavailable stock, bool("false") would be True
+    response = client.patch("/stock/where", query_string={"store_id": 2, "is_available": "false"}, json={"price": 1})
+    assert response.get_json()["data"] == {"updated": 1}
+    response = client.get("/stock", query_string={"store_id": 2})
+    assert {stock["id"]: stock["price"] for stock in response.get_json()["data"]} == {3: prices[3], 4: 1.0}
+
+    response = client.patch("/stock/where", query_string={"store_id": 2, "is_available": "maybe"}, json={"price": 1})
+    assert response.status_code == 422
+    assert client.get("/stock", query_string={"is_available": "maybe"}).status_code == 422
+
+    client.put("/stock/4", json={"price": prices[4], "is_available": True})
+
+def test_update_where_malformed_filter(setup_database):
+    client = setup_database
+
+    stocks = client.get("/stock", query_string={"category": "Tênis"}).get_json()["data"]
+
+    # Dropping the filter it can not parse would reprice every Tênis stock
+    response = client.patch("/stock/where", query_string={"category": "Tênis", "max_price": "abc"}, json={"price": 0})
+    assert response.status_code == 422
+    response = client.patch("/stock/where", query_string={"category": "Tênis", "store_id": "one"}, json={"price": 0})
+    assert response.status_code == 422
+
+    assert client.get("/stock", query_string={"category": "Tênis"}).get_json()["data"] == stocks
+    assert client.get("/stock", query_string={"max_price": "abc"}).status_code == 422
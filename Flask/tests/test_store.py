@@ -1,8 +1,10 @@
 import pytest
 import os
 from utils.create_app import create_app
-from database.test_session import Base, engine
+from database.test_session import Base, SessionLocal, engine
 from database.session import Base
+from services.cache import response_cache
+from services.deletion import purge_pending
 
 @pytest.fixture(scope="module")
 def setup_database():
@@ -10,6 +12,8 @@ def setup_database():
     app = create_app(config_name="testing")
     with app.app_context():
         Base.metadata.create_all(bind=engine)
+        # The tables are recreated behind the write services, drop what other modules cached
+        response_cache.clear()
         
         # Get the test client for making requests
         client = app.test_client()
@@ -226,6 +230,74 @@ def test_get_store_by_name(setup_database):
         }
     ]
 
+def test_get_store_stock_summary(setup_database):
+    client = setup_database
+
+    response = client.get("/store", query_string={"include": "summary"})
+    assert response.status_code == 200
+    assert response.get_json()["data"][:2] == [
+        {"id": 1, "name": "Nike", "stock_count": 2, "min_price": 300.0, "max_price": 800.0},
+        {"id": 2, "name": "Adidas", "stock_count": 2, "min_price": 600.0, "max_price": 800.0},
+    ]
+    assert response.get_json()["data"][2]["stock_count"] == 0
+
+def test_get_store_without_stock(setup_database):
+    client = setup_database
+
+    response = client.get("/store", query_string={"id": 1, "include": "none"})
+    assert response.status_code == 200
+    assert response.get_json()["data"] == [{"id": 1, "name": "Nike"}]
+
+def test_get_store_stock_limit(setup_database):
+    client = setup_database
+
+    response = client.get("/store", query_string={"stock_limit": 1})
+    assert response.status_code == 200
+    assert [[stock["id"] for stock in store["stock"]] for store in response.get_json()["data"]] == [[1], [3], []]
+
+def test_get_store_invalid_include(setup_database):
+    client = setup_database
+
+    response = client.get("/store", query_string={"include": "everything"})
+    assert response.status_code == 400
+
+def test_get_store_stock_sub_resource(setup_database):
+    client = setup_database
+
+    response = client.get("/store/2/stock", query_string={"limit": 1})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.get_json()["data"]] == [3]
+
+    response = client.get("/store/2/stock", query_string={"limit": 1, "cursor": response.get_json()["next_cursor"]})
+    assert [stock["id"] for stock in response.get_json()["data"]] == [4]
+    assert "next_cursor" not in response.get_json()
+
+def test_get_product_stock_sub_resource(setup_database):
+    client = setup_database
+
+    response = client.get("/product/3/stock", query_string={"store_name_exact": "adidas"})
+    assert response.status_code == 200
+    assert [stock["id"] for stock in response.get_json()["data"]] == [3]
+
+def test_get_read_paths_match(setup_database, monkeypatch):
+    client = setup_database
+
+    # Both read paths must send the same bytes
+    for path, query_string in (
+        ("/store", {}),
+        ("/store", {"stock_limit": 1}),
+        ("/store", {"include": "summary"}),
+        ("/product", {"name_prefix": "forum", "limit": 1}),
+        ("/stock", {"store_name": "ad", "max_price": 700}),
+    ):
+        contents = []
+        for read_path in ("orm", "projection"):
+            for service in ("services.stock", "services.product", "services.store"):
+                monkeypatch.setattr(f"{service}.READ_PATH", read_path)
+            response_cache.clear()
+            contents.append(client.get(path, query_string=query_string).data)
+        assert contents[0] == contents[1]
+
 def test_get_store_not_in_database(setup_database):
     client = setup_database
 
@@ -251,6 +323,74 @@ def test_delete_store_not_in_database(setup_database):
     assert response.status_code == 404
     assert response.get_json()["detail"][0]["msg"] == "Store not found"
 
+def test_delete_store_deletes_its_stock(setup_database):
+    client = setup_database
+
+    store_id = client.post("/store", json={"name": "Puma"}).get_json()["data"]["id"]
+    stock = {"store_id": store_id, "product_id": 1, "price": 500, "is_available": True, "category": "Tênis"}
+    client.post("/stock", json=stock)
+    client.post("/stock", json={**stock, "product_id": 2})
+    response_cache.clear()
+    assert len(client.get("/stock", query_string={"store_id": store_id}).get_json()["data"]) == 2
+    query = {"id": 1, "include": "summary"}
+    stock_count = client.get("/product", query_string=query).get_json()["data"][0]["stock_count"]
+
+    assert client.delete(f"/store/{store_id}").status_code == 200
+
+    # Deleted by the cascade, and gone from the cached reads and the stock index
+    assert client.get("/stock", query_string={"store_id": store_id}).status_code == 404
+    assert client.get("/product", query_string=query).get_json()["data"][0]["stock_count"] == stock_count - 1
+
+
+def test_delete_store_in_background(setup_database):
+    client = setup_database
+
+    store_id = client.post("/store", json={"name": "Fila"}).get_json()["data"]["id"]
+    stock = {"store_id": store_id, "product_id": 1, "price": 500, "is_available": True, "category": "Tênis"}
+    client.post("/stock", json=stock)
+    client.post("/stock", json={**stock, "product_id": 2})
+    response_cache.clear()
+    query = {"id": 1, "include": "summary"}
+    stock_count = client.get("/product", query_string=query).get_json()["data"][0]["stock_count"]
+
+    response = client.delete(f"/store/{store_id}", query_string={"mode": "async"})
+    assert response.status_code == 202
+    assert response.get_json()["message"] == "Store deletion started"
+    deletion_id = response.get_json()["data"]["deletion_id"]
+
+    # Hidden from the reads and the writes while its stock is still there
+    assert client.get("/store", query_string={"id": store_id}).status_code == 404
+    assert client.get("/stock", query_string={"store_id": store_id}).status_code == 404
+    assert client.get("/product", query_string=query).get_json()["data"][0]["stock_count"] == stock_count - 1
+    response = client.get("/product", query_string={"id": 1})
+    assert all(stock["store_id"] != store_id for stock in response.get_json()["data"][0]["stock"])
+    assert client.post("/stock", json=stock).status_code == 404
+    assert client.delete(f"/store/{store_id}", query_string={"mode": "async"}).status_code == 404
+    assert client.get(f"/deletion/{deletion_id}").get_json()["data"]["done"] is False
+
+    # The tests start no worker, the deletion is run here one stock row per transaction
+    with SessionLocal() as db:
+        assert purge_pending(db, chunk_size=1, pause=0) == [deletion_id]
+
+    response = client.get(f"/deletion/{deletion_id}")
+    assert response.get_json()["data"] == {"id": deletion_id, "table": "stores", "row_id": store_id, "purged": 2, "done": True}
+
+
+def test_delete_store_invalid_mode(setup_database):
+    client = setup_database
+
+    response = client.delete("/store/1", query_string={"mode": "later"})
+    assert response.status_code == 400
+    assert response.get_json()["detail"][0]["error"] == "mode must be one of sync, async"
+
+
+def test_get_deletion_not_in_database(setup_database):
+    client = setup_database
+
+    response = client.get("/deletion/1000")
+    assert response.status_code == 404
+    assert response.get_json()["detail"][0]["error"] == "Deletion not found"
+
 
 # ------------ API UPDATE ------------
 
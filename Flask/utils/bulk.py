@@ -0,0 +1,43 @@
+import os
+from typing import Any, Dict, List
+
+# Largest number of items a bulk request may create
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+
+class BulkError(Exception):
+    """
+    Raised with the errors of every item of a bulk request that can not be written, none is.
+
+    Each error has the shape of a request validation error: `loc`, `msg`, `type` and `input`, the
+    `loc` holding the index of the item in the body.
+    """
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def item_error(index: int, field: str, msg: str, type: str, input: Any) -> Dict[str, Any]:
+    """
+    Error of one field of the item at `index` of the body.
+    """
+    return {"type": type, "loc": ["body", index, field], "msg": msg, "input": input}
+
+
+def check_batch_size(items: Any) -> None:
+    """
+    Validate that the body of a bulk request is a list of 1 to `BULK_MAX_ITEMS` items.
+
+    Raises:
+        BulkError: If it is not.
+    """
+    if not isinstance(items, list):
+        raise BulkError([{"type": "list_type", "loc": ["body"], "msg": "Input should be a valid list", "input": items}])
+    if not 1 <= len(items) <= BULK_MAX_ITEMS:
+        raise BulkError([{
+            "type": "too_long" if items else "too_short",
+            "loc": ["body"],
+            "msg": f"Bulk requests take between 1 and {BULK_MAX_ITEMS} items",
+            "input": len(items),
+        }])
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLLRUCache:
+    """
+    Thread-safe in-memory cache bounded by entry count and total size, with a time to live.
+
+    The least recently used entries are evicted first once either bound is exceeded. Every
+    `evict` or `clear` bumps `generation`, so a value read from the database before an
+    invalidation is not stored after it.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = 0
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (expiry on the monotonic clock, size in bytes, value), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Entries, their total size, hits and misses, read together under the lock.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.nbytes, "hits": self.hits, "misses": self.misses}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get the value stored under `key`, None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, value: Any, size: int, generation: int) -> bool:
+        """
+        Store `value` under `key`, evicting the least recently used entries to stay within bounds.
+
+        Args:
+            key (Hashable): Cache key.
+            value (Any): Value to store.
+            size (int): Size of the value in bytes.
+            generation (int): `generation` read before the value was computed.
+
+        Returns:
+            bool: False if the value was not stored, because it is larger than `max_bytes` or an
+                invalidation happened since `generation` was read.
+        """
+        with self._lock:
+            if generation != self.generation or size > self.max_bytes or self.max_entries < 1:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+            return True
+
+    def evict(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Remove the entries whose value matches `predicate`.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            self.generation += 1
+            keys = [key for key, (_, _, value) in self._entries.items() if predicate(value)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.nbytes -= size
@@ -0,0 +1,34 @@
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+# Stored, but revalidated with the ETag on every use
+CACHE_CONTROL = "no-cache"
+
+
+def not_modified(if_none_match: Optional[str], validators: Optional[Tuple[str, float]]) -> bool:
+    """
+    Whether a conditional GET can be answered with 304 Not Modified.
+
+    Args:
+        if_none_match (Optional[str]): The If-None-Match request header.
+        validators (Optional[Tuple[str, float]]): ETag and Last-Modified time of the current response,
+            None if it has none.
+
+    Returns:
+        bool: True if the header lists the ETag, compared weakly as If-None-Match asks, or is "*".
+    """
+    if not if_none_match or validators is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == validators[0] for tag in if_none_match.split(","))
+
+
+def validator_headers(validators: Optional[Tuple[str, float]]) -> Dict[str, str]:
+    """
+    ETag, Last-Modified and Cache-Control headers of a response, none if it has no validators.
+    """
+    if validators is None:
+        return {}
+    etag, last_modified = validators
+    return {"ETag": etag, "Last-Modified": formatdate(last_modified, usegmt=True), "Cache-Control": CACHE_CONTROL}
@@ -5,12 +5,23 @@ from flask_limiter.util import get_remote_address
 from routes.store import store_blueprint
 from routes.stock import stock_blueprint
 from routes.product import product_blueprint
-from database.session import Base, engine, SessionLocal
+from routes.deletion import deletion_blueprint
+from routes.stats import stats_blueprint
+from database.session import engine, SessionLocal
+from database.loaders import READ_PATH
+from database.migrations import upgrade
 import database.test_session as test_session
+from services.deletion import purger
+from services.name_cache import name_cache
+from services.stock_index import stock_index
+from utils.json_provider import ORJSONProvider
 
 def create_app(config_name="default"):
     app = Flask(__name__)
 
+    # jsonify() and request.get_json() go through orjson
+    app.json = ORJSONProvider(app)
+
     # Limiter for api requests
     limiter = Limiter(
         get_remote_address,
@@ -43,8 +54,17 @@ def create_app(config_name="default"):
             if db:
                 db.close()
     else:
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
+        # Create all tables and add the indexes missing from an existing database
+        upgrade(engine)
+
+        # Loaded before serving, rather than by the first requests
+        with SessionLocal() as db:
+            if READ_PATH == "index":
+                name_cache.warm(db)
+                stock_index.build(db)
+
+        # Runs the background deletions, starting with the ones a previous run left pending
+        purger.start(SessionLocal)
 
         # Database session management
         @app.before_request
@@ -63,5 +83,7 @@ def create_app(config_name="default"):
     app.register_blueprint(store_blueprint, url_prefix="/store")
     app.register_blueprint(stock_blueprint, url_prefix="/stock")
     app.register_blueprint(product_blueprint, url_prefix="/product")
+    app.register_blueprint(deletion_blueprint, url_prefix="/deletion")
+    app.register_blueprint(stats_blueprint, url_prefix="/stats")
 
     return app
\ No newline at end of file
@@ -0,0 +1,77 @@
+from typing import Optional
+
+from werkzeug.datastructures import MultiDict
+
+# Values of a boolean query parameter, compared ignoring case
+TRUE_VALUES = ("true", "1")
+FALSE_VALUES = ("false", "0")
+
+
+def bool_arg(args: MultiDict, name: str) -> Optional[bool]:
+    """
+    Read a boolean query parameter, None when it is not given.
+
+    `request.args.get(name, type=bool)` would call `bool()` on the string, which is True for "false".
+
+    Raises:
+        TypeError: With the error of the parameter, if it is neither true/false nor 1/0.
+    """
+    value = args.get(name)
+    if value is None:
+        return None
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise TypeError([{
+        "type": "bool_parsing",
+        "loc": ["query", name],
+        "msg": "Input should be a valid boolean, unable to interpret input",
+        "input": value,
+    }])
+
+
+def int_arg(args: MultiDict, name: str) -> Optional[int]:
+    """
+    Read an integer query parameter, None when it is not given.
+
+    `request.args.get(name, type=int)` returns None for a value it can not parse, which would drop the filter.
+
+    Raises:
+        TypeError: With the error of the parameter, if it is not an integer.
+    """
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise TypeError([{
+            "type": "int_parsing",
+            "loc": ["query", name],
+            "msg": "Input should be a valid integer, unable to parse string as an integer",
+            "input": value,
+        }])
+
+
+def float_arg(args: MultiDict, name: str) -> Optional[float]:
+    """
+    Read a number query parameter, None when it is not given.
+
+    `request.args.get(name, type=float)` returns None for a value it can not parse, which would drop the filter.
+
+    Raises:
+        TypeError: With the error of the parameter, if it is not a number.
+    """
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise TypeError([{
+            "type": "float_parsing",
+            "loc": ["query", name],
+            "msg": "Input should be a valid number, unable to parse string as a number",
+            "input": value,
+        }])
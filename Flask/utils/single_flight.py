@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs a call once for all the identical calls made while it is running.
+
+    The first caller of a key runs the call, later callers of the same key wait for it and get
+    its result or exception, instead of running their own. `do` coalesces threads, `do_async`
+    the tasks of an event loop. `calls` counts the calls that ran, `coalesced` those that waited.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._tasks: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        `calls` and `coalesced`, read together under the lock.
+        """
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced}
+
+    def do(self, key: Hashable, call: Callable[[], T]) -> T:
+        """
+        Run `call`, or wait for the call of `key` another thread is running.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = call()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    async def do_async(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await `call()`, or the call of `key` another task of the running loop is awaiting.
+        """
+        # Futures belong to one loop
+        key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(call())
+                task.add_done_callback(lambda _: self._forget(key, task))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        # Shielded, so a caller cancelled while waiting does not cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Future[Any]") -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]